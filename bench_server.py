@@ -0,0 +1,528 @@
+"""
+Local fixture server standing in for the supported sites, so the crawlers can
+be benchmarked end to end without network access.
+
+Every site is served under its host name, `http://127.0.0.1:<port>/<host>/...`,
+and `FixtureSession` sends the requests of the crawlers there. The pages are
+generated from templates following the markup each crawler family parses, and
+the media are synthetic files of a configurable size, served with a
+configurable latency and bandwidth.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import warnings
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass
+from math import ceil
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientSession, web
+from yarl import URL
+
+from ososedki_dl.consts import KB
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+    from multiprocessing.connection import Connection
+
+    Handler = Callable[[web.Request, str], Awaitable[web.StreamResponse]]
+
+MB = KB * KB
+# Albums listed on a listing page, and media returned by a page of the APIs
+LISTING_PAGE_SIZE = 4
+API_PAGE_SIZE = 5
+# Page size cap of the load-more API of the ososedki clones, the crawlers never
+# ask for more
+LOAD_MORE_CAP = 100
+# Media of a cosxuxi album page before the "Next >" link
+COSXUXI_PAGE_SIZE = 6
+STREAM_CHUNK_SIZE = 64 * KB
+MEDIA_TYPES: dict[str, str] = {
+    ".jpg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".mp4": "video/mp4",
+}
+_MEDIA_PATTERN = re.compile(r"\.(jpg|png|webp|mp4)$")
+_ALBUM_PATTERN = re.compile(r"fixture-(\d+)")
+
+
+@dataclass
+class FixtureConfig:
+    """Shape of the fixture sites and of the network serving them."""
+
+    albums: int = 8
+    media: int = 12
+    # Albums of the families with videos have one among their media
+    image_size: int = 256 * KB
+    video_size: int = 4 * MB
+    # Seconds before every response, and bytes per second of every response
+    # (0 for no limit)
+    latency: float = 0.0
+    bandwidth: float = 0.0
+
+
+# Crawler of every family of fixture sites
+FAMILIES: dict[str, str] = {
+    "ososedki": "OsosedkiCrawler",
+    "ososedki-api": "CosplayAsianCrawler",
+    "cosxuxi": "CosxuxiClubCrawler",
+    "eromexxx": "EromeXXXCrawler",
+    "wildskirts": "WildskirtsCrawler",
+    "fapello": "FapelloIsCrawler",
+    "husvjjal": "HusvjjalBlogspotCrawler",
+}
+
+
+def start_urls(family: str, config: FixtureConfig) -> list[str]:
+    """
+    Get the URLs to crawl to benchmark a crawler family.
+
+    Args:
+        family (str): The family, one of FAMILIES.
+        config (FixtureConfig): The shape of the fixture sites.
+
+    Returns:
+        list[str]: The URLs of the real sites, to be given to the crawlers.
+    """
+    albums = range(1, config.albums + 1)
+    if family == "ososedki":
+        return ["https://ososedki.com/cosplay/fixture"]
+    if family == "ososedki-api":
+        return ["https://cosplayasian.com/cos/fixture"]
+    if family == "cosxuxi":
+        return [f"https://cosxuxi.club/fixture-{n}/" for n in albums]
+    if family == "eromexxx":
+        return ["https://eromexxx.com/model/fixture/"]
+    if family == "wildskirts":
+        return [f"https://wildskirts.com/fixture-{n}" for n in albums]
+    if family == "fapello":
+        return [f"https://fapello.is/fixture-{n}" for n in albums]
+    if family == "husvjjal":
+        return ["https://husvjjal.blogspot.com/"]
+    raise ValueError(f"Unknown crawler family: {family}")
+
+
+def _page(title: str, body: str, head: str = "") -> web.Response:
+    return web.Response(
+        text=f"<html><head><title>{title}</title>{head}</head>"
+        f"<body>{body}</body></html>",
+        content_type="text/html",
+    )
+
+
+def _album_number(text: str) -> int:
+    match = _ALBUM_PATTERN.search(text)
+    return int(match.group(1)) if match else 0
+
+
+class FixtureServer:
+    """The aiohttp application serving every fixture site."""
+
+    def __init__(self, config: FixtureConfig) -> None:
+        self.config: FixtureConfig = config
+        # Random data shared by the media, each one gets a distinct prefix so
+        # its hash is unique
+        self._data: bytes = hashlib.sha256(b"fixture").digest() * (
+            max(config.image_size, config.video_size) // 32 + 1
+        )
+        self._sites: dict[str, Handler] = {
+            "ososedki.com": self._ososedki,
+            "cosplayasian.com": self._ososedki_api,
+            "cosxuxi.club": self._cosxuxi,
+            "eromexxx.com": self._eromexxx,
+            "wildskirts.com": self._wildskirts,
+            "api.wildskirts.com": self._wildskirts_api,
+            "fapello.is": self._fapello,
+            "husvjjal.blogspot.com": self._husvjjal,
+            "postimg.cc": self._postimg,
+            "www.blogger.com": self._blogger_video,
+        }
+
+    def app(self) -> web.Application:
+        """Create the application."""
+        app = web.Application()
+        app.router.add_route("*", "/{host}/{path:.*}", self._handle)
+        return app
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency)
+        host: str = request.match_info["host"]
+        path: str = "/" + request.match_info["path"]
+        if _MEDIA_PATTERN.search(path):
+            return await self._media(request, path)
+        handler: Handler | None = self._sites.get(host)
+        if handler is None:
+            raise web.HTTPNotFound()
+        return await handler(request, path)
+
+    def _media_urls(self, base: str, n: int, video: bool = False) -> list[str]:
+        """Get the media of album `n`, hosted under `base`."""
+        urls: list[str] = [
+            f"{base}/fixture-{n}/fixture-{n}-{i}.jpg"
+            for i in range(self.config.media - int(video))
+        ]
+        if video:
+            urls.append(f"{base}/fixture-{n}/fixture-{n}-v.mp4")
+        return urls
+
+    async def _media(self, request: web.Request, path: str) -> web.StreamResponse:
+        suffix: str = path[path.rfind(".") :]
+        size: int = (
+            self.config.video_size if suffix == ".mp4" else self.config.image_size
+        )
+        prefix: bytes = hashlib.sha256(path.encode()).digest()
+        start, end = 0, size - 1
+        status = 200
+        headers: dict[str, str] = {
+            "Content-Type": MEDIA_TYPES[suffix],
+            "Accept-Ranges": "bytes",
+            "ETag": f'"{prefix.hex()[:16]}"',
+        }
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return web.Response(status=304, headers=headers)
+        range_header: str = request.headers.get("Range", "")
+        if match := re.fullmatch(r"bytes=(\d+)-(\d*)", range_header):
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        if request.method == "HEAD":
+            return response
+
+        body: bytes = (prefix + self._data)[:size]
+        for offset in range(start, end + 1, STREAM_CHUNK_SIZE):
+            chunk: bytes = body[offset : min(offset + STREAM_CHUNK_SIZE, end + 1)]
+            await response.write(chunk)
+            if self.config.bandwidth:
+                await asyncio.sleep(len(chunk) / self.config.bandwidth)
+        await response.write_eof()
+        return response
+
+    def _listing(self, request: web.Request, album_path: str) -> web.Response:
+        """A listing page of an ososedki clone, linking to a few pages ahead."""
+        page: int = int(request.query.get("page", "1"))
+        last_page: int = ceil(self.config.albums / LISTING_PAGE_SIZE)
+        first: int = (page - 1) * LISTING_PAGE_SIZE + 1
+        albums: range = range(
+            first, min(first + LISTING_PAGE_SIZE, self.config.albums + 1)
+        )
+        body: str = "".join(
+            f'<a href="{album_path}fixture-{n}">Album {n}</a>' for n in albums
+        )
+        body += "".join(
+            f'<a href="?page={p}">{p}</a>'
+            for p in range(1, min(page + 2, last_page) + 1)
+        )
+        return _page("Fixture listing", body)
+
+    async def _ososedki(self, request: web.Request, path: str) -> web.Response:
+        if path.startswith("/cosplay/"):
+            return self._listing(request, "/photos/")
+        n: int = _album_number(path)
+        links: str = "".join(
+            f'<a href="{url}"><img src="{url}"></a>'
+            for url in self._media_urls("https://ososedki.com/images/a/604", n)
+        )
+        return _page(f"Fixture Album {n} (@fixture) - Cosplay", links)
+
+    async def _ososedki_api(self, request: web.Request, path: str) -> web.Response:
+        if path.startswith("/cos/"):
+            return self._listing(request, "/post/")
+        base: str = "https://cosplayasian.com/images/a/1280"
+        if path == "/cms/load-more-photos.php":
+            payload: dict[str, Any] = await request.json()
+            n: int = _album_number(payload["album_id"])
+            offset: int = int(payload["offset"])
+            limit: int = min(int(payload["limit"]), LOAD_MORE_CAP)
+            urls: list[str] = self._media_urls(f"{base}/fixture", n)
+            photos: list[dict[str, str]] = [
+                {"html": f'<a href="{url}"><img src="{url}"></a>'}
+                for url in urls[offset : offset + limit]
+            ]
+            return web.json_response({"photos": photos})
+        n = _album_number(path)
+        preload: str = (
+            f'<link rel="preload" as="image" '
+            f'href="{base}/fixture/fixture-{n}/fixture-{n}-0.jpg">'
+        )
+        return _page(f"Fixture Album {n} (@fixture) - Cosplay", "", preload)
+
+    async def _cosxuxi(self, request: web.Request, path: str) -> web.Response:
+        n: int = _album_number(path)
+        page: int = int(request.query.get("page", "1"))
+        urls: list[str] = self._media_urls(
+            "https://cosxuxi.club/wp-content/uploads", n
+        )
+        start: int = (page - 1) * COSXUXI_PAGE_SIZE
+        images: str = "".join(
+            f'<img src="{url}">' for url in urls[start : start + COSXUXI_PAGE_SIZE]
+        )
+        body: str = f'<div class="contentme">{images}</div>'
+        if start + COSXUXI_PAGE_SIZE < len(urls):
+            body += (
+                f'<a class="page-numbers" href="/fixture-{n}/?page={page + 1}">'
+                "Next &gt;</a>"
+            )
+        return _page(f"CosXuxi Club: Fixture Album {n} - Page {page}", body)
+
+    async def _eromexxx(self, request: web.Request, path: str) -> web.Response:
+        if path.startswith("/model/"):
+            last_page: int = ceil(self.config.albums / LISTING_PAGE_SIZE)
+            match = re.search(r"/page/(\d+)/", path)
+            if not match:
+                items: str = "".join(
+                    f'<li><a href="/model/fixture/page/{p}/">{p}</a></li>'
+                    for p in range(1, last_page + 1)
+                )
+                return _page(
+                    "Fixture model",
+                    f'<ul class="pagination">{items}<li><a>Next</a></li></ul>',
+                )
+            first: int = (int(match.group(1)) - 1) * LISTING_PAGE_SIZE + 1
+            albums: range = range(
+                first, min(first + LISTING_PAGE_SIZE, self.config.albums + 1)
+            )
+            return _page(
+                "Fixture model",
+                "".join(
+                    f'<a class="athumb thumb-link" '
+                    f'href="https://eromexxx.com/fixture-{n}/">Album {n}</a>'
+                    for n in albums
+                ),
+            )
+        n: int = _album_number(path)
+        media: list[str] = self._media_urls("https://eromexxx.com/media", n, True)
+        body: str = "".join(
+            f'<img class="img-back lazyload" data-src="{url}">' for url in media[:-1]
+        )
+        body += f'<video><source src="{media[-1]}"></video>'
+        return _page(f"Fixture album {n}", body)
+
+    async def _wildskirts(self, request: web.Request, path: str) -> web.Response:
+        n: int = _album_number(path)
+        return _page(
+            f"Fixture profile {n}",
+            f'<input type="hidden" name="commentable_id" value="{n}" />',
+        )
+
+    async def _wildskirts_api(self, request: web.Request, path: str) -> web.Response:
+        n: int = int(path.rstrip("/").split("/")[-1])
+        urls: list[str] = self._media_urls("https://photos.wildskirts.com", n)
+        urls[-1] = f"https://video.wildskirts.com/fixture-{n}/fixture-{n}-v.mp4"
+        items: dict[str, dict[str, str]] = {
+            str(i): {"t": "video" if url.endswith(".mp4") else "photo", "u": url}
+            for i, url in enumerate(urls, 1)
+        }
+        return web.json_response(
+            {"media": {"items": items, "count": len(items)}, "status": "success"}
+        )
+
+    async def _fapello(self, request: web.Request, path: str) -> web.Response:
+        if not path.startswith("/api/media/"):
+            n: int = _album_number(path)
+            return _page(
+                f"Fixture profile {n}",
+                f'<h1 class="text-xl font-semibold text-lead">Fixture {n}</h1>',
+            )
+        _, _, _, profile, page, _ = path.split("/")
+        urls: list[str] = self._media_urls(
+            "https://fapello.is/content/f/i", _album_number(profile)
+        )
+        start: int = (int(page) - 1) * API_PAGE_SIZE
+        media: list[dict[str, str]] = [
+            {"newUrl": url} for url in urls[start : start + API_PAGE_SIZE]
+        ]
+        return web.json_response(media or None)
+
+    def _post_url(self, n: int) -> str:
+        return f"https://husvjjal.blogspot.com/2024/01/fixture-{n}.html"
+
+    async def _husvjjal(self, request: web.Request, path: str) -> web.Response:
+        if path == "/feeds/posts/default":
+            # Three posts related to the one in the Referer, so following the
+            # related posts finds every album
+            n: int = _album_number(request.headers.get("Referer", ""))
+            entries: list[dict[str, Any]] = [
+                {
+                    "link": [
+                        {
+                            "rel": "alternate",
+                            "type": "text/html",
+                            "href": self._post_url((n + k) % self.config.albums + 1),
+                        }
+                    ]
+                }
+                for k in range(3)
+            ]
+            feed: str = json.dumps({"feed": {"entry": entries}})
+            return web.Response(
+                text=f"// API callback\nBloggerJS.related({feed});",
+                content_type="text/javascript",
+            )
+        if not path.endswith(".html"):
+            links: str = "".join(
+                f'<a class="gallery-name fw-500 font-primary fs-5 l:fs-3" '
+                f'href="{self._post_url(n)}">Album {n}</a>'
+                for n in range(1, min(3, self.config.albums) + 1)
+            )
+            return _page("Fixture blog", links)
+
+        n = _album_number(path)
+        body: str = ""
+        for i in range(self.config.media - 1):
+            url: str = f"https://i.postimg.cc/fixture-{n}/fixture-{n}-{i}.jpg"
+            # Half of the images link to their postimg.cc page
+            href: str = url if i % 2 else f"https://postimg.cc/fixture-{n}-{i}"
+            body += f'<a href="{href}"><img src="{url}"></a>'
+        body += (
+            '<iframe class="b-hbp-video b-uploaded" '
+            f'src="https://www.blogger.com/video.g?token=fixture-{n}"></iframe>'
+        )
+        return _page(f"Fixture post {n}", body)
+
+    async def _postimg(self, request: web.Request, path: str) -> web.Response:
+        n, i = path.rsplit("-", 2)[-2:]
+        url: str = f"https://i.postimg.cc/fixture-{n}/fixture-{n}-{i}.jpg?dl=1"
+        return _page("Fixture image", f'<a id="download" href="{url}">Download</a>')
+
+    async def _blogger_video(self, request: web.Request, path: str) -> web.Response:
+        n: int = _album_number(request.query.get("token", ""))
+        streams: list[dict[str, Any]] = [
+            {
+                "format_id": format_id,
+                "play_url": f"https://rr1.googlevideo.com/fixture-{n}/"
+                f"fixture-{n}-v{format_id}.mp4",
+            }
+            for format_id in (18, 22)
+        ]
+        config: str = json.dumps({"streams": streams})
+        return _page(
+            "Fixture video",
+            f'<script type="text/javascript">var VIDEO_CONFIG = {config};</script>',
+        )
+
+
+# aiohttp warns about subclassing ClientSession, aiohttp_client_cache does it
+# the same way
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    class FixtureSession(ClientSession):
+        """Session sending every request to the fixture server."""
+
+        def __init__(self, base_url: str, **kwargs: Any) -> None:
+            """
+            Initialize the session.
+
+            Args:
+                base_url (str): The URL of the fixture server.
+                **kwargs: The arguments of ClientSession.
+            """
+            super().__init__(**kwargs)
+            self._fixture_url = URL(base_url)
+
+        def rewrite(self, url: str | URL) -> URL:
+            """Turn `https://host/path` into `<base_url>/host/path`."""
+            url = URL(url)
+            if url.host in ("127.0.0.1", self._fixture_url.host) and (
+                url.port == self._fixture_url.port
+            ):
+                return url
+            return self._fixture_url.with_path(
+                f"/{url.host}{url.path or '/'}"
+            ).with_query(url.query)
+
+        async def _request(self, method: str, str_or_url: Any, **kwargs: Any) -> Any:
+            return await super()._request(method, self.rewrite(str_or_url), **kwargs)
+
+
+async def start_fixture_server(
+    config: FixtureConfig, host: str = "127.0.0.1", port: int = 0
+) -> tuple[web.AppRunner, int]:
+    """
+    Start the fixture server.
+
+    Args:
+        config (FixtureConfig): The shape of the fixture sites.
+        host (str): The host to listen on. Defaults to "127.0.0.1".
+        port (int): The port to listen on, 0 for any free port.
+
+    Returns:
+        tuple[web.AppRunner, int]: The runner, to clean up when done, and the
+        port the server listens on.
+    """
+    runner = web.AppRunner(FixtureServer(config).app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+
+def serve(config: FixtureConfig, conn: Connection, port: int = 0) -> None:
+    """
+    Run the fixture server until the process is stopped, sending the port it
+    listens on through `conn`. Meant to run in a process of its own, so the
+    server doesn't compete with the crawlers for the event loop.
+
+    Args:
+        config (FixtureConfig): The shape of the fixture sites.
+        conn (Connection): The pipe to send the port to.
+        port (int): The port to listen on, 0 for any free port.
+    """
+
+    async def main() -> None:
+        runner, bound_port = await start_fixture_server(config, port=port)
+        conn.send(bound_port)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def get_parsed_args() -> Namespace:
+    p = ArgumentParser(description="Serve the benchmark fixture sites.")
+    p.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    p.add_argument("--albums", type=int, default=FixtureConfig.albums)
+    p.add_argument("--media", type=int, default=FixtureConfig.media)
+    p.add_argument(
+        "--latency", type=float, default=0.0, help="Latency per response in ms"
+    )
+    p.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0.0,
+        help="Bandwidth per response in KiB/s (0 for no limit)",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args: Namespace = get_parsed_args()
+    config = FixtureConfig(
+        albums=args.albums,
+        media=args.media,
+        latency=args.latency / 1000,
+        bandwidth=args.bandwidth * KB,
+    )
+    print(f"Serving the fixture sites on http://127.0.0.1:{args.port}/<host>/")
+    web.run_app(FixtureServer(config).app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,22 +3,41 @@ from __future__ import annotations
 import asyncio
 import csv
 import hashlib
+import multiprocessing
+import os
 import statistics as stats
+import sys
 import tempfile
 import time
 from argparse import ArgumentParser, Namespace
-from collections.abc import Iterable
-from dataclasses import dataclass
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from functools import partial
+from itertools import product
+from multiprocessing.connection import Connection
 from pathlib import Path
+from typing import Any
 
 from aiohttp import ClientSession, ClientTimeout
+from core_helpers.logs import logger
 from rich import print
 from rich.progress import (BarColumn, DownloadColumn, Progress, SpinnerColumn,
                            TaskProgressColumn, TimeElapsedColumn,
                            TimeRemainingColumn, TransferSpeedColumn)
 from rich.traceback import install
 
-from ososedki_dl.consts import KB, PERCENTAGE_FORMAT
+from bench_server import FAMILIES, FixtureConfig, FixtureSession, serve, start_urls
+from ososedki_dl.consts import (DEFAULT_CHUNK_SIZE, DEFAULT_HTML_PARSER, KB,
+                                LOG_FILE, MAX_CONCURRENT_DOWNLOADS,
+                                MAX_CONCURRENT_PER_HOST, PACKAGE,
+                                PERCENTAGE_FORMAT)
+from ososedki_dl.profiling import profile_session
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
 
 # ---------------------------
 # Config
@@ -239,6 +258,423 @@ async def bench_url(
     print(f"[bold]Summary written:[/bold] {summary_csv}")
 
 
+# ---------------------------
+# Offline crawl benchmark
+# ---------------------------
+# The runs of the crawl benchmark spawn their processes, so the server and
+# every crawler start from a clean interpreter
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+@dataclass
+class CrawlResult:
+    family: str
+    crawler: str
+    status: str
+    albums: int
+    media: int
+    errors: int
+    total_bytes: int
+    duration_s: float
+    albums_per_s: float
+    media_per_s: float
+    bytes_per_s: float
+    peak_rss_kb: int | None
+
+
+def _peak_rss_kb() -> int | None:
+    """Peak resident set size of the process, None where it can't be read."""
+    if resource is None:
+        return None
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return peak // KB if sys.platform == "darwin" else peak
+
+
+async def _crawl_fixtures(
+    family: str, config: FixtureConfig, base_url: str, dest_path: Path
+) -> CrawlResult:
+    from ososedki_dl.ledger import close_ledger
+    from ososedki_dl.metrics import ALBUMS, DOWNLOADED_BYTES
+    from ososedki_dl.scheduler import DownloadScheduler
+    from ososedki_dl.scrapper import download_urls
+
+    args = Namespace(
+        cache=False,
+        check_cache=False,
+        debug=False,
+        dest_path=dest_path,
+        parser=DEFAULT_HTML_PARSER,
+        resume=False,
+        trace=None,
+    )
+    crawler: str = FAMILIES[family]
+    t0: float = time.perf_counter()
+    try:
+        async with FixtureSession(base_url) as session:
+            results: list[dict[str, str]] = await download_urls(
+                session, start_urls(family, config), args, DownloadScheduler()
+            )
+    finally:
+        close_ledger()
+    duration_s: float = time.perf_counter() - t0
+
+    statuses: list[str] = [result["status"].split(":")[0] for result in results]
+    albums = int(ALBUMS.get(crawler, "done"))
+    media: int = statuses.count("ok")
+    total_bytes = int(sum(sample["value"] for sample in DOWNLOADED_BYTES.snapshot()))
+    errors: int = statuses.count("error")
+    return CrawlResult(
+        family=family,
+        crawler=crawler,
+        status="ok" if media and not errors else "error",
+        albums=albums,
+        media=media,
+        errors=errors,
+        total_bytes=total_bytes,
+        duration_s=round(duration_s, 3),
+        albums_per_s=round(albums / duration_s, 2),
+        media_per_s=round(media / duration_s, 2),
+        bytes_per_s=round(total_bytes / duration_s, 1),
+        peak_rss_kb=_peak_rss_kb(),
+    )
+
+
+def _crawl_worker(
+    family: str,
+    config: FixtureConfig,
+    base_url: str,
+    dest_path: Path,
+    conn: Connection,
+) -> None:
+    logger.setup_logger(PACKAGE, LOG_FILE, False, False)
+    conn.send(asyncio.run(_crawl_fixtures(family, config, base_url, dest_path)))
+
+
+def _run_in_process(target: Callable[..., None], *args: Any) -> tuple[Any, int]:
+    """
+    Run `target(*args, conn)` in a spawned process, so its metrics and its
+    peak memory are not mixed with the other runs.
+
+    Returns:
+        tuple[Any, int]: What the process sent through `conn`, None if it
+        died before, and its exit code.
+    """
+    recv_conn, send_conn = MP_CONTEXT.Pipe(duplex=False)
+    process = MP_CONTEXT.Process(target=target, args=(*args, send_conn))
+    process.start()
+    send_conn.close()
+    try:
+        result: Any = recv_conn.recv()
+    except EOFError:
+        result = None
+    process.join()
+    return result, process.exitcode
+
+
+def run_crawl_case(
+    family: str, config: FixtureConfig, base_url: str, dest_path: Path
+) -> CrawlResult:
+    """Crawl the fixture sites of a crawler family in a process of its own."""
+    result, exitcode = _run_in_process(
+        _crawl_worker, family, config, base_url, dest_path
+    )
+    if result is None:
+        return CrawlResult(
+            family=family,
+            crawler=FAMILIES[family],
+            status=f"error: exit code {exitcode}",
+            albums=0,
+            media=0,
+            errors=0,
+            total_bytes=0,
+            duration_s=0.0,
+            albums_per_s=0.0,
+            media_per_s=0.0,
+            bytes_per_s=0.0,
+            peak_rss_kb=None,
+        )
+    return result
+
+
+@contextmanager
+def isolated_user_paths() -> Iterator[Path]:
+    """
+    Point the user paths of the package (ledger, checkpoints, logs, ...) of
+    the processes spawned in the block to a temporary directory, so previous
+    downloads are never skipped.
+
+    Yields:
+        Path: The temporary directory.
+    """
+    variables: tuple[str, ...] = ("XDG_DATA_HOME", "XDG_STATE_HOME", "XDG_CONFIG_HOME")
+    saved: dict[str, str | None] = {var: os.environ.get(var) for var in variables}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for var in variables:
+            os.environ[var] = str(Path(temp_dir, var.lower()))
+        try:
+            yield Path(temp_dir)
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+
+
+@contextmanager
+def fixture_server(config: FixtureConfig) -> Iterator[str]:
+    """
+    Run the fixture server in a process of its own.
+
+    Yields:
+        str: The URL of the server.
+    """
+    recv_conn, send_conn = MP_CONTEXT.Pipe(duplex=False)
+    server = MP_CONTEXT.Process(target=serve, args=(config, send_conn), daemon=True)
+    server.start()
+    try:
+        yield f"http://127.0.0.1:{recv_conn.recv()}"
+    finally:
+        server.terminate()
+        server.join()
+
+
+def bench_crawl(families: list[str], config: FixtureConfig) -> None:
+    """
+    Crawl the fixture sites of every family and write a summary CSV to the
+    `bench_results` directory.
+    """
+    rows: list[dict[str, str | int | float | None]] = []
+    with isolated_user_paths() as temp_dir, fixture_server(config) as base_url:
+        dest: Path = temp_dir / "downloads"
+        print(f"[bold]Fixture server:[/bold] {base_url}")
+        for family in families:
+            print(f"[cyan]→ Crawling[/cyan] {family} ({FAMILIES[family]})")
+            res: CrawlResult = run_crawl_case(
+                family, config, base_url, dest / family
+            )
+            status_color: str = "green" if res.status == "ok" else "red"
+            rss: str = f"{res.peak_rss_kb / KB:.1f} MiB" if res.peak_rss_kb else "n/a"
+            print(
+                f"[{status_color}]{res.status}[/] {family}: "
+                f"{res.albums} albums, {res.media} media, {res.errors} errors "
+                f"in {res.duration_s:.2f} s | {res.albums_per_s:.2f} albums/s "
+                f"{res.media_per_s:.2f} media/s {res.bytes_per_s / MB:.2f} MiB/s "
+                f"| peak RSS {rss}"
+            )
+            rows.append(asdict(res))
+
+    summary_csv: Path = OUT_DIR / f"crawl_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    with open(summary_csv, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+
+    print(f"[bold]Summary written:[/bold] {summary_csv}")
+
+
+# ---------------------------
+# Concurrency sweep
+# ---------------------------
+@dataclass
+class SweepResult:
+    max_concurrent: int
+    max_per_host: int
+    chunk_size: int
+    run: int
+    status: str
+    files: int
+    errors: int
+    error_rate: float
+    total_bytes: int
+    duration_s: float
+    mean_bps: float
+    p50_latency_s: float
+    p95_latency_s: float
+    max_latency_s: float
+    peak_per_host: int
+    peak_rss_kb: int | None
+
+
+def sweep_fixture_urls(files: int, hosts: int) -> list[str]:
+    """Media URLs spread over `hosts` hosts, served by the fixture server."""
+    return [
+        f"https://media{i % hosts}.fixture.test/sweep/file-{i}.jpg"
+        for i in range(files)
+    ]
+
+
+async def _download_all(
+    urls: list[str],
+    base_url: str | None,
+    dest_path: Path,
+    max_concurrent: int,
+    max_per_host: int,
+    chunk_size: int,
+    run_no: int,
+) -> SweepResult:
+    from ososedki_dl.download import Downloader
+    from ososedki_dl.ledger import close_ledger
+    from ososedki_dl.metrics import DOWNLOADED_BYTES
+    from ososedki_dl.scheduler import DownloadScheduler
+
+    latencies: list[float] = []
+    # Start every host at its ceiling, so the case measures the limit itself
+    # rather than how fast the adaptive limit ramps up to it
+    scheduler = DownloadScheduler(
+        max_concurrent, max_per_host, initial_per_host=max_per_host
+    )
+
+    async def download(downloader: Downloader, url: str) -> dict[str, str]:
+        # Time spent once the scheduler let the download start
+        t0: float = time.perf_counter()
+        try:
+            result: dict[str, str] = await downloader.download_and_save_media(
+                url, dest_path
+            )
+        except Exception as e:
+            logger.exception(f"Failed to download {url}")
+            result = {"url": url, "status": f"error: {e}"}
+        latencies.append(time.perf_counter() - t0)
+        return result
+
+    dest_path.mkdir(parents=True, exist_ok=True)
+    t0: float = time.perf_counter()
+    try:
+        async with (
+            FixtureSession(base_url) if base_url else ClientSession()
+        ) as session:
+            downloader = Downloader(session, scheduler=scheduler, chunk_size=chunk_size)
+            results: list[dict[str, str]] = await asyncio.gather(
+                *(
+                    scheduler.submit(url, partial(download, downloader, url))
+                    for url in urls
+                )
+            )
+    finally:
+        close_ledger()
+    duration_s: float = time.perf_counter() - t0
+
+    errors: int = sum(result["status"].startswith("error") for result in results)
+    total_bytes = int(sum(sample["value"] for sample in DOWNLOADED_BYTES.snapshot()))
+    p95: float = (
+        stats.quantiles(latencies, n=100, method="inclusive")[94]
+        if len(latencies) > 1
+        else sum(latencies)
+    )
+    return SweepResult(
+        max_concurrent=max_concurrent,
+        max_per_host=max_per_host,
+        chunk_size=chunk_size,
+        run=run_no,
+        status="ok" if not errors else "error",
+        files=len(results) - errors,
+        errors=errors,
+        error_rate=round(errors / len(results), 4) if results else 0.0,
+        total_bytes=total_bytes,
+        duration_s=round(duration_s, 3),
+        mean_bps=round(total_bytes / duration_s, 1),
+        p50_latency_s=round(stats.median(latencies), 4) if latencies else 0.0,
+        p95_latency_s=round(p95, 4),
+        max_latency_s=round(max(latencies, default=0.0), 4),
+        peak_per_host=max(scheduler.limiter(url).peak_in_flight for url in urls),
+        peak_rss_kb=_peak_rss_kb(),
+    )
+
+
+def _sweep_worker(
+    urls: list[str],
+    base_url: str | None,
+    dest_path: Path,
+    max_concurrent: int,
+    max_per_host: int,
+    chunk_size: int,
+    run_no: int,
+    conn: Connection,
+) -> None:
+    logger.setup_logger(PACKAGE, LOG_FILE, False, False)
+    conn.send(
+        asyncio.run(
+            _download_all(
+                urls,
+                base_url,
+                dest_path,
+                max_concurrent,
+                max_per_host,
+                chunk_size,
+                run_no,
+            )
+        )
+    )
+
+
+def bench_sweep(
+    urls: list[str],
+    base_url: str | None,
+    concurrency: Iterable[int],
+    per_host: Iterable[int],
+    chunk_sizes: Iterable[int],
+    runs: int,
+) -> None:
+    """
+    Download the URLs with every combination of global concurrency, per-host
+    limit and chunk size, through the scheduler and the downloader of the
+    package, and write a summary CSV to the `bench_results` directory.
+
+    Every case runs in a process of its own, with empty user paths and
+    destination, so nothing is skipped as already downloaded.
+    """
+    rows: list[dict[str, str | int | float | None]] = []
+    cases = list(product(concurrency, per_host, chunk_sizes, range(1, runs + 1)))
+    for n, (max_concurrent, max_per_host, cs, r) in enumerate(cases, 1):
+        print(
+            f"[cyan]→ Case {n}/{len(cases)}[/cyan] max_concurrent={max_concurrent} "
+            f"max_per_host={max_per_host} chunk_size={cs / KB:.2f} KiB (run {r})"
+        )
+        with isolated_user_paths() as temp_dir:
+            res, exitcode = _run_in_process(
+                _sweep_worker,
+                urls,
+                base_url,
+                temp_dir / "downloads",
+                max_concurrent,
+                max_per_host,
+                cs,
+                r,
+            )
+        if res is None:
+            print(f"[red]error[/] the case exited with code {exitcode}")
+            continue
+
+        status_color: str = "green" if res.status == "ok" else "red"
+        print(
+            f"[{status_color}]{res.status}[/] {res.files} files "
+            f"{res.error_rate:.1%} errors in {res.duration_s:.2f} s | "
+            f"{res.mean_bps / MB:.2f} MiB/s p50={res.p50_latency_s:.3f} s "
+            f"p95={res.p95_latency_s:.3f} s peak/host={res.peak_per_host}"
+        )
+        rows.append(asdict(res))
+
+    if not rows:
+        print("[yellow]No benchmark rows collected; skipping summary write.[/yellow]")
+        return
+
+    summary_csv: Path = OUT_DIR / f"sweep_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    with open(summary_csv, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+
+    best = max(rows, key=lambda row: row["mean_bps"])
+    print(
+        f"[bold]Best throughput:[/bold] max_concurrent={best['max_concurrent']} "
+        f"max_per_host={best['max_per_host']} chunk_size={best['chunk_size']} "
+        f"({best['mean_bps'] / MB:.2f} MiB/s)"
+    )
+    print(f"[bold]Summary written:[/bold] {summary_csv}")
+
+
 def get_parsed_args() -> Namespace:
     start_chunk_size = 8 * KB  # 8 KiB
     default_chunk_sizes: list[int] = [start_chunk_size * (2**i) for i in range(6, 9)]
@@ -267,6 +703,105 @@ def get_parsed_args() -> Namespace:
         default=[],
         help="HTTP header key:value (can repeat)",
     )
+    run.add_argument(
+        "--profile",
+        type=Path,
+        metavar="PREFIX",
+        help="Profile the benchmark, writing PREFIX.pstats, PREFIX.collapsed "
+        "and PREFIX.speedscope.json",
+    )
+
+    crawl: ArgumentParser = sub.add_parser(
+        "crawl", help="Benchmark the crawlers against local fixture sites"
+    )
+    crawl.add_argument(
+        "--families",
+        nargs="+",
+        choices=list(FAMILIES),
+        default=list(FAMILIES),
+        help="Crawler families to benchmark (default: all)",
+    )
+    crawl.add_argument(
+        "--albums", type=int, default=FixtureConfig.albums, help="Albums per site"
+    )
+    crawl.add_argument(
+        "--media", type=int, default=FixtureConfig.media, help="Media per album"
+    )
+    crawl.add_argument(
+        "--image-size",
+        type=int,
+        default=FixtureConfig.image_size // KB,
+        help="Size of the images in KiB",
+    )
+    crawl.add_argument(
+        "--video-size",
+        type=int,
+        default=FixtureConfig.video_size // KB,
+        help="Size of the videos in KiB",
+    )
+    crawl.add_argument(
+        "--latency", type=float, default=0.0, help="Latency per response in ms"
+    )
+    crawl.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0.0,
+        help="Bandwidth per response in KiB/s (0 for no limit)",
+    )
+
+    sweep: ArgumentParser = sub.add_parser(
+        "sweep", help="Sweep the download concurrency, per-host limit and chunk size"
+    )
+    sweep.add_argument(
+        "urls",
+        nargs="*",
+        help="Media URLs to download (default: media of the local fixture server)",
+    )
+    sweep.add_argument(
+        "--concurrency",
+        nargs="+",
+        type=int,
+        default=[4, 8, 16, MAX_CONCURRENT_DOWNLOADS, 64],
+        help="Values of the maximum number of concurrent downloads",
+    )
+    sweep.add_argument(
+        "--per-host",
+        nargs="+",
+        type=int,
+        default=[4, 8, MAX_CONCURRENT_PER_HOST],
+        help="Values of the maximum number of concurrent requests per host",
+    )
+    sweep.add_argument(
+        "--chunk-sizes",
+        nargs="+",
+        type=int,
+        default=[DEFAULT_CHUNK_SIZE, 64 * KB, 256 * KB],
+        help="Chunk sizes in bytes",
+    )
+    sweep.add_argument(
+        "--runs", type=int, default=1, help="Repeat each case this many times"
+    )
+    sweep.add_argument(
+        "--files", type=int, default=64, help="Fixture media to download"
+    )
+    sweep.add_argument(
+        "--hosts", type=int, default=4, help="Hosts the fixture media are spread over"
+    )
+    sweep.add_argument(
+        "--file-size",
+        type=int,
+        default=FixtureConfig.image_size // KB,
+        help="Size of the fixture media in KiB",
+    )
+    sweep.add_argument(
+        "--latency", type=float, default=0.0, help="Latency per response in ms"
+    )
+    sweep.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0.0,
+        help="Bandwidth per response in KiB/s (0 for no limit)",
+    )
 
     plot: ArgumentParser = sub.add_parser("plot", help="Plot results")
     plot.add_argument(
@@ -315,6 +850,8 @@ def plot_samples(samples: list[str]) -> None:
 def main() -> None:
     install()
     args: Namespace = get_parsed_args()
+    # The profiler logs through the logger of the package
+    logger.setup_logger(PACKAGE, LOG_FILE, False, False)
 
     if args.mode == "run":
         print(
@@ -330,14 +867,39 @@ def main() -> None:
                 k, v = kv.split(":", 1)
                 headers[k.strip()] = v.strip()
 
-        asyncio.run(
-            bench_url(
-                args.url,
-                args.chunk_sizes,
-                args.runs_per_size,
-                headers,
+        with profile_session(args.profile):
+            asyncio.run(
+                bench_url(
+                    args.url,
+                    args.chunk_sizes,
+                    args.runs_per_size,
+                    headers,
+                )
             )
+    elif args.mode == "crawl":
+        config = FixtureConfig(
+            albums=args.albums,
+            media=args.media,
+            image_size=args.image_size * KB,
+            video_size=args.video_size * KB,
+            latency=args.latency / 1000,
+            bandwidth=args.bandwidth * KB,
         )
+        bench_crawl(args.families, config)
+    elif args.mode == "sweep":
+        sweep_args = (args.concurrency, args.per_host, args.chunk_sizes, args.runs)
+        if args.urls:
+            bench_sweep(args.urls, None, *sweep_args)
+        else:
+            config = FixtureConfig(
+                image_size=args.file_size * KB,
+                latency=args.latency / 1000,
+                bandwidth=args.bandwidth * KB,
+            )
+            with fixture_server(config) as base_url:
+                print(f"[bold]Fixture server:[/bold] {base_url}")
+                urls = sweep_fixture_urls(args.files, args.hosts)
+                bench_sweep(urls, base_url, *sweep_args)
     elif args.mode == "plot":
         print("[bold]Plotting sample throughput graphs...[/bold]")
         plot_samples(args.samples)
@@ -10,8 +10,8 @@ from rich.traceback import install
 from .cli import get_parsed_args
 from .commands import run
 from .config import load_config
-from .consts import (CACHE_PATH, CONFIG_PATH, EXIT_SUCCESS, LOG_FILE, LOG_PATH,
-                     PACKAGE)
+from .consts import CONFIG_PATH, DATA_PATH, LOG_FILE, LOG_PATH, PACKAGE
+from .profiling import profile_session
 from .utils import exit_session
 
 if TYPE_CHECKING:
@@ -28,12 +28,12 @@ def main() -> None:
 
     install()
 
-    for path in (CACHE_PATH, CONFIG_PATH, LOG_PATH):
+    for path in (CONFIG_PATH, DATA_PATH, LOG_PATH):
         path.mkdir(parents=True, exist_ok=True)
 
-    run(args)
-
-    exit_session(EXIT_SUCCESS)
+    with profile_session(args.profile):
+        exit_value: int = run(args)
+    exit_session(exit_value)
 
 
 if __name__ == "__main__":
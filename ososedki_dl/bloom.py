@@ -0,0 +1,168 @@
+"""Persistent memory-mapped Bloom filter."""
+
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from core_helpers.logs import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+# magic, number of bits, number of hashes, number of items added
+_HEADER = struct.Struct("<8sQQQ")
+_MAGIC = b"OSDBLOOM"
+
+
+class BloomFilter:
+    """
+    Bloom filter stored in a memory-mapped file.
+
+    Answers "definitely not present" in constant time without any I/O, while
+    positive answers may be false positives and must be confirmed against the
+    authoritative store. Keys are SHA-256 digests, so the bit positions are
+    derived from the digest itself with double hashing.
+
+    Several processes can map the same file: the writes hold an exclusive
+    `flock` on a lock file next to it, while lookups read the bits without
+    locking. Locking is skipped on platforms without `fcntl`.
+    """
+
+    def __init__(self, path: Path, num_bits: int, num_hashes: int) -> None:
+        """
+        Map the filter file, creating an empty one if it doesn't match the
+        requested geometry.
+
+        Args:
+            path (Path): The file backing the filter.
+            num_bits (int): The size of the bit array.
+            num_hashes (int): The number of bit positions per key.
+        """
+        self.path: Path = path
+        self.num_bits: int = num_bits
+        self.num_hashes: int = num_hashes
+        self.created: bool = False
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(path.with_name(f"{path.name}.lock"), "a+b")
+        self._lock_depth: int = 0
+
+        size: int = _HEADER.size + (num_bits + 7) // 8
+        with self.locked():
+            if not self._has_geometry(path, num_bits, num_hashes, size):
+                logger.debug(f"Creating Bloom filter at {path} with {num_bits} bits")
+                # Replace the file instead of truncating it, other processes
+                # may still have the previous one mapped
+                temp_path: Path = path.with_name(f"{path.name}.tmp")
+                with open(temp_path, "wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, num_bits, num_hashes, 0))
+                    f.truncate(size)
+                os.replace(temp_path, path)
+                self.created = True
+
+            self._file = open(path, "r+b")
+            self._map = mmap.mmap(self._file.fileno(), size)
+
+    @classmethod
+    def for_capacity(
+        cls, path: Path, capacity: int, error_rate: float
+    ) -> BloomFilter:
+        """
+        Create or open a filter sized to hold `capacity` keys with the given
+        false positive rate.
+
+        Args:
+            path (Path): The file backing the filter.
+            capacity (int): The number of keys the filter is sized for.
+            error_rate (float): The target false positive rate.
+
+        Returns:
+            BloomFilter: The filter.
+        """
+        num_bits: int = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        num_hashes: int = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(path, num_bits, num_hashes)
+
+    @staticmethod
+    def _has_geometry(path: Path, num_bits: int, num_hashes: int, size: int) -> bool:
+        """Check if the file holds a filter with the given geometry."""
+        try:
+            if path.stat().st_size != size:
+                return False
+            with open(path, "rb") as f:
+                magic, bits, hashes, _ = _HEADER.unpack(f.read(_HEADER.size))
+        except (OSError, struct.error):
+            return False
+        return magic == _MAGIC and bits == num_bits and hashes == num_hashes
+
+    @property
+    def count(self) -> int:
+        """Number of keys added to the filter."""
+        return _HEADER.unpack_from(self._map, 0)[3]
+
+    def _positions(self, digest: bytes) -> list[int]:
+        h1: int = int.from_bytes(digest[:8], "little")
+        h2: int = int.from_bytes(digest[8:16], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Hold the exclusive lock of the filter, shared by every process
+        mapping it, e.g. to check and rebuild the filter at once. Nested calls
+        only take the lock once.
+        """
+        if self._lock_depth == 0 and fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0 and fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def add(self, digest: bytes) -> None:
+        """
+        Add a key to the filter.
+
+        Args:
+            digest (bytes): The SHA-256 digest of the key.
+        """
+        offset: int = _HEADER.size
+        with self.locked():
+            for position in self._positions(digest):
+                index: int = offset + (position >> 3)
+                self._map[index] |= 1 << (position & 7)
+            struct.pack_into("<Q", self._map, 24, self.count + 1)
+
+    def __contains__(self, digest: bytes) -> bool:
+        offset: int = _HEADER.size
+        return all(
+            self._map[offset + (position >> 3)] & (1 << (position & 7))
+            for position in self._positions(digest)
+        )
+
+    def clear(self) -> None:
+        """Remove every key from the filter."""
+        with self.locked():
+            self._map[_HEADER.size :] = bytes(len(self._map) - _HEADER.size)
+            struct.pack_into("<Q", self._map, 24, 0)
+
+    def close(self) -> None:
+        """Flush the filter to disk and unmap it."""
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+        self._lock_file.close()
@@ -0,0 +1,219 @@
+"""Checkpoints of the crawls, so interrupted crawls can be resumed."""
+
+from __future__ import annotations
+
+import json
+import os
+from collections import deque
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from core_helpers.logs import logger
+
+from .consts import CHECKPOINT_INTERVAL_SECONDS, CHECKPOINT_PATH
+from .utils import get_url_hash
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import Any
+
+
+class CrawlCheckpoint:
+    """
+    State of the crawl of a single URL, saved to disk periodically and when
+    the crawl is interrupted.
+
+    The checkpoint holds the listing pages already discovered, the albums
+    whose media list is known but not fully downloaded yet (the pending media
+    jobs), the albums already finished and the frontier of crawlers walking a
+    queue of albums. Partially written media are kept as `.part` files next
+    to their destination and resumed by the downloader.
+
+    Every crawl keeps a checkpoint under CHECKPOINT_PATH while it runs, even
+    without `--resume`, so an interrupted crawl can always be continued. It is
+    written every CHECKPOINT_INTERVAL_SECONDS at most and removed once the
+    crawl completes.
+    """
+
+    def __init__(self, url: str, path: Path | None = None) -> None:
+        """
+        Create an empty checkpoint.
+
+        Args:
+            url (str): The URL being crawled.
+            path (Path, optional): The file the checkpoint is saved to.
+                Defaults to a file named after the URL in CHECKPOINT_PATH.
+        """
+        self.url: str = url
+        self.path: Path = path or CHECKPOINT_PATH / f"{get_url_hash(url)}.json"
+        self.pages: dict[str, Any] = {}
+        self.albums: dict[str, dict[str, Any]] = {}
+        self.done: set[str] = set()
+        self.frontier: deque[str] | None = None
+        self.visited: set[str] = set()
+        self._last_save: float = monotonic()
+        # A new checkpoint replaces any previous one on the first save
+        self._dirty: bool = True
+
+    @classmethod
+    def load(cls, url: str, path: Path | None = None) -> CrawlCheckpoint:
+        """
+        Load the checkpoint of a previous crawl of the URL, or create an empty
+        one if there is none.
+
+        Args:
+            url (str): The URL being crawled.
+            path (Path, optional): The file the checkpoint is saved to.
+
+        Returns:
+            CrawlCheckpoint: The checkpoint.
+        """
+        checkpoint = cls(url, path)
+        try:
+            state: dict[str, Any] = json.loads(
+                checkpoint.path.read_text(encoding="utf-8")
+            )
+        except FileNotFoundError:
+            logger.info(f"No checkpoint to resume for {url}")
+            return checkpoint
+        except (OSError, ValueError):
+            logger.exception(f"Ignoring unreadable checkpoint {checkpoint.path}")
+            return checkpoint
+
+        checkpoint.pages = state.get("pages", {})
+        checkpoint.albums = state.get("albums", {})
+        checkpoint.done = set(state.get("done", []))
+        frontier: list[str] | None = state.get("frontier")
+        checkpoint.frontier = None if frontier is None else deque(frontier)
+        checkpoint.visited = set(state.get("visited", []))
+        checkpoint._dirty = False
+        logger.info(
+            f"Resuming {url}: {len(checkpoint.pages)} pages discovered, "
+            f"{len(checkpoint.done)} albums done, {len(checkpoint.albums)} pending"
+        )
+        return checkpoint
+
+    def _changed(self) -> None:
+        """Mark the checkpoint as changed and save it if it is due."""
+        self._dirty = True
+        if monotonic() - self._last_save >= CHECKPOINT_INTERVAL_SECONDS:
+            self.save()
+
+    def get_page(self, url: str) -> Any:
+        """
+        Get the data extracted from a page discovered before.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            Any: The data extracted from the page, or None if it was never
+            discovered.
+        """
+        return self.pages.get(url)
+
+    def add_page(self, url: str, data: Any) -> None:
+        """
+        Record the data extracted from a discovered page, so it is not
+        fetched again when resuming.
+
+        Args:
+            url (str): The URL of the page.
+            data (Any): The JSON serializable data extracted from the page.
+        """
+        self.pages[url] = data
+        self._changed()
+
+    def get_album(self, album_url: str) -> tuple[str, list[str]] | None:
+        """
+        Get an album whose media list was known when the crawl stopped.
+
+        Args:
+            album_url (str): The URL of the album.
+
+        Returns:
+            tuple[str, list[str]] | None: The title and media URLs of the
+            album, or None if it is not pending.
+        """
+        album: dict[str, Any] | None = self.albums.get(album_url)
+        if album is None:
+            return None
+        return album["title"], album["media"]
+
+    def start_album(self, album_url: str, title: str, media_urls: list[str]) -> None:
+        """
+        Record the media jobs of an album about to be downloaded.
+
+        Args:
+            album_url (str): The URL of the album.
+            title (str): The title of the album.
+            media_urls (list[str]): The URLs of the media of the album.
+        """
+        self.albums[album_url] = {"title": title, "media": media_urls}
+        self._changed()
+
+    def finish_album(self, album_url: str) -> None:
+        """
+        Record an album as finished.
+
+        Args:
+            album_url (str): The URL of the album.
+        """
+        self.albums.pop(album_url, None)
+        self.done.add(album_url)
+        self._changed()
+
+    def is_done(self, album_url: str) -> bool:
+        """
+        Check if an album was finished before.
+
+        Args:
+            album_url (str): The URL of the album.
+
+        Returns:
+            bool: True if the album was finished.
+        """
+        return album_url in self.done
+
+    def set_frontier(self, frontier: deque[str], visited: set[str]) -> None:
+        """
+        Record the queue of albums left to crawl and the albums already seen.
+
+        The collections are kept by reference and only copied when the
+        checkpoint is saved, so the crawler updates them in place and calls
+        this method again to mark the checkpoint as changed.
+
+        Args:
+            frontier (deque[str]): The albums left to crawl, in order.
+            visited (set[str]): The albums already queued or crawled.
+        """
+        self.frontier = frontier
+        self.visited = visited
+        self._changed()
+
+    def save(self) -> None:
+        """Write the checkpoint to disk, replacing the previous one atomically."""
+        self._last_save = monotonic()
+        if not self._dirty:
+            return
+
+        state: dict[str, Any] = {
+            "url": self.url,
+            "pages": self.pages,
+            "albums": self.albums,
+            "done": sorted(self.done),
+            "frontier": None if self.frontier is None else list(self.frontier),
+            "visited": sorted(self.visited),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path: Path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(temp_path, self.path)
+        self._dirty = False
+        logger.debug(f"Saved checkpoint of {self.url} to {self.path}")
+
+    def discard(self) -> None:
+        """Remove the checkpoint once the crawl is complete."""
+        logger.debug(f"Removing checkpoint of {self.url}")
+        self.path.unlink(missing_ok=True)
+        self._dirty = False
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import configparser
+from argparse import ArgumentTypeError
 from pathlib import Path
 from typing import TYPE_CHECKING
 
@@ -11,7 +12,9 @@ from core_helpers.logs import logger
 from rich import print
 
 from .config import print_entire_config, print_specific_config_field, update_config_file
-from .consts import CONFIG_FILE, PACKAGE
+from .consts import (CONFIG_FILE, DEFAULT_DAEMON_ADDRESS, DEFAULT_HTML_PARSER,
+                     DEFAULT_LOOP_LAG_THRESHOLD_MS, DEFAULT_METRICS_ADDRESS,
+                     HTML_PARSERS, PACKAGE)
 from .consts import __desc__ as DESC
 from .consts import __version__ as VERSION
 
@@ -19,6 +22,28 @@ if TYPE_CHECKING:
     from argparse import Namespace
 
 
+def _positive_float(value: str) -> float:
+    """
+    Parse a command line value that must be a number greater than zero.
+
+    Args:
+        value (str): The value given on the command line.
+
+    Returns:
+        float: The parsed number.
+
+    Raises:
+        ArgumentTypeError: If the value is not a positive number.
+    """
+    try:
+        number: float = float(value)
+    except ValueError as e:
+        raise ArgumentTypeError(f"invalid number: '{value}'") from e
+    if not number > 0:
+        raise ArgumentTypeError(f"must be greater than 0: '{value}'")
+    return number
+
+
 def get_parsed_args() -> Namespace:
     """
     Parse and return command-line arguments.
@@ -40,6 +65,71 @@ def get_parsed_args() -> Namespace:
         type=Path,
         help="Specify the destination path for moving profiles.",
     )
+    # Batch mode input
+    g_main.add_argument(
+        "-in",
+        "--input",
+        dest="input_file",
+        metavar="FILE",
+        help="Download the URLs listed in FILE, one per line, and exit. Use "
+        "'-' to read them from the standard input.",
+    )
+    g_main.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Spread the downloads of the batch mode across N processes "
+        "sharing a job queue (0 to download in this process).",
+    )
+    # Daemon mode
+    g_main.add_argument(
+        "-dm",
+        "--daemon",
+        nargs="?",
+        const=DEFAULT_DAEMON_ADDRESS,
+        metavar="ADDRESS",
+        help="Run as a daemon downloading the jobs submitted to a local HTTP "
+        f"API on ADDRESS, either HOST:PORT or unix:PATH (default: "
+        f"{DEFAULT_DAEMON_ADDRESS}).",
+    )
+    g_main.add_argument(
+        "-m",
+        "--metrics",
+        nargs="?",
+        const=DEFAULT_METRICS_ADDRESS,
+        metavar="ADDRESS",
+        help="Serve Prometheus/OpenMetrics metrics of the downloads on "
+        f"ADDRESS/metrics, either HOST:PORT or unix:PATH (default: "
+        f"{DEFAULT_METRICS_ADDRESS}).",
+    )
+    g_main.add_argument(
+        "-t",
+        "--trace",
+        type=Path,
+        metavar="FILE",
+        help="Append the network timings of every request (DNS, connect, "
+        "time to first byte, ...) to FILE, one JSON record per line.",
+    )
+    g_main.add_argument(
+        "-pf",
+        "--profile",
+        type=Path,
+        metavar="PREFIX",
+        help="Profile the session and write PREFIX.pstats, PREFIX.collapsed "
+        "and PREFIX.speedscope.json, with the time of every crawler and phase.",
+    )
+    g_main.add_argument(
+        "-ll",
+        "--loop-lag",
+        nargs="?",
+        type=_positive_float,
+        const=DEFAULT_LOOP_LAG_THRESHOLD_MS,
+        metavar="MS",
+        help="Watch the event loop and report the calls blocking it for more "
+        f"than MS milliseconds (default: {DEFAULT_LOOP_LAG_THRESHOLD_MS:g}).",
+    )
     # Config file argument
     g_main.add_argument(
         "-f",
@@ -71,6 +161,29 @@ def get_parsed_args() -> Namespace:
         default=False,
         help="Check for cached downloads before downloading.",
     )
+    g_main.add_argument(
+        "-r",
+        "--resume",
+        action="store_true",
+        default=False,
+        help="Resume the interrupted crawls of the given URLs. Every crawl saves "
+        "a checkpoint in the state directory until it completes.",
+    )
+    g_main.add_argument(
+        "-p",
+        "--parser",
+        choices=HTML_PARSERS,
+        default=DEFAULT_HTML_PARSER,
+        help="HTML parser backend, 'auto' uses lxml when it is installed.",
+    )
+    g_main.add_argument(
+        "-pw",
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="Number of worker processes parsing big pages (0 to parse in "
+        "the main process).",
+    )
 
     g_user = parser.add_argument_group("User Options")
     g_user.add_argument(
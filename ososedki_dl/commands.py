@@ -4,24 +4,24 @@ from __future__ import annotations
 import asyncio
 from typing import TYPE_CHECKING
 
-from aiohttp import ClientSession
-from aiohttp_client_cache.session import CachedSession
 from core_helpers.logs import logger
 from core_helpers.utils import print_welcome
-from fake_useragent import UserAgent
 from rich import print
 
 from .cli import handle_config_command
-from .consts import (CONFIG_FILE, GITHUB, LOG_FILE, MIN_USER_AGENT_VERSION,
-                     PACKAGE)
+from .consts import (CONFIG_FILE, EXIT_FAILURE, EXIT_INTERRUPTED,
+                     EXIT_SUCCESS, EXIT_USAGE, GITHUB, LOG_FILE, PACKAGE)
 from .consts import __desc__ as DESC
 from .consts import __version__ as VERSION
 from .crawlers import crawlers as crawler_modules
-from .scrapper import generic_download
-from .utils import get_user_input
+from .daemon import JobServer
+from .scrapper import generic_download, print_summary, runtime
+from .utils import get_user_input, parse_address, read_urls
+from .workers import run_workers
 
 if TYPE_CHECKING:
     from argparse import Namespace
+    from pathlib import Path
 
 
 async def run_main_loop(args: Namespace) -> None:
@@ -33,31 +33,109 @@ async def run_main_loop(args: Namespace) -> None:
     """
     logger.debug("Entering main download loop.")
 
-    SessionType = CachedSession if args.cache else ClientSession
-    session_type_name = "cached" if args.cache else "non-cached"
-    msg = f"Using {session_type_name} session for downloads."
-    print(msg)
-    logger.info(msg)
-
-    ua = UserAgent(min_version=MIN_USER_AGENT_VERSION)
-    logger.debug(f"Generated User-Agent: {ua.random}")
-    headers: dict[str, str] = {"User-Agent": ua.random}
-    async with SessionType(headers=headers) as session:
+    async with runtime(args) as (session, scheduler):
         while True:
             urls, download_path = get_user_input(args.dest_path)
             args.dest_path = download_path
-            await generic_download(session, urls, args)
+            await generic_download(session, urls, args, scheduler)
+
+
+async def run_batch(args: Namespace, urls: list[str]) -> list[dict[str, str]]:
+    """
+    Download a batch of URLs without prompting the user.
+
+    Args:
+        args (Namespace): Parsed command line arguments.
+        urls (list[str]): The URLs to download.
+
+    Returns:
+        list[dict[str, str]]: The results of all the downloads.
+    """
+    logger.debug(f"Downloading a batch of {len(urls)} URLs.")
+
+    async with runtime(args) as (session, scheduler):
+        return await generic_download(session, urls, args, scheduler)
 
 
-def run(args: Namespace) -> None:
+async def run_daemon(args: Namespace, address: tuple[str, int] | Path) -> None:
+    """
+    Keep a session and scheduler warm and serve the jobs submitted to the
+    daemon API until the process is stopped.
+
+    Args:
+        args (Namespace): Parsed command line arguments.
+        address (tuple[str, int] | Path): The address to listen on.
+    """
+    logger.debug("Starting daemon.")
+
+    async with runtime(args) as (session, scheduler):
+        await JobServer(session, scheduler, args).serve(address)
+
+
+def run_batch_command(args: Namespace) -> int:
+    """
+    Download the URLs listed in the input file of the batch mode.
+
+    Args:
+        args (Namespace): Parsed command line arguments.
+
+    Returns:
+        int: EXIT_SUCCESS if every URL was downloaded, EXIT_FAILURE if some
+        download failed or some line is not a valid URL, EXIT_USAGE if the
+        input cannot be read or has no URLs, and EXIT_INTERRUPTED if the user
+        stopped the batch.
+    """
+    try:
+        urls, invalid = read_urls(args.input_file)
+    except (OSError, UnicodeDecodeError) as e:
+        logger.exception(f"Cannot read the URLs from {args.input_file}")
+        print(f"[bold red]Error:[/] Cannot read the URLs: {e}")
+        return EXIT_USAGE
+
+    for line in invalid:
+        logger.error(f"Invalid URL in input: {line}")
+        print(f"[yellow]Ignoring invalid URL: {line}[/]")
+    if not urls:
+        print("[bold red]Error:[/] No URLs to download.")
+        return EXIT_USAGE
+
+    print(f"Downloading {len(urls)} URLs to {args.dest_path}")
+    try:
+        if args.workers > 0:
+            if args.metrics:
+                print("[yellow]Metrics are not served in the worker mode[/]")
+            results: list[dict[str, str]] = run_workers(args, urls)
+            print_summary(results)
+        else:
+            results = asyncio.run(run_batch(args, urls))
+    except KeyboardInterrupt:
+        logger.info("Batch interrupted by the user.")
+        return EXIT_INTERRUPTED
+
+    if invalid or any(r["status"].startswith("error") for r in results):
+        return EXIT_FAILURE
+    return EXIT_SUCCESS
+
+
+def run(args: Namespace) -> int:
     """
     Run a command if a matching CLI flag is found.
 
     Args:
         args (Namespace): Parsed command line arguments.
+
+    Returns:
+        int: The exit value of the command.
     """
     logger.debug(f"Running commands with args: {args}")
 
+    if args.metrics:
+        try:
+            parse_address(args.metrics)
+        except ValueError as e:
+            print(f"[bold red]Error:[/] {e}")
+            return EXIT_USAGE
+
     if args.config_dir:
         logger.info("User requested config directory.")
         print(CONFIG_FILE)
@@ -72,6 +150,20 @@ def run(args: Namespace) -> None:
         urls: list[str] = sorted(crawler.site_url for crawler in crawler_modules)
         for url in urls:
             print(url)
+    elif args.daemon:
+        logger.info("Starting daemon mode.")
+        try:
+            address: tuple[str, int] | Path = parse_address(args.daemon)
+        except ValueError as e:
+            print(f"[bold red]Error:[/] {e}")
+            return EXIT_USAGE
+        try:
+            asyncio.run(run_daemon(args, address))
+        except KeyboardInterrupt:
+            pass
+    elif args.input_file:
+        logger.info("Starting batch mode.")
+        return run_batch_command(args)
     else:
         logger.info("Starting main loop.")
         print_welcome(PACKAGE, VERSION, DESC, GITHUB)
@@ -79,3 +171,5 @@ def run(args: Namespace) -> None:
             asyncio.run(run_main_loop(args))
         except KeyboardInterrupt:
             pass
+
+    return EXIT_SUCCESS
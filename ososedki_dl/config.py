@@ -109,6 +109,13 @@ def load_config(args: Namespace) -> None:
     """
     logger.debug("Configuring paths")
 
+    unattended: bool = bool(args.input_file or args.daemon)
+    if not CONFIG_FILE.exists() and unattended and not args.config_file:
+        # The batch and daemon modes run unattended and cannot prompt
+        logger.info("No configuration file, using the default paths")
+        args.dest_path = Path(args.dest_path or DEFAULT_DEST_PATH).resolve()
+        return
+
     if not CONFIG_FILE.exists():
         # Warn the user that the configuration file doesn't exist
         print(
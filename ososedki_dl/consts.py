@@ -18,25 +18,81 @@ GITHUB = (
 )
 PACKAGE: str = metadata_info["Name"]
 
-CACHE_PATH: Path = Path(".cache").resolve()
+# Directory of empty per-URL files used by older versions, imported into the
+# download ledger on first run
+LEGACY_CACHE_PATH: Path = Path(".cache").resolve()
 LOG_PATH: Path = get_user_path(package=PACKAGE, path_type=PathType.LOG)
 LOG_FILE: Path = Path(LOG_PATH).resolve() / f"{PACKAGE}.log"
 CONFIG_PATH: Path = get_user_path(PACKAGE, PathType.CONFIG)
 CONFIG_FILE: Path = CONFIG_PATH / f"{PACKAGE}.ini"
+DATA_PATH: Path = get_user_path(PACKAGE, PathType.DATA)
+INDEX_FILE: Path = DATA_PATH / "index.sqlite3"
+LEDGER_FILE: Path = DATA_PATH / "ledger.sqlite3"
+QUEUE_FILE: Path = DATA_PATH / "queue.sqlite3"
+STATE_PATH: Path = get_user_path(PACKAGE, PathType.STATE)
+CHECKPOINT_PATH: Path = STATE_PATH / "checkpoints"
 
 SOCK_TIMEOUT = 30
 MAX_RETRIES = 5
 MAX_SLEEP_SECONDS = 30
 MAX_CONCURRENT_DOWNLOADS = 30
+MAX_CONCURRENT_PER_HOST = 16
+INITIAL_CONCURRENT_PER_HOST = 4
+AIMD_INCREASE = 1.0
+AIMD_DECREASE_FACTOR = 0.5
+AIMD_COOLDOWN_SECONDS = 2.0
 MIN_USER_AGENT_VERSION = 120.0
+LEDGER_BATCH_SIZE = 256
+LEDGER_FLUSH_SECONDS = 5.0
+BLOOM_CAPACITY = 1_000_000
+BLOOM_ERROR_RATE = 0.01
+CHECKPOINT_INTERVAL_SECONDS = 30.0
 
 KB = 1024
 PERCENTAGE_FORMAT = "[progress.percentage]{task.percentage:>5.1f}%"
 DEFAULT_ALBUM_TITLE = "Unknown"
 DEFAULT_CHUNK_SIZE = 16 * KB
+SEGMENTED_DOWNLOAD_THRESHOLD = 32 * KB * KB
+SEGMENTED_DOWNLOAD_PARTS = 4
 DEFAULT_DEST_PATH: Path = Path("downloads")
+# Photos requested per load-more call, the API answers at most this many
 DEFAULT_PAGINATION_SIZE = 100
+# Load-more calls sent concurrently while walking an album
+PAGINATION_WINDOW = 4
+# Albums of a model page processed at the same time, and albums discovered
+# ahead of them
+MAX_CONCURRENT_ALBUMS = 8
+ALBUM_QUEUE_SIZE = 64
+# URLs of a batch crawled at the same time, their downloads still share the
+# caps of the scheduler
+MAX_CONCURRENT_URLS = 4
+# The daemon listens on localhost only, "unix:PATH" listens on a Unix socket
+DEFAULT_DAEMON_ADDRESS = "127.0.0.1:8765"
+# Jobs of the daemon running at the same time, and finished jobs remembered
+MAX_CONCURRENT_JOBS = 4
+DAEMON_JOB_HISTORY = 1000
+DEFAULT_METRICS_ADDRESS = "127.0.0.1:9464"
+# Jobs of the worker mode are leased for a while and renewed while running,
+# a job whose workers crashed this many times is given up
+QUEUE_LEASE_SECONDS = 60.0
+QUEUE_MAX_ATTEMPTS = 3
+QUEUE_POLL_SECONDS = 1.0
+WORKER_CONCURRENT_JOBS = 8
 DEFAULT_RESPONSE_PROPERTY = "text"
+# BeautifulSoup tree builders, "auto" picks the fastest one installed
+HTML_PARSERS: tuple[str, ...] = ("auto", "lxml", "html.parser")
+DEFAULT_HTML_PARSER = "auto"
+# Smaller documents are parsed on the event loop, shipping them to a worker
+# process costs more than parsing them
+PARSE_OFFLOAD_THRESHOLD = 256 * KB
+# Seconds between two stack samples of the profiler
+PROFILE_INTERVAL = 0.005
+# Seconds between two heartbeats of the loop monitor, and the default lag in
+# milliseconds above which the loop is considered blocked
+LOOP_LAG_INTERVAL = 0.05
+DEFAULT_LOOP_LAG_THRESHOLD_MS = 100.0
 
 EXIT_SUCCESS = 0
 EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
@@ -4,6 +4,8 @@ from __future__ import annotations
 
 import asyncio
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from functools import partial
 from typing import TYPE_CHECKING
 from urllib.parse import urlparse
 
@@ -13,20 +15,34 @@ from core_helpers.logs import logger
 from requests import HTTPError
 from rich import print
 
-from ..consts import MAX_CONCURRENT_DOWNLOADS, MAX_RETRIES
-from ..download import Downloader
+from ..checkpoint import CrawlCheckpoint
+from ..consts import MAX_CONCURRENT_PER_HOST, MAX_RETRIES
+from ..download import Downloader, NotModifiedError
+from ..metrics import ALBUMS, CACHE_HITS, MEDIA
+from ..parsing import parse_html, resolve_parser, run_extractor
 from ..progress import AlbumProgress
+from ..scheduler import DownloadScheduler
 from ..utils import get_final_path
 
 if TYPE_CHECKING:
     from argparse import Namespace
+    from collections.abc import Callable, Collection
     from pathlib import Path
-    from typing import ClassVar
+    from typing import Any, ClassVar, TypeVar
 
+    from bs4 import SoupStrainer
     from rich.progress import TaskID
 
     from ..download import SessionType
 
+    T = TypeVar("T")
+
+# When set, albums are handed to this callback instead of being processed
+# right away, so the worker processes can share them through the job queue
+album_sink: ContextVar[
+    Callable[[BaseCrawler, str, str | None, list[str] | None], None] | None
+] = ContextVar("album_sink", default=None)
+
 
 class BaseCrawler(ABC):
     """Abstract base class for crawlers, providing common functionality."""
@@ -35,13 +51,28 @@ class BaseCrawler(ABC):
     site_aliases: ClassVar[tuple[str, ...]] = ()
     base_image_path: ClassVar[str | None] = None
     headers: ClassVar[dict[str, str] | None] = None
-    max_concurrent_downloads: ClassVar[int] = MAX_CONCURRENT_DOWNLOADS
+    max_concurrent_downloads: ClassVar[int] = MAX_CONCURRENT_PER_HOST
+    # Page and API requests per second allowed against each domain, None means
+    # no limit. Media downloads are only bound by the concurrency caps
+    rate_limit: ClassVar[float | None] = None
+    rate_limit_burst: ClassVar[int] = 1
+    # Elements built into the tree by fetch_soup, None means the whole page
+    parse_only: ClassVar[SoupStrainer | None] = None
 
     session: SessionType
+    scheduler: DownloadScheduler
     download_path: Path
     downloader: Downloader
+    parser: str
+    resume: bool
+    checkpoint: CrawlCheckpoint | None
 
-    def __init__(self, session: SessionType, args: Namespace) -> None:
+    def __init__(
+        self,
+        session: SessionType,
+        args: Namespace,
+        scheduler: DownloadScheduler | None = None,
+    ) -> None:
         """
         Initialize the BaseCrawler with a given crawling context.
 
@@ -49,14 +80,28 @@ class BaseCrawler(ABC):
             session (SessionType): The HTTP session to use for requests.
             args (Namespace): The command-line arguments containing context such as
                 download path and cache checking.
+            scheduler (DownloadScheduler, optional): The run-wide scheduler the
+                media jobs are submitted to. A private one is created if not
+                provided.
         """
         logger.debug(
             f"Initialized {self.__class__.__name__} with site URL: {self.site_url}"
         )
         self.session = session
+        self.scheduler = scheduler or DownloadScheduler()
         self.download_path = args.dest_path
+        self.parser = resolve_parser(args.parser)
+        self.resume = args.resume
+        self.checkpoint = None
         self.downloader = Downloader(
-            self.session, self.headers, args.check_cache, debug=args.debug
+            self.session,
+            self.headers,
+            args.check_cache,
+            debug=args.debug,
+            scheduler=self.scheduler,
+            rate_limit=self.rate_limit,
+            rate_limit_burst=self.rate_limit_burst,
+            crawler=self.__class__.__name__,
         )
 
     @property
@@ -122,6 +167,46 @@ class BaseCrawler(ABC):
             "Each crawler must implement its own get_media_urls method"
         )
 
+    def album_page_lists_media(self) -> bool:
+        """
+        Tell whether the album page alone lists every media of the album, so
+        an unchanged page means an unchanged album. Crawlers gathering the
+        media from other requests, like further pages or an API, return False.
+
+        Returns:
+            bool: Whether a 304 for the album page covers the whole album.
+        """
+        return True
+
+    async def crawl(self, url: str) -> list[dict[str, str]]:
+        """
+        Downloads the given URL under a checkpoint, which is saved
+        periodically and when the crawl is interrupted, and picked up again
+        when resuming.
+
+        Args:
+            url (str): The URL to crawl and extract data from.
+
+        Returns:
+            list[dict[str, str]]: A list of dictionaries containing extracted
+            data.
+        """
+        if self.resume:
+            self.checkpoint = CrawlCheckpoint.load(url)
+        else:
+            self.checkpoint = CrawlCheckpoint(url)
+
+        try:
+            results: list[dict[str, str]] = await self.download(url)
+        except BaseException:
+            self.checkpoint.save()
+            logger.info(f"Saved checkpoint of the interrupted crawl of {url}")
+            print(f"[yellow]Crawl of {url} stopped, use --resume to continue it[/]")
+            raise
+
+        self.checkpoint.discard()
+        return results
+
     async def download(self, url: str) -> list[dict[str, str]]:
         """
         Asynchronously downloads and parses content from the specified URL.
@@ -146,28 +231,86 @@ class BaseCrawler(ABC):
 
     # region Fetching functions
 
-    async def fetch_soup(self, url: str) -> BeautifulSoup:
+    async def fetch_soup(self, url: str, conditional: bool = False) -> BeautifulSoup:
         """
         Fetches HTML and returns a BeautifulSoup object.
 
         Args:
             url (str): The URL to fetch and parse.
+            conditional (bool, optional): If True, send the validators stored
+                for the page so an unchanged page is not downloaded again.
+                Defaults to False.
 
         Returns:
             BeautifulSoup: Parsed HTML content of the page.
 
         Raises:
             ValueError: If the fetched HTML content is empty or cannot be parsed.
+            NotModifiedError: If the request is conditional and the page has
+                not changed.
         """
         logger.debug(f"Fetching soup for URL: {url}")
         # print(f"Fetching {url}")
 
-        html_content: str = await self.downloader.fetch(url)
+        html_content: str = await self.downloader.fetch(url, conditional=conditional)
         if not html_content:
             logger.error(f"Failed to fetch {url}: empty HTML content")
             raise ValueError(f"Empty HTML content received from {url}")
 
-        return BeautifulSoup(html_content, "html.parser")
+        return self.parse_html(html_content, self.parse_only)
+
+    async def fetch_extract(
+        self,
+        url: str,
+        extract: Callable[..., T],
+        *args: Any,
+        final_statuses: Collection[int] = (),
+    ) -> T:
+        """
+        Fetches HTML and extracts plain data from it, in the parse pool when
+        the page is big.
+
+        Args:
+            url (str): The URL to fetch.
+            extract (Callable[..., T]): Module level function called with the
+                HTML, the parser backend and `args`, returning plain data
+                instead of a parse tree.
+            *args: Additional arguments for the extraction function.
+            final_statuses (Collection[int], optional): Error statuses raised
+                on the first attempt instead of being retried. Defaults to none.
+
+        Returns:
+            T: The extracted data.
+
+        Raises:
+            ValueError: If the fetched HTML content is empty.
+        """
+        logger.debug(f"Fetching and extracting data from URL: {url}")
+
+        html_content: str = await self.downloader.fetch(
+            url, final_statuses=final_statuses
+        )
+        if not html_content:
+            logger.error(f"Failed to fetch {url}: empty HTML content")
+            raise ValueError(f"Empty HTML content received from {url}")
+
+        return await run_extractor(extract, html_content, self.parser, *args)
+
+    def parse_html(
+        self, markup: str, parse_only: SoupStrainer | None = None
+    ) -> BeautifulSoup:
+        """
+        Parses HTML with the parser backend selected for the run.
+
+        Args:
+            markup (str): The HTML to parse.
+            parse_only (SoupStrainer, optional): Only the elements matching the
+                strainer are built into the tree.
+
+        Returns:
+            BeautifulSoup: Parsed HTML content.
+        """
+        return parse_html(markup, self.parser, parse_only)
 
     async def download_media_items(
         self, media_urls: list[str], album_title: str
@@ -178,21 +321,26 @@ class BaseCrawler(ABC):
 
         album_path: Path = get_final_path(self.download_path, album_title)
 
-        # 1. Create a semaphore to limit concurrent network requests
-        semaphore = asyncio.Semaphore(self.max_concurrent_downloads)
-        logger.debug(
-            f"Using a semaphore with max {self.max_concurrent_downloads} concurrent downloads"
-        )
-
-        # 2. Create a worker wrapper that respects the semaphore
-        async def sem_worker(url: str) -> dict[str, str]:
-            async with semaphore:
-                return await self.downloader.download_and_save_media(url, album_path)
-
-        # 3. Create the tasks using the wrapper instead of calling the method directly
-        tasks = [sem_worker(url) for url in media_urls]
-
         results: list[dict[str, str]] = []
+        if self.downloader.check_cache:
+            # A single bulk query for the whole album instead of one per URL
+            cached: set[str] = self.downloader.ledger.contains_many(media_urls)
+            logger.info(f"Skipping {len(cached)} media items already downloaded")
+            CACHE_HITS.inc("ledger", amount=len(cached))
+            results = [{"url": url, "status": "skipped"} for url in cached]
+            media_urls = [url for url in media_urls if url not in cached]
+
+        # Submit every media job to the run-wide scheduler, which enforces the
+        # global and per-host caps across all the albums being processed
+        tasks = [
+            self.scheduler.submit(
+                url,
+                partial(self.downloader.download_and_save_media, url, album_path),
+                limit=self.max_concurrent_downloads,
+            )
+            for url in media_urls
+        ]
+
         with AlbumProgress() as progress:
             task: TaskID = progress.add_task(
                 f"Downloading {album_title}...", total=len(media_urls)
@@ -203,6 +351,9 @@ class BaseCrawler(ABC):
                 progress.advance(task)
                 logger.info(f"Downloaded: {result['url']} - Status: {result['status']}")
 
+        crawler_name: str = self.__class__.__name__
+        for result in results:
+            MEDIA.inc(crawler_name, result["status"].split(":")[0])
         return results
 
     # endregion Fetching functions
@@ -224,6 +375,14 @@ class BaseCrawler(ABC):
         Retries up to five times on extraction errors. Downloads all found media
         items to a computed album path and returns a list of download results.
 
+        The album page is requested conditionally when its validators were
+        stored by a previous complete run, and an unchanged album is skipped
+        without downloading anything. Albums whose media don't all come from
+        the album page are always scanned. When resuming a
+        crawl, finished albums are skipped and pending ones only download the
+        media missing from the ledger, without fetching the album page again.
+        In the worker mode the album is queued for any worker to process.
+
         Args:
             album_url (str): The URL of the album page to process.
             title (str, optional): Fallback title for the album.
@@ -233,11 +392,25 @@ class BaseCrawler(ABC):
 
         Returns:
             list[dict[str, str]]: A list of dictionaries containing the results of
-            each media download or an empty list otherwise.
+            each media download, empty for a skipped album.
         """
         logger.debug(f"Processing album: {album_url}")
 
         album_url = album_url.rstrip("/")
+        sink = album_sink.get()
+        if sink is not None:
+            sink(self, album_url, title, media_urls)
+            return []
+        if self.checkpoint:
+            if self.checkpoint.is_done(album_url):
+                logger.info(f"Album finished before the interruption: {album_url}")
+                return []
+            pending: tuple[str, list[str]] | None = self.checkpoint.get_album(album_url)
+            if pending:
+                return await self._resume_album(album_url, *pending)
+
+        # Media URLs given by the caller may come from more than the page
+        conditional: bool = media_urls is None and self.album_page_lists_media()
         retries = 0
 
         while retries <= MAX_RETRIES:
@@ -247,7 +420,7 @@ class BaseCrawler(ABC):
                 )
                 print(f"Retrying ({retries}/{MAX_RETRIES}) for album: {album_url}")
             try:
-                soup = await self.fetch_soup(album_url)
+                soup = await self.fetch_soup(album_url, conditional=conditional)
 
                 # Extract the title if a title_extractor is provided; otherwise, use the given title
                 if not title:
@@ -259,16 +432,71 @@ class BaseCrawler(ABC):
                 media_urls = list(set(media_urls))
                 # print(f"Title: {title}")
                 # print(f"Media URLs: {len(media_urls)}")
+            except NotModifiedError:
+                logger.info(f"Album not modified since the last run: {album_url}")
+                print(f"Album unchanged, skipping: {album_url}")
+                if self.checkpoint:
+                    self.checkpoint.finish_album(album_url)
+                ALBUMS.inc(self.__class__.__name__, "unchanged")
+                return []
             except (TypeError, ValueError, ClientResponseError, HTTPError) as e:
                 logger.exception(f"Error processing album {album_url}")
                 print(f"Failed to process album: {e}")
                 retries += 1
                 continue
 
-            return await self.download_media_items(media_urls, title)
-
+            if self.checkpoint:
+                self.checkpoint.start_album(album_url, title, media_urls)
+            results: list[dict[str, str]] = await self.download_media_items(
+                media_urls, title
+            )
+            if conditional:
+                # Trust the album page only once all of its media is on disk
+                if any(result["status"].startswith("error") for result in results):
+                    self.downloader.discard_validators(album_url)
+                else:
+                    self.downloader.save_validators(album_url)
+            if self.checkpoint:
+                self.checkpoint.finish_album(album_url)
+            ALBUMS.inc(self.__class__.__name__, "done")
+            return results
+
+        self.downloader.discard_validators(album_url)
         logger.error(f"Max retries reached for {album_url}. Skipping...")
         print(f"ERROR: Max retries reached for {album_url}. Skipping...")
+        ALBUMS.inc(self.__class__.__name__, "failed")
         return []
 
+    async def _resume_album(
+        self, album_url: str, title: str, media_urls: list[str]
+    ) -> list[dict[str, str]]:
+        """
+        Downloads the media of an album left pending by an interrupted crawl.
+
+        Args:
+            album_url (str): The URL of the album.
+            title (str): The title of the album.
+            media_urls (list[str]): The media URLs of the album.
+
+        Returns:
+            list[dict[str, str]]: A list of dictionaries containing the results
+            of each media download.
+        """
+        downloaded: set[str] = self.downloader.ledger.contains_many(media_urls)
+        CACHE_HITS.inc("ledger", amount=len(downloaded))
+        logger.info(
+            f"Resuming album {album_url}: {len(media_urls) - len(downloaded)} "
+            f"of {len(media_urls)} media left"
+        )
+        results: list[dict[str, str]] = [
+            {"url": url, "status": "skipped"} for url in downloaded
+        ]
+        results += await self.download_media_items(
+            [url for url in media_urls if url not in downloaded], title
+        )
+        if self.checkpoint:
+            self.checkpoint.finish_album(album_url)
+        ALBUMS.inc(self.__class__.__name__, "done")
+        return results
+
     # endregion Core album logic
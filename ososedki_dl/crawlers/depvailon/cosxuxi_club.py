@@ -21,6 +21,11 @@ class CosxuxiClubCrawler(BaseCrawler):
     title_separator: str | None = " - "
     content_div: str = "div.contentme"
 
+    @override
+    def album_page_lists_media(self) -> bool:
+        """The images of an album are spread over several pages."""
+        return False
+
     @override
     def get_album_title(self, soup: BeautifulSoup, url: str) -> str:
         """
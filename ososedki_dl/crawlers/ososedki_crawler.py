@@ -3,18 +3,23 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import re
 from abc import ABC
-from itertools import chain
+from html import unescape
 from typing import TYPE_CHECKING
 from urllib.parse import parse_qs, urlencode, urlparse
 
-from bs4 import BeautifulSoup, NavigableString, Tag
+from aiohttp.client_exceptions import ClientResponseError
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer, Tag
 from core_helpers.logs import logger
 from rich import print
 from typing_extensions import override
 
-from ..consts import DEFAULT_ALBUM_TITLE, DEFAULT_PAGINATION_SIZE
+from ..consts import (ALBUM_QUEUE_SIZE, DEFAULT_ALBUM_TITLE,
+                      DEFAULT_PAGINATION_SIZE, MAX_CONCURRENT_ALBUMS,
+                      PAGINATION_WINDOW)
+from ..parsing import parse_html, run_extractor
 from .base_crawler import BaseCrawler
 
 if TYPE_CHECKING:
@@ -31,6 +36,80 @@ if TYPE_CHECKING:
         limit: int
 
 
+# href of the anchors in the photo snippets of the load-more API
+_HREF_PATTERN = re.compile(r"""<a\s[^>]*?href\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+
+# Page number of the pagination links of the listing pages
+_PAGE_PATTERN = re.compile(r"[?&]page=(\d+)")
+
+
+def _extract_listing(
+    html: str, parser: str, site_url: str, album_path: str
+) -> tuple[list[str], int]:
+    """
+    Extract the album URLs listed on a model, cosplay or fandom page, along
+    with the highest page number linked by its pagination.
+
+    Args:
+        html (str): The HTML of the listing page.
+        parser (str): The HTML parser backend.
+        site_url (str): The URL of the site.
+        album_path (str): The path prefix of the album links.
+
+    Returns:
+        tuple[list[str], int]: The unique album URLs found on the page and the
+        highest page number linked, or 0 if there is no pagination.
+    """
+    soup: BeautifulSoup = parse_html(html, parser, SoupStrainer("a"))
+    albums: list[str] = list(
+        {
+            f"{site_url}{a['href']}"
+            for a in soup.find_all(
+                "a", href=lambda href: href and href.startswith(album_path)
+            )
+        }
+    )
+    last_page: int = max(
+        (
+            int(match.group(1))
+            for a in soup.find_all("a", href=True)
+            if (match := _PAGE_PATTERN.search(a["href"]))
+        ),
+        default=0,
+    )
+    return albums, last_page
+
+
+def _extract_photo_links(body: str, base_media_url: str) -> tuple[int, list[str]]:
+    """
+    Extract the image URLs from a response of the load-more photos API.
+
+    The snippets are tiny and regular, so the first anchor pointing to the
+    media host is matched with a compiled pattern instead of parsing every
+    snippet into a tree.
+
+    Args:
+        body (str): The JSON body of the response.
+        base_media_url (str): The URL prefix of the images.
+
+    Returns:
+        tuple[int, list[str]]: The number of photos in the response and the
+        image URLs found in them.
+    """
+    photos: list[dict[str, str]] = json.loads(body)["photos"]
+
+    images: list[str] = []
+    for photo in photos:
+        for match in _HREF_PATTERN.finditer(photo["html"]):
+            href: str = unescape(match.group(1))
+            if base_media_url in href:
+                images.append(href)
+                break
+
+    return len(photos), images
+
+
 class OsosedkiBaseCrawler(BaseCrawler, ABC):
     """Base class for crawlers of ososedki and clone sites."""
 
@@ -40,6 +119,15 @@ class OsosedkiBaseCrawler(BaseCrawler, ABC):
     fandom_url: str | None = None
     button_class: str | None = None
     pagination: bool
+    rate_limit = 10.0
+    rate_limit_burst = 10
+    # Albums, images and titles are only ever looked up in these elements
+    parse_only = SoupStrainer(["a", "title", "meta", "link"])
+
+    @override
+    def album_page_lists_media(self) -> bool:
+        """Paginated albums load their images from the load-more API."""
+        return not self.pagination
 
     def _get_article_title(self, soup: BeautifulSoup) -> str:
         logger.debug("Extracting article title from soup")
@@ -133,21 +221,52 @@ class OsosedkiBaseCrawler(BaseCrawler, ABC):
         logger.info(f"Extracted title: {title}")
         return title
 
+    async def _fetch_photos_page(
+        self, url: str, payload: PayloadType, offset: int, limit: int
+    ) -> tuple[int, list[str]]:
+        """
+        Fetches a page of the load-more photos API.
+
+        Args:
+            url (str): The URL of the API.
+            payload (PayloadType): The base payload of the album.
+            offset (int): The offset of the first photo.
+            limit (int): The number of photos requested.
+
+        Returns:
+            tuple[int, list[str]]: The number of photos returned and the image
+            URLs found in them.
+        """
+        page: PayloadType = {**payload, "offset": offset, "limit": limit}
+        body: str = await self.downloader.fetch(url, "POST", json=page)
+        count, links = await run_extractor(
+            _extract_photo_links, body, self.base_media_url
+        )
+        logger.info(f"Fetched {count} photos from offset {offset}")
+        return count, links
+
     async def _extract_paginated_images(
         self,
         owner_id: str,
         album_id: str,
         pagination_size: int = DEFAULT_PAGINATION_SIZE,
+        window: int = PAGINATION_WINDOW,
     ) -> list[str]:
         """
         Asynchronously retrieves all image URLs from a paginated album using
         the site's API.
 
+        A first page shorter than the page size holds the whole album. The
+        following pages are requested in windows of concurrent offsets until
+        the first short page.
+
         Args:
             owner_id (str): The owner ID of the album.
             album_id (str): The album ID to fetch images from.
             pagination_size (int): Number of images to fetch per request. Defaults to
                 DEFAULT_PAGINATION_SIZE.
+            window (int): Number of pages requested concurrently. Defaults to
+                PAGINATION_WINDOW.
 
         Returns:
             list[str]: A list of image URLs extracted from all pages of the
@@ -169,39 +288,30 @@ class OsosedkiBaseCrawler(BaseCrawler, ABC):
             "limit": pagination_size,
         }
 
-        while True:
-            try:
-                data = await self.downloader.fetch(
-                    url, "POST", response_property="json", json=payload
-                )
-            except Exception as e:
-                logger.error(f"Failed to fetch paginated images: {e}")
-                print(f"ERROR: Failed to fetch paginated images: {e}")
-                break
-            photos: list[dict[str, str]] = data["photos"]
-            if not photos:
-                break
+        try:
+            count, links = await self._fetch_photos_page(url, payload, 0, pagination_size)
+            images.extend(links)
+            offset: int = count
 
-            logger.info(f"Fetched {len(photos)} photos from offset {payload['offset']}")
-            for photo in photos:
-                soup = BeautifulSoup(photo["html"], "html.parser")
-                anchor: Tag | NavigableString | None = soup.find(
-                    "a", href=lambda href: self.base_media_url in href
+            while count == pagination_size:
+                offsets: range = range(
+                    offset, offset + window * pagination_size, pagination_size
                 )
-                if not anchor or isinstance(anchor, NavigableString):
-                    continue
-                href: str | list[str] | None = anchor.get("href")
-                if not href:
-                    continue
-                if isinstance(href, list):
-                    href = href[0]
-                logger.debug(f"Found image URL: {href}")
-                images.append(href)
-
-            if len(photos) < pagination_size:
-                break
-
-            payload["offset"] += pagination_size
+                pages: list[tuple[int, list[str]]] = await asyncio.gather(
+                    *(
+                        self._fetch_photos_page(url, payload, page, pagination_size)
+                        for page in offsets
+                    )
+                )
+                for count, links in pages:
+                    images.extend(links)
+                    if count < pagination_size:
+                        # Everything past the first short page is empty
+                        break
+                offset += window * pagination_size
+        except Exception as e:
+            logger.error(f"Failed to fetch paginated images: {e}")
+            print(f"ERROR: Failed to fetch paginated images: {e}")
 
         return images
 
@@ -316,20 +426,136 @@ class OsosedkiBaseCrawler(BaseCrawler, ABC):
         logger.info(f"Found {len(images)} images after alternative search")
         return images
 
+    async def _fetch_listing_page(
+        self, url: str, page: int, probe: bool = False
+    ) -> tuple[list[str], int]:
+        """
+        Fetches a listing page of a model, cosplay or fandom.
+
+        Args:
+            url (str): The URL of the listing without query parameters.
+            page (int): The page number.
+            probe (bool, optional): Whether the page may be past the end, so a
+                404 is not retried. Other errors are retried as usual. Defaults
+                to False.
+
+        Returns:
+            tuple[list[str], int]: The album URLs on the page and the highest
+            page number it links to. Pages past the end have no albums.
+        """
+        page_url: str = f"{url}?page={page}"
+        if self.checkpoint and (cached := self.checkpoint.get_page(page_url)):
+            logger.debug(f"Using albums of page {page_url} from the checkpoint")
+            return cached[0], cached[1]
+
+        logger.debug(f"Fetching albums from page {page_url}")
+        try:
+            albums, last_page = await self.fetch_extract(
+                page_url,
+                _extract_listing,
+                self.site_url,
+                self.album_path,
+                final_statuses=(404,) if probe else (),
+            )
+        except ClientResponseError as e:
+            if e.status != 404:
+                raise
+            albums, last_page = [], 0
+
+        if self.checkpoint:
+            self.checkpoint.add_page(page_url, [albums, last_page])
+        return albums, last_page
+
+    async def _find_last_page(
+        self, url: str, hint: int, pages: dict[int, list[str]]
+    ) -> int:
+        """
+        Finds the last non-empty listing page by galloping forward from the
+        highest page linked by the pagination, then bisecting between the last
+        non-empty page and the first empty one.
+
+        Args:
+            url (str): The URL of the listing without query parameters.
+            hint (int): The highest page number linked from the first page.
+            pages (dict[int, list[str]]): The albums of the pages fetched so
+                far, which is filled with the pages probed.
+
+        Returns:
+            int: The number of the last non-empty page.
+        """
+
+        async def has_albums(page: int) -> bool:
+            if page not in pages:
+                pages[page], _ = await self._fetch_listing_page(url, page, probe=True)
+            return bool(pages[page])
+
+        lo: int = 1
+        hi: int | None = None
+        if hint > 1:
+            if await has_albums(hint):
+                lo = hint
+            else:
+                hi = hint
+
+        step = 1
+        while hi is None:
+            if await has_albums(lo + step):
+                lo += step
+                step *= 2
+            else:
+                hi = lo + step
+
+        while hi - lo > 1:
+            mid: int = (lo + hi) // 2
+            if await has_albums(mid):
+                lo = mid
+            else:
+                hi = mid
+
+        logger.debug(f"Found last page {lo} for {url} with {len(pages)} probes")
+        return lo
+
+    async def _walk_pages(
+        self, url: str, pages: dict[int, list[str]]
+    ) -> AsyncGenerator[list[str], None]:
+        """
+        Asynchronously yields the album URLs of the listing pages after the
+        first one, fetching them in order until an empty page.
+
+        Args:
+            url (str): The URL of the listing without query parameters.
+            pages (dict[int, list[str]]): The albums of the pages fetched so
+                far, which are not fetched again.
+
+        Yields:
+            list[str]: A list of album URLs found on a page.
+        """
+        page: int = 2
+        while True:
+            if page not in pages:
+                pages[page], _ = await self._fetch_listing_page(url, page, probe=True)
+            if not pages[page]:
+                return
+            yield pages[page]
+            page += 1
+
     async def _find_albums(self, url: str) -> AsyncGenerator[list[str], None]:
         """
-        Asynchronously iterates through paginated pages to yield the discovered
-        album URLs.
+        Asynchronously yields the album URLs listed on a model, cosplay or
+        fandom page.
 
-        This method is designed to handle model or cosplay pages that list
-        multiple albums, fetching each page incrementally to avoid overwhelming
-        the server and to allow for real-time processing of found albums.
+        Instead of walking the pages until an empty one shows up, the last
+        page is found by probing, starting from the pagination links of the
+        first page, and then every remaining page is fetched concurrently.
+        The crawler rate limit keeps the requests polite towards the server.
+        If a probe keeps failing, the pages are walked in order instead.
 
         Args:
             url (str): The URL of the model page to start from.
 
         Yields:
-            list[str]: A list of album URLs found on the current page.
+            list[str]: A list of album URLs found on a page, in no particular
+            page order.
         """
         logger.debug(f"Finding albums for URL: {url}")
 
@@ -342,39 +568,38 @@ class OsosedkiBaseCrawler(BaseCrawler, ABC):
         # Clean the URL removing the query parameters
         url = url.split("?")[0]
 
-        soup: BeautifulSoup = await self.fetch_soup(url)
-
-        i = 1
-        albums_found = True
-
-        while albums_found:
-            page_url: str = f"{url}?page={i}"
-            logger.debug("Fetching albums from page %s", page_url)
-
-            soup: BeautifulSoup = await self.fetch_soup(page_url)
+        albums, hint = await self._fetch_listing_page(url, 1)
+        if not albums:
+            logger.info(f"No albums found on {url}")
+            return
+        logger.info(f"Found {len(albums)} albums on page 1")
+        yield albums
 
-            logger.debug(f"Extracting albums from soup for {self.__class__.__name__}")
-            albums_extracted: list[str] = list(
-                {
-                    f"{self.site_url}{a['href']}"
-                    for a in soup.find_all(
-                        "a", href=lambda href: href and href.startswith(self.album_path)
-                    )
-                }
-            )
-            if not albums_extracted:
-                albums_found = False
-                continue
+        pages: dict[int, list[str]] = {1: albums}
+        try:
+            last_page: int = await self._find_last_page(url, hint, pages)
+        except Exception:
+            logger.exception(f"Failed to find the last page of {url}, walking pages")
+            async for albums in self._walk_pages(url, pages):
+                yield albums
+            return
+        logger.info(f"Found {last_page} listing pages for {url}")
 
-            logger.info(f"Found {len(albums_extracted)} albums on page {page_url}")
-            yield albums_extracted
-            i += 1
+        for page, albums in sorted(pages.items()):
+            if page != 1 and albums:
+                yield albums
 
-            # Sleep for a while to avoid being banned
-            await asyncio.sleep(1)
+        tasks = [
+            self._fetch_listing_page(url, page)
+            for page in range(2, last_page + 1)
+            if page not in pages
+        ]
+        for future in asyncio.as_completed(tasks):
+            albums, _ = await future
+            if albums:
+                yield albums
 
-        title: str = self.get_album_title(soup, url)
-        logger.debug(f"Finished finding albums for: {title}")
+        logger.debug(f"Finished finding albums for: {url}")
 
     @override
     async def download(self, url: str) -> list[dict[str, str]]:
@@ -383,9 +608,10 @@ class OsosedkiBaseCrawler(BaseCrawler, ABC):
         cosplay URL.
 
         If the URL corresponds to an album, processes and returns its media and
-        metadata. If the URL matches a model or cosplay section, finds all
-        associated albums and processes them concurrently, aggregating their
-        results. Returns an empty list for unknown URL formats.
+        metadata. If the URL matches a model or cosplay section, the listing
+        pages are walked by a producer filling a bounded queue of albums,
+        while a pool of consumers processes them concurrently, so discovery
+        and downloads overlap. Returns an empty list for unknown URL formats.
 
         Args:
             url (str): The album, model, or cosplay URL to process.
@@ -406,18 +632,35 @@ class OsosedkiBaseCrawler(BaseCrawler, ABC):
         ):
             logger.info(f"Downloading albums from {url}")
             results: list[dict[str, str]] = []
-
-            # Find all the albums incrementally
-            async for albums in self._find_albums(url):
-                logger.info(f"Processing {len(albums)} albums concurrently")
-                tasks = [self.process_album(album) for album in albums]
-
-                # Process the tasks for this chunk and collect results
-                chunk_results: list[dict[str, str]] = list(
-                    chain.from_iterable(await asyncio.gather(*tasks))
-                )
-                results.extend(chunk_results)
-
+            queue: asyncio.Queue[str | None] = asyncio.Queue(ALBUM_QUEUE_SIZE)
+
+            async def discover() -> None:
+                seen: set[str] = set()
+                try:
+                    async for albums in self._find_albums(url):
+                        for album in albums:
+                            if album not in seen:
+                                seen.add(album)
+                                await queue.put(album)
+                except Exception as e:
+                    logger.exception(f"Failed to find albums for {url}")
+                    print(f"ERROR: Failed to find albums for {url}: {e}")
+                logger.info(f"Discovered {len(seen)} albums from {url}")
+                # One end marker per consumer
+                for _ in range(MAX_CONCURRENT_ALBUMS):
+                    await queue.put(None)
+
+            async def consume() -> None:
+                while (album := await queue.get()) is not None:
+                    try:
+                        results.extend(await self.process_album(album))
+                    except Exception as e:
+                        logger.exception(f"Failed to process album {album}")
+                        results.append({"url": album, "status": f"error: {e}"})
+
+            await asyncio.gather(
+                discover(), *(consume() for _ in range(MAX_CONCURRENT_ALBUMS))
+            )
             return results
 
         logger.error(f"Unknown URL format: {url}")
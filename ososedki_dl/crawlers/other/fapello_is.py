@@ -19,6 +19,11 @@ class FapelloIsCrawler(BaseCrawler):
     api_url: str = site_url + "/api/media"
     headers = {"Referer": site_url}
 
+    @override
+    def album_page_lists_media(self) -> bool:
+        """The media of a profile come from its API."""
+        return False
+
     @override
     def get_album_title(self, soup: BeautifulSoup, url: str) -> str:
         """
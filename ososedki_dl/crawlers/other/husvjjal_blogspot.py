@@ -250,34 +250,46 @@ class HusvjjalBlogspotCrawler(BaseCrawler):
                 results += await self.process_album(related_album, title="husvjjal")
             return results
 
-        soup: BeautifulSoup = await self.fetch_soup(profile_url)
-
-        album_classes: list[str] = [
-            "card-image ratio o-hidden mask ratio-16:9",
-            "gallery-name fw-500 font-primary fs-5 l:fs-3",
-            "gallery ratio mask carousel-cell gallery-default ratio-4:3",
-            "gallery ratio mask carousel-top gallery-featured ratio-16:9",
-        ]
-
-        albums_html: list[Tag] = soup.find_all("a", class_=album_classes)
-        albums: list[str] = list({album["href"] for album in albums_html})
-
         results: list[dict[str, str]] = []
-        # Turn your initial list into a queue
-        queue: deque[str] = deque(albums)
-        # Track visited albums to prevent infinite loops if Site A links to Site B, and B links to A
-        visited: set[str] = set(albums)
+        if self.checkpoint and self.checkpoint.frontier is not None:
+            # Pick up the crawl where it was interrupted
+            queue: deque[str] = self.checkpoint.frontier
+            visited: set[str] = self.checkpoint.visited
+        else:
+            soup: BeautifulSoup = await self.fetch_soup(profile_url)
+
+            album_classes: list[str] = [
+                "card-image ratio o-hidden mask ratio-16:9",
+                "gallery-name fw-500 font-primary fs-5 l:fs-3",
+                "gallery ratio mask carousel-cell gallery-default ratio-4:3",
+                "gallery ratio mask carousel-top gallery-featured ratio-16:9",
+            ]
+
+            albums_html: list[Tag] = soup.find_all("a", class_=album_classes)
+            albums: list[str] = list({album["href"] for album in albums_html})
+
+            # Turn your initial list into a queue
+            queue = deque(albums)
+            # Track visited albums to prevent infinite loops if Site A links to Site B, and B links to A
+            visited = set(albums)
+        if self.checkpoint:
+            self.checkpoint.set_frontier(queue, visited)
 
         while queue:
-            # Pop the oldest item from the left side of the queue (FIFO)
-            album_url: str = queue.popleft()
+            # Take the oldest item of the queue (FIFO), it is only popped once
+            # crawled so an interrupted crawl saves it in the frontier
+            album_url: str = queue[0]
 
             results += await self.process_album(album_url, title="husvjjal")
             related_albums: list[str] = await self.get_related_albums(album_url)
 
+            queue.popleft()
             for related_album in related_albums:
                 if related_album not in visited:
                     visited.add(related_album)
                     queue.append(related_album)
+            if self.checkpoint:
+                # The checkpoint holds the queue itself, mark it as changed
+                self.checkpoint.set_frontier(queue, visited)
 
         return results
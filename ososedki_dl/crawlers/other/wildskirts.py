@@ -22,7 +22,9 @@ class WildskirtsCrawler(BaseCrawler):
     base_videos_url: str = "https://video.wildskirts.com"
     api_url: str = "https://api.wildskirts.com/api/media"
     headers = {"Referer": site_url + "/"}
-    max_concurrent_downloads = 5
+    rate_limit = 2.0
+    # Item pages fetched at the same time when the API is not used
+    max_concurrent_items: int = 5
     api = True
 
     def get_total_items(self, soup: BeautifulSoup, item: str) -> int:
@@ -109,7 +111,8 @@ class WildskirtsCrawler(BaseCrawler):
         """
         Determines the total number of photos and videos, constructs URLs for
         each media item, retrieves all media URLs concurrently and returns the
-        complete list of media URLs.
+        complete list of media URLs. Items whose page can't be fetched are
+        skipped.
 
         Args:
             soup (BeautifulSoup): The parsed HTML content of the profile page.
@@ -128,18 +131,37 @@ class WildskirtsCrawler(BaseCrawler):
 
         urls: list[str] = [f"{url}/{i}" for i in range(1, total_items + 1)]
 
-        results: list[str] = []
-        # Fetch media URLs concurrently
-        for url in urls:
-            results.extend(self._extract_from_soup(await self.fetch_soup(url)))
-            logger.debug(f"Extracted {len(results)} media URLs so far from {url}...")
-            if self.downloader.debug:
-                print(f"Extracted {len(results)} media URLs so far...")
+        semaphore = asyncio.Semaphore(self.max_concurrent_items)
+
+        async def fetch_and_extract(item_url: str) -> list[str]:
+            async with semaphore:
+                soup: BeautifulSoup = await self.fetch_soup(item_url)
+            media: list[str] = self._extract_from_soup(soup)
+            logger.debug(f"Extracted {len(media)} media URLs from {item_url}")
+            return media
 
-            await asyncio.sleep(0.5)
+        # Fetch a few item pages at a time, the crawler rate limit spaces the
+        # requests out. A failed item doesn't lose the others
+        pages: list[list[str] | BaseException] = await asyncio.gather(
+            *[fetch_and_extract(item_url) for item_url in urls],
+            return_exceptions=True,
+        )
+        results: list[str] = []
+        for item_url, page in zip(urls, pages):
+            if isinstance(page, BaseException):
+                logger.error(f"Skipping item {item_url}: {page}")
+                continue
+            results.extend(page)
+        if self.downloader.debug:
+            print(f"Extracted {len(results)} media URLs")
 
         return results
 
+    @override
+    def album_page_lists_media(self) -> bool:
+        """The media come from the API when it is enabled."""
+        return not self.api
+
     @override
     def get_album_title(self, soup: BeautifulSoup, url: str) -> str:
         """
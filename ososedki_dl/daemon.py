@@ -0,0 +1,322 @@
+"""Daemon mode, a long-running process downloading the jobs submitted to a
+local HTTP API."""
+
+from __future__ import annotations
+
+import asyncio
+import signal
+from argparse import Namespace
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import time
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+import validators  # type: ignore
+from aiohttp import web
+from core_helpers.logs import logger
+from rich import print
+
+from .consts import DAEMON_JOB_HISTORY, MAX_CONCURRENT_JOBS
+from .scrapper import download_urls
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+    from typing import Any
+
+    from .download import SessionType
+    from .scheduler import DownloadScheduler
+
+
+@dataclass
+class Job:
+    """A batch of URLs submitted to the daemon."""
+
+    id: str
+    urls: list[str]
+    dest_path: Path
+    resume: bool = False
+    state: str = "queued"
+    created: float = field(default_factory=time)
+    started: float | None = None
+    finished: float | None = None
+    done_urls: int = 0
+    counts: Counter[str] = field(default_factory=Counter)
+    results: list[dict[str, str]] = field(default_factory=list)
+    task: asyncio.Task[None] | None = field(default=None, repr=False)
+
+    def on_result(self, url: str, results: list[dict[str, str]]) -> None:
+        """
+        Record the results of a URL of the job as soon as it is done.
+
+        Args:
+            url (str): The URL downloaded.
+            results (list[dict[str, str]]): The results of the URL.
+        """
+        self.done_urls += 1
+        self.counts.update(result["status"].split(":")[0] for result in results)
+        self.results.extend(results)
+
+    def to_dict(self, with_results: bool = False) -> dict[str, Any]:
+        """
+        Get the state of the job as JSON serializable data.
+
+        Args:
+            with_results (bool): Whether to include the result of every media.
+                Defaults to False.
+
+        Returns:
+            dict[str, Any]: The state of the job.
+        """
+        data: dict[str, Any] = {
+            "id": self.id,
+            "state": self.state,
+            "urls": self.urls,
+            "destination": str(self.dest_path),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": {"done": self.done_urls, "total": len(self.urls)},
+            "counts": dict(self.counts),
+        }
+        if with_results:
+            data["results"] = self.results
+        return data
+
+
+@web.middleware
+async def _reject_browsers(
+    request: web.Request,
+    handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+) -> web.StreamResponse:
+    """
+    Refuse the requests sent by web pages, which carry an Origin header, so a
+    site opened in a browser cannot drive the local API.
+    """
+    if "Origin" in request.headers:
+        logger.warning(f"Refused request from origin {request.headers['Origin']}")
+        raise web.HTTPForbidden(text="Requests from web pages are not allowed")
+    return await handler(request)
+
+
+class JobServer:
+    """
+    Runs the jobs submitted to the daemon on one warm session and scheduler,
+    so every job reuses the open connections and shares the same limits.
+
+    The API has the following routes:
+
+    - `POST /jobs` submits a job, the body is a JSON object with the `urls`
+      to download and optionally the `destination` path, under the download
+      path of the daemon, and `resume` flag.
+    - `GET /jobs` lists the jobs.
+    - `GET /jobs/{id}` gets the progress and results of a job.
+    - `DELETE /jobs/{id}` cancels a job.
+
+    Requests sent from web pages (with an Origin header) are refused.
+    """
+
+    def __init__(
+        self, session: SessionType, scheduler: DownloadScheduler, args: Namespace
+    ) -> None:
+        """
+        Initialize the server.
+
+        Args:
+            session (SessionType): The session shared by all the jobs.
+            scheduler (DownloadScheduler): The scheduler shared by all the
+                jobs.
+            args (Namespace): Parsed command line arguments, the defaults of
+                the jobs.
+        """
+        self.session: SessionType = session
+        self.scheduler: DownloadScheduler = scheduler
+        self.args: Namespace = args
+        self.jobs: dict[str, Job] = {}
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+
+    def create_app(self) -> web.Application:
+        """
+        Create the web application of the API.
+
+        Returns:
+            web.Application: The application.
+        """
+        app = web.Application(middlewares=[_reject_browsers])
+        app.add_routes(
+            [
+                web.post("/jobs", self.submit_job),
+                web.get("/jobs", self.list_jobs),
+                web.get("/jobs/{id}", self.get_job),
+                web.delete("/jobs/{id}", self.cancel_job),
+            ]
+        )
+        return app
+
+    async def run_job(self, job: Job) -> None:
+        """
+        Download the URLs of a job once a job slot is free.
+
+        Args:
+            job (Job): The job to run.
+        """
+        async with self._semaphore:
+            job.state = "running"
+            job.started = time()
+            logger.info(f"Running job {job.id} with {len(job.urls)} URLs")
+            args = Namespace(**vars(self.args))
+            args.dest_path = job.dest_path
+            args.resume = job.resume
+            try:
+                await download_urls(
+                    self.session, job.urls, args, self.scheduler, job.on_result
+                )
+            except asyncio.CancelledError:
+                job.state = "cancelled"
+                raise
+            except Exception:
+                logger.exception(f"Job {job.id} failed")
+                job.state = "failed"
+            else:
+                job.state = "failed" if job.counts["error"] else "done"
+            finally:
+                job.finished = time()
+                logger.info(f"Job {job.id} {job.state}: {dict(job.counts)}")
+
+    def _forget_old_jobs(self) -> None:
+        """Drop the oldest finished jobs beyond DAEMON_JOB_HISTORY."""
+        finished: list[Job] = [job for job in self.jobs.values() if job.finished]
+        for job in finished[: max(0, len(finished) - DAEMON_JOB_HISTORY)]:
+            del self.jobs[job.id]
+
+    async def submit_job(self, request: web.Request) -> web.Response:
+        """Handle `POST /jobs`, starting a job for the submitted URLs."""
+        if request.content_type != "application/json":
+            raise web.HTTPUnsupportedMediaType(
+                text="The body must be sent as application/json"
+            )
+        try:
+            body: Any = await request.json()
+        except ValueError as e:
+            raise web.HTTPBadRequest(text="The body must be a JSON object") from e
+
+        urls: Any = body.get("urls") if isinstance(body, dict) else None
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls or not isinstance(urls, list):
+            raise web.HTTPBadRequest(text="No URLs to download")
+        invalid: list[Any] = [
+            url for url in urls if not isinstance(url, str) or not validators.url(url)
+        ]
+        if invalid:
+            raise web.HTTPBadRequest(text=f"Invalid URLs: {invalid}")
+
+        dest_path: Path = self._get_dest_path(body.get("destination"))
+
+        self._forget_old_jobs()
+        job = Job(
+            id=uuid4().hex,
+            urls=list(dict.fromkeys(urls)),
+            dest_path=dest_path,
+            resume=bool(body.get("resume", self.args.resume)),
+        )
+        job.task = asyncio.create_task(self.run_job(job))
+        self.jobs[job.id] = job
+        logger.info(f"Submitted job {job.id}: {job.urls}")
+        return web.json_response(job.to_dict(), status=202)
+
+    def _get_dest_path(self, destination: Any) -> Path:
+        """
+        Get the download path of a job, which must be inside the download
+        path of the daemon, or answer 400.
+
+        Args:
+            destination (Any): The destination of the job, relative to the
+                download path of the daemon or absolute, or None.
+
+        Returns:
+            Path: The resolved download path of the job.
+        """
+        root: Path = Path(self.args.dest_path).expanduser().resolve()
+        if not destination:
+            return root
+        if not isinstance(destination, str):
+            raise web.HTTPBadRequest(text="The destination must be a path")
+        dest_path: Path = (root / Path(destination).expanduser()).resolve()
+        if not dest_path.is_relative_to(root):
+            raise web.HTTPBadRequest(text=f"The destination must be inside {root}")
+        return dest_path
+
+    async def list_jobs(self, request: web.Request) -> web.Response:
+        """Handle `GET /jobs`, listing the state of every job."""
+        return web.json_response([job.to_dict() for job in self.jobs.values()])
+
+    def _get_job(self, request: web.Request) -> Job:
+        """Get the job in the path of the request, or answer 404."""
+        job: Job | None = self.jobs.get(request.match_info["id"])
+        if job is None:
+            raise web.HTTPNotFound(text="Unknown job")
+        return job
+
+    async def get_job(self, request: web.Request) -> web.Response:
+        """Handle `GET /jobs/{id}`, with the results of every media."""
+        job: Job = self._get_job(request)
+        return web.json_response(job.to_dict(with_results=True))
+
+    async def cancel_job(self, request: web.Request) -> web.Response:
+        """Handle `DELETE /jobs/{id}`, cancelling the job if unfinished."""
+        job: Job = self._get_job(request)
+        if job.task and not job.task.done():
+            job.task.cancel()
+            # Wait for the crawlers to save their checkpoints
+            await asyncio.wait([job.task])
+            if job.state == "queued":
+                job.state = "cancelled"
+                job.finished = time()
+        return web.json_response(job.to_dict())
+
+    async def serve(self, address: tuple[str, int] | Path) -> None:
+        """
+        Serve the API until the process is interrupted or terminated.
+
+        Args:
+            address (tuple[str, int] | Path): The host and port to listen on,
+                or the path of the Unix socket, as returned by
+                `parse_address`.
+        """
+        runner = web.AppRunner(self.create_app())
+        await runner.setup()
+        site: web.BaseSite
+        if isinstance(address, Path):
+            if address.is_socket():
+                # Left behind by a daemon that didn't exit cleanly
+                address.unlink()
+            site = web.UnixSite(runner, str(address))
+        else:
+            site = web.TCPSite(runner, *address)
+        await site.start()
+        logger.info(f"Daemon listening on {site.name}")
+        print(f"[green]Listening for jobs on {site.name}[/]")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Signal handlers are not supported on Windows, where Ctrl+C
+                # still stops the daemon with KeyboardInterrupt
+                break
+        try:
+            await stop.wait()
+        finally:
+            for job in self.jobs.values():
+                if job.task and not job.task.done():
+                    job.task.cancel()
+            await asyncio.gather(
+                *(job.task for job in self.jobs.values() if job.task),
+                return_exceptions=True,
+            )
+            await runner.cleanup()
+            logger.info("Daemon stopped")
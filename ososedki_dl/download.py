@@ -2,20 +2,27 @@
 
 from __future__ import annotations
 
+import json
+import os
 import sys
-from asyncio import sleep
-from dataclasses import dataclass
+from asyncio import Semaphore, gather, sleep
+from dataclasses import dataclass, field
 from hashlib import sha256
 from mimetypes import guess_extension
 from pathlib import Path
 from ssl import SSLCertVerificationError
 from time import monotonic
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Protocol
 from urllib.parse import unquote, urlparse
 
 import aiofiles
 from aiohttp.client import ClientResponse, ClientSession, ClientTimeout
-from aiohttp.client_exceptions import ClientConnectorError, ClientResponseError
+from aiohttp.client_exceptions import (
+    ClientConnectorError,
+    ClientError,
+    ClientPayloadError,
+    ClientResponseError,
+)
 from aiohttp_client_cache.response import CachedResponse
 from aiohttp_client_cache.session import CachedSession
 from core_helpers.logs import logger
@@ -27,12 +34,20 @@ from .consts import (
     KB,
     MAX_RETRIES,
     MAX_SLEEP_SECONDS,
+    SEGMENTED_DOWNLOAD_PARTS,
+    SEGMENTED_DOWNLOAD_THRESHOLD,
     SOCK_TIMEOUT,
 )
+from .index import ContentIndex, get_content_index
+from .ledger import DownloadLedger, get_ledger
+from .metrics import (CACHE_HITS, DOWNLOAD_DURATION, DOWNLOADED_BYTES, REQUESTS,
+                      RETRIES, TIME_TO_FIRST_BYTE)
 from .progress import MediaProgress
-from .utils import get_unique_filename, get_url_hashfile, sanitize_path, write_to_cache
+from .scheduler import DownloadScheduler, get_host
+from .utils import get_unique_filename, get_url_hash, sanitize_path
 
 if TYPE_CHECKING:
+    from collections.abc import Collection
     from typing import Any
 
 if sys.version_info >= (3, 10):
@@ -45,6 +60,14 @@ else:
     ResponseType = Union[ClientResponse, CachedResponse]
 
 
+class Hash(Protocol):
+    """The methods of the hashlib objects used on the downloaded content."""
+
+    def update(self, data: bytes, /) -> None: ...
+
+    def hexdigest(self) -> str: ...
+
+
 def _choose_chunk_size(
     throughput_bps: int | None = None,
     min_kb: int = 32,
@@ -64,6 +87,90 @@ def _choose_chunk_size(
     return max(min_kb * KB, min(target_bytes, max_kb * KB))
 
 
+async def _hash_file(path: Path, chunk_size: int = 64 * KB) -> str:
+    """
+    Compute the SHA-256 digest of a file reading it in chunks.
+
+    Args:
+        path (Path): The file to hash.
+        chunk_size (int): The size of the chunks to read. Defaults to 64 KB.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    file_hash = sha256()
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(chunk_size):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _get_segments_path(temp_path: Path) -> Path:
+    """Get the file holding the progress of a segmented download."""
+    return temp_path.with_name(temp_path.name + ".json")
+
+
+def _load_segments(state_path: Path, content_length: int) -> list[list[int]] | None:
+    """
+    Load the progress of a segmented download.
+
+    Args:
+        state_path (Path): The file holding the progress.
+        content_length (int): The expected size of the media.
+
+    Returns:
+        list[list[int]] | None: The [start, end, downloaded] triplets of the
+        segments, or None if there is no usable progress for this size.
+    """
+    try:
+        state: dict[str, Any] = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if state.get("size") != content_length:
+        return None
+    return state.get("segments")
+
+
+def _save_segments(
+    state_path: Path, content_length: int, segments: list[list[int]]
+) -> None:
+    """Save the progress of a segmented download."""
+    state_path.write_text(
+        json.dumps({"size": content_length, "segments": segments}), encoding="utf-8"
+    )
+
+
+def _get_validators(response: ResponseType) -> tuple[str | None, str | None]:
+    """Get the ETag and Last-Modified validators of a response."""
+    return response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+
+def _get_retry_delay(response: ResponseType, attempt: int) -> float:
+    """
+    Get the seconds to wait before retrying a throttled request, honoring the
+    Retry-After header when the server sends it in seconds.
+
+    Args:
+        response (ResponseType): The throttled response.
+        attempt (int): The number of the attempt that was throttled.
+
+    Returns:
+        float: The number of seconds to wait.
+    """
+    retry_after: str = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return min(int(retry_after), MAX_SLEEP_SECONDS)
+    return min(2**attempt, MAX_SLEEP_SECONDS)
+
+
+class NotModifiedError(Exception):
+    """Raised when a conditional request is answered with 304 Not Modified."""
+
+
+class RangeNotSupportedError(Exception):
+    """Raised when a Range request is answered with the whole content."""
+
+
 @dataclass
 class Downloader:
     session: SessionType
@@ -72,6 +179,17 @@ class Downloader:
     debug: bool = False
     chunk_size: int = 0
     dynamic_chunk: bool = False
+    scheduler: DownloadScheduler = field(default_factory=DownloadScheduler)
+    rate_limit: float | None = None
+    rate_limit_burst: int = 1
+    content_index: ContentIndex = field(default_factory=get_content_index)
+    ledger: DownloadLedger = field(default_factory=get_ledger)
+    # Name of the crawler using the downloader, recorded in the request traces
+    crawler: str | None = None
+    # Validators of the conditional responses, saved once fully processed
+    _validators: dict[str, tuple[str | None, str | None]] = field(
+        default_factory=dict, init=False, repr=False
+    )
     timeout = ClientTimeout(sock_connect=SOCK_TIMEOUT, sock_read=SOCK_TIMEOUT)
 
     def __post_init__(self) -> None:
@@ -97,6 +215,10 @@ class Downloader:
         method: str = "GET",
         response_property: str = DEFAULT_RESPONSE_PROPERTY,
         raw_response: bool = False,
+        conditional: bool = False,
+        max_retries: int = MAX_RETRIES,
+        final_statuses: Collection[int] = (),
+        rate_limited: bool = True,
         **kwargs: Any,
     ) -> Any:
         """
@@ -113,11 +235,25 @@ class Downloader:
                 return (e.g., "text", "json", "content"). Defaults to "text".
             raw_response (bool, optional): If True, return the raw response object
                 instead of a property. Defaults to False.
+            conditional (bool, optional): If True, send the validators stored
+                for the URL and keep the ones of the response until
+                `save_validators` is called. Defaults to False.
+            max_retries (int, optional): Maximum number of attempts. Defaults to
+                MAX_RETRIES.
+            final_statuses (Collection[int], optional): Error statuses raised
+                on the first attempt instead of being retried. Defaults to none.
+            rate_limited (bool, optional): If True, take a token from the rate
+                limiter of the domain before each attempt. Media requests skip
+                it, the limit is meant for the pages and APIs. Defaults to True.
             **kwargs: Additional keyword arguments to pass to the request method.
 
         Returns:
             Any: The requested property of the response, or the raw response if
             raw_response is True.
+
+        Raises:
+            NotModifiedError: If the request is conditional and the server
+                answers that the resource has not changed.
         """
         method = method.upper()
         logger.debug(
@@ -128,45 +264,82 @@ class Downloader:
         # Merge headers: priority to kwargs, fallback to instance defaults
         headers = kwargs.pop("headers", self.headers)
 
+        if conditional:
+            etag, last_modified = self.ledger.get_validators(url)
+            headers = dict(headers or {})
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        host: str = get_host(url)
         attempt = 0
         while True:
             attempt += 1
+            if self.rate_limit and rate_limited:
+                await self.scheduler.rate_limiter(
+                    url, self.rate_limit, self.rate_limit_burst
+                ).acquire()
             try:
-                response = await self.session.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    timeout=self.timeout,
-                    **kwargs,
-                )
-                if isinstance(response, CachedResponse) and self.debug:
-                    print(
-                        f"URL: {url}\n",
-                        f"from_cache: {response.from_cache}",
-                        f"created_at: {response.created_at}",
-                        f"expires: {response.expires}",
-                        f"is_expired: {response.is_expired}",
+                # Every request holds a slot of the adaptive per-host limit
+                # shared by all the crawlers, unless the current job already
+                # holds one for this host
+                async with self.scheduler.host_slot(url):
+                    t0: float = monotonic()
+                    response = await self.session.request(
+                        method=method,
+                        url=url,
+                        headers=headers,
+                        timeout=self.timeout,
+                        trace_request_ctx={"crawler": self.crawler, "attempt": attempt},
+                        **kwargs,
                     )
-                if response.status in (429, 503):
-                    # Too Many Requests or Service Unavailable
-                    if attempt >= MAX_RETRIES:
+                    REQUESTS.inc(host, str(response.status))
+                    if getattr(response, "from_cache", False):
+                        CACHE_HITS.inc("http_cache")
+                    else:
+                        TIME_TO_FIRST_BYTE.observe(monotonic() - t0, host)
+                    self.scheduler.feedback(url, response.status)
+                    if isinstance(response, CachedResponse) and self.debug:
+                        print(
+                            f"URL: {url}\n",
+                            f"from_cache: {response.from_cache}",
+                            f"created_at: {response.created_at}",
+                            f"expires: {response.expires}",
+                            f"is_expired: {response.is_expired}",
+                        )
+                    if response.status == 304:
+                        CACHE_HITS.inc("not_modified")
+                        response.release()
+                        logger.debug(f"Not modified: {url}")
+                        raise NotModifiedError(url)
+                    if response.status not in (429, 503):
                         response.raise_for_status()
-                    await sleep(min(2**attempt, MAX_SLEEP_SECONDS))
-                    continue
-
-                response.raise_for_status()
-                logger.debug(f"Response status for {url}: {response.status}")
-
-                if raw_response:
-                    return response
-
-                # Dynamically access the specified response property
-                if hasattr(response, response_property):
-                    attr = getattr(response, response_property)
-                    return await attr() if callable(attr) else attr
-                raise ValueError(
-                    f"Response object has no property '{response_property}'"
-                )
+                        logger.debug(f"Response status for {url}: {response.status}")
+
+                        if conditional:
+                            self._validators[url] = _get_validators(response)
+
+                        if raw_response:
+                            return response
+
+                        # Dynamically access the specified response property
+                        if hasattr(response, response_property):
+                            attr = getattr(response, response_property)
+                            return await attr() if callable(attr) else attr
+                        raise ValueError(
+                            f"Response object has no property '{response_property}'"
+                        )
+
+                # Too Many Requests or Service Unavailable, back off outside
+                # the host slot so the other requests can still use it
+                if attempt >= max_retries:
+                    response.raise_for_status()
+                delay: float = _get_retry_delay(response, attempt)
+                # Give the connection back to the pool before waiting
+                response.release()
+                RETRIES.inc(host, "throttled")
+                await sleep(delay)
 
             except SSLCertVerificationError as e:
                 logger.exception(f"SSL certificate verification failed for {url}")
@@ -174,25 +347,264 @@ class Downloader:
                     f"SSL error for {url}: {e}. Retrying with SSL verification disabled..."
                 )
                 kwargs["ssl"] = False
-                if attempt >= MAX_RETRIES:
+                if attempt >= max_retries:
                     raise
+                RETRIES.inc(host, "ssl")
             except ClientConnectorError as e:
                 logger.exception(f"Failed to connect to {url}")
                 print(f"Failed to connect to {url} with error {e}. Retrying...")
-                if attempt >= MAX_RETRIES:
+                REQUESTS.inc(host, "connection_error")
+                if attempt >= max_retries:
                     raise
+                RETRIES.inc(host, "connection_error")
                 await sleep(min(2**attempt, MAX_SLEEP_SECONDS))
             except ClientResponseError as e:  # 4xx, 5xx errors
                 logger.exception(f"Failed to fetch {url}")
                 print(f"Failed to fetch {url} with status {e.status}")
-                if attempt >= MAX_RETRIES:
+                if attempt >= max_retries or e.status in final_statuses:
                     raise
+                RETRIES.inc(host, "status")
+
+    def save_validators(self, url: str) -> None:
+        """
+        Store the validators of a conditional response once the resource has
+        been fully processed, so the next request for it can be answered with
+        304 Not Modified.
+
+        Args:
+            url (str): The URL previously fetched with `conditional=True`.
+        """
+        validators = self._validators.pop(url, None)
+        if validators is not None and any(validators):
+            self.ledger.set_validators(url, *validators)
+
+    def discard_validators(self, url: str) -> None:
+        """
+        Forget the validators of a conditional response whose resource could
+        not be processed, so it is fully fetched again on the next run.
+
+        Args:
+            url (str): The URL previously fetched with `conditional=True`.
+        """
+        self._validators.pop(url, None)
+
+    async def _probe(self, url: str) -> tuple[int | None, str | None]:
+        """
+        Get the size and ETag of a media without downloading its body.
+
+        A HEAD request is tried first. Servers rejecting it or omitting the size
+        are asked for the first byte only, whose Content-Range holds the full
+        size.
+
+        Args:
+            url (str): The URL of the media.
+
+        Returns:
+            tuple[int | None, str | None]: The size of the media and its ETag,
+            which are None when the server doesn't tell.
+        """
+        range_headers: dict[str, str] = {**(self.headers or {}), "Range": "bytes=0-0"}
+        for method, headers in (("HEAD", self.headers), ("GET", range_headers)):
+            try:
+                response: ResponseType = await self.fetch(
+                    url,
+                    method,
+                    raw_response=True,
+                    max_retries=1,
+                    rate_limited=False,
+                    headers=headers,
+                )
+            except (ClientError, TimeoutError):
+                logger.debug(f"{method} probe failed for {url}")
+                continue
+            response.release()
+
+            if response.headers.get("Content-Encoding", "identity") != "identity":
+                # The size on the wire is not the size on disk
+                return None, None
+            if method == "HEAD":
+                length: str = response.headers.get("Content-Length", "")
+            elif response.status == 206:
+                length = response.headers.get("Content-Range", "").rpartition("/")[2]
+            else:
+                continue
+            if length.isdigit():
+                return int(length), response.headers.get("ETag")
+        return None, None
+
+    async def _is_downloaded(self, url: str, media_path: Path) -> bool:
+        """
+        Check with a cheap probe if an existing file is obviously the media
+        behind the URL: same size and, when known, same ETag.
+
+        Args:
+            url (str): The URL of the media.
+            media_path (Path): The existing file the media would be saved to.
+
+        Returns:
+            bool: True if the file matches the remote media.
+        """
+        size, etag = await self._probe(url)
+        if size is None or size != media_path.stat().st_size:
+            return False
+
+        known_etag, _ = self.ledger.get_validators(url)
+        return not (known_etag and etag and known_etag != etag)
+
+    def _get_temp_path(self, url: str, media_path: Path) -> Path:
+        """
+        Get the temporary path a media file is written to before being moved
+        to its final location.
+
+        Args:
+            url (str): The URL of the media.
+            media_path (Path): The target file path of the media.
+
+        Returns:
+            Path: The temporary ".part" path next to the target file.
+        """
+        url_hash: str = get_url_hash(url)
+        # Add the hash to the temporary filename to avoid collisions
+        return media_path.with_name(f"{url_hash}_{media_path.name}").with_suffix(
+            media_path.suffix + ".part"
+        )
+
+    async def _stream_to_file(
+        self,
+        response: ResponseType,
+        temp_path: Path,
+        remote_hash: Hash,
+        mode: str = "wb",
+        progress_name: str | None = None,
+        completed: int = 0,
+        total: int = 0,
+    ) -> None:
+        """
+        Streams the body of the response to a file in chunks, updating the
+        hash of the content as it is written.
+
+        Memory usage is bounded by the chunk size no matter how big the media
+        is.
+
+        Args:
+            response (ResponseType): The aiohttp response object to read from.
+            temp_path (Path): The file to write the content to.
+            remote_hash (Hash): The hash object to update with the content.
+            mode (str): The mode to open the file with. Defaults to "wb".
+            progress_name (str, optional): Name to show in a progress bar. No
+                progress bar is shown if not provided.
+            completed (int): Bytes already downloaded, used by the progress
+                bar. Defaults to 0.
+            total (int): Total size of the media, used by the progress bar.
+                Defaults to 0.
+
+        Raises:
+            TimeoutError: If the server stops sending data.
+        """
+        content_length = int(response.headers.get("Content-Length", 0))
+        logger.debug(f"Content length: {content_length} bytes")
+
+        chunk_size: int = self._get_initial_chunk_size(content_length)
+        logger.debug(f"Initial chunk size: {chunk_size} bytes")
+
+        host: str = get_host(str(response.url))
+        bytes_seen = 0
+        t0: float = monotonic()
+        with MediaProgress(disable=progress_name is None) as progress:
+            task = progress.add_task(
+                "Downloading",
+                filename=progress_name,
+                completed=completed,
+                total=total or content_length,
+            )
+            p_task = progress.tasks[0]
+            async with aiofiles.open(temp_path, mode) as f:
+                logger.debug(f"Opened temporary file for writing: {temp_path}")
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    if not chunk:
+                        continue
+
+                    remote_hash.update(chunk)
+                    await f.write(chunk)
+                    progress.advance(task, len(chunk))
+                    DOWNLOADED_BYTES.inc(host, amount=len(chunk))
+
+                    now: float = monotonic()
+                    bytes_seen += len(chunk)
+                    elapsed: float = now - t0
+                    if elapsed > 1.0:  # update once per second (cheap)
+                        logger.debug(
+                            f"Wrote {len(chunk)} bytes to {temp_path.name}, "
+                            f"Total written: {p_task.completed}/{p_task.total}"
+                        )
+
+                        if self.dynamic_chunk:
+                            throughput_bps = int(bytes_seen / elapsed)
+                            chunk_size = _choose_chunk_size(throughput_bps)  # 32KB..1MB
+                            logger.debug(
+                                f"Throughput: {throughput_bps / KB:.2f} KB/s, "
+                                f"Chunk size: {chunk_size / KB:.2f} KB"
+                            )
+                            print(f"New chunk size: {chunk_size / KB:.2f} KB")
+                            bytes_seen = 0
+
+                        t0 = now
+
+    async def _finalize_download(
+        self, url: str, temp_path: Path, media_path: Path, digest: str
+    ) -> tuple[str, Path]:
+        """
+        Moves a completely downloaded temporary file to its final location,
+        unless a file with the same content already exists in the album.
+
+        Duplicates are looked up in the content index by digest. Existing files
+        that are not indexed yet (e.g. downloaded by an older version) are
+        hashed in chunks once and added to the index. The temporary file is
+        moved with an atomic rename, so a crash never leaves a half-written
+        media file under its final name. The outcome is recorded in the
+        download ledger.
+
+        Args:
+            url (str): The URL the media was downloaded from.
+            temp_path (Path): The temporary file holding the downloaded media.
+            media_path (Path): The target file path of the media.
+            digest (str): The hex SHA-256 digest of the downloaded content.
+
+        Returns:
+            tuple[str, Path]: A tuple containing the download status ("ok" or
+            "skipped") and the final path of the media.
+        """
+        # Duplicate check using the content index
+        duplicate: Path | None = self.content_index.find(digest, media_path.parent)
+        if not duplicate and media_path.exists():
+            local_digest: str | None = self.content_index.get_digest(media_path)
+            if local_digest is None:
+                logger.debug(f"File exists but is not indexed, hashing: {media_path}")
+                local_digest = await _hash_file(media_path)
+                self.content_index.add(media_path, local_digest)
+            if local_digest == digest:
+                duplicate = media_path
+
+        if duplicate:
+            logger.info(f"File already exists and matches: {duplicate}")
+            temp_path.unlink(missing_ok=True)
+            logger.debug(f"Removed temporary file: {temp_path}")
+            status, final_path = "skipped", duplicate
+        else:
+            final_path = get_unique_filename(media_path)
+            logger.debug(f"Final file path: {final_path}")
+            os.replace(temp_path, final_path)
+            self.content_index.add(final_path, digest)
+            status = "ok"
+
+        self.ledger.record(url, status, final_path, final_path.stat().st_size, digest)
+        return status, final_path
 
     async def download_image(
         self, url: str, response: ResponseType, media_path: Path
     ) -> tuple[str, Path]:
         """
-        Handles reading image bytes and checking for duplicates.
+        Handles streaming image chunks to disk and checking for duplicates.
 
         Args:
             url (str): The URL of the image to download.
@@ -205,23 +617,34 @@ class Downloader:
         """
         logger.debug(f"Downloading image from URL: {url}")
 
-        image_content: bytes = await response.read()
-
-        if media_path.exists():
-            logger.debug(f"Checking existing file: {media_path}")
-            file_content: bytes = media_path.read_bytes()
-            if file_content == image_content:
-                return "skipped", media_path
-            media_path = get_unique_filename(media_path)
-            logger.debug(f"File exists, renaming to: {media_path}")
+        remote_hash = sha256()
+        temp_path: Path = self._get_temp_path(url, media_path)
+        logger.debug(f"Temporary file path: {temp_path}")
 
-        async with aiofiles.open(media_path, "wb") as f:
-            await f.write(image_content)
+        try:
+            await self._stream_to_file(response, temp_path, remote_hash)
+        except TimeoutError as e:
+            logger.warning(f"Timeout reached for {url}")
+            print(
+                f"[bold red]ERROR[/bold red]: Request timed out for {media_path.name}: {e}"
+            )
+            temp_path.unlink(missing_ok=True)
+            return "error: timeout", media_path
+        except BaseException:
+            # Images are not resumed, don't leave the partial file behind
+            temp_path.unlink(missing_ok=True)
+            raise
 
-        return "ok", media_path
+        return await self._finalize_download(
+            url, temp_path, media_path, remote_hash.hexdigest()
+        )
 
     async def download_video(
-        self, url: str, response: ResponseType, media_path: Path
+        self,
+        url: str,
+        response: ResponseType,
+        media_path: Path,
+        segmented: bool = True,
     ) -> tuple[str, Path]:
         """
         Handles streaming video chunks, tracking progress, and validating hashes.
@@ -230,6 +653,8 @@ class Downloader:
             url (str): The URL of the video to download.
             response (ResponseType): The aiohttp response object for the video URL.
             media_path (Path): The target file path to save the downloaded video.
+            segmented (bool): If True, large videos served with Accept-Ranges
+                are downloaded in concurrent segments. Defaults to True.
 
         Returns:
             tuple[str, Path]: A tuple containing the download status ("ok" or "skipped")
@@ -238,22 +663,23 @@ class Downloader:
         logger.debug(f"Downloading video from URL: {url}")
 
         content_length = int(response.headers.get("Content-Length", 0))
-        logger.debug(f"Content length: {content_length} bytes")
-
         remote_hash = sha256()
-        bytes_seen = 0
         bytes_downloaded = 0
 
-        chunk_size: int = self._get_initial_chunk_size(content_length)
-        logger.debug(f"Initial chunk size: {chunk_size} bytes")
-
-        url_hash: str = get_url_hashfile(url).stem
-        # Add the hash to the temporary filename to avoid collisions
-        temp_path: Path = media_path.with_name(
-            f"{url_hash}_{media_path.name}"
-        ).with_suffix(media_path.suffix + ".part")
+        temp_path: Path = self._get_temp_path(url, media_path)
         logger.debug(f"Temporary file path: {temp_path}")
 
+        if segmented and (
+            _get_segments_path(temp_path).exists()
+            or not temp_path.exists()
+            and content_length >= SEGMENTED_DOWNLOAD_THRESHOLD
+            and response.headers.get("Accept-Ranges") == "bytes"
+            and not isinstance(response, CachedResponse)
+        ):
+            return await self._download_segmented(
+                url, response, media_path, temp_path, content_length
+            )
+
         if temp_path.exists():
             # Continue from previous unfinished download
             bytes_downloaded = temp_path.stat().st_size
@@ -264,52 +690,26 @@ class Downloader:
                 while existing_chunk := await f.read(64 * KB):
                     remote_hash.update(existing_chunk)
 
-            headers = {"Range": f"bytes={bytes_downloaded}-"}
-            response = await self.fetch(url, raw_response=True, headers=headers)
+            headers = {**(self.headers or {}), "Range": f"bytes={bytes_downloaded}-"}
+            response = await self.fetch(
+                url, raw_response=True, rate_limited=False, headers=headers
+            )
+            if response.status != 206:
+                # The Range header was ignored and the whole media is coming
+                logger.warning(f"{url} ignores Range requests, downloading it again")
+                bytes_downloaded = 0
+                remote_hash = sha256()
 
-        t0: float = monotonic()
         try:
-            with MediaProgress() as progress:
-                task = progress.add_task(
-                    "Downloading",
-                    filename=media_path.name,
-                    completed=bytes_downloaded,
-                    total=content_length,
-                )
-                p_task = progress.tasks[0]
-                async with aiofiles.open(temp_path, "ab") as f:
-                    logger.debug(f"Opened temporary file for writing: {temp_path}")
-                    async for chunk in response.content.iter_chunked(chunk_size):
-                        if not chunk:
-                            continue
-
-                        remote_hash.update(chunk)
-                        await f.write(chunk)
-                        progress.advance(task, len(chunk))
-
-                        now: float = monotonic()
-                        bytes_seen += len(chunk)
-                        elapsed: float = now - t0
-                        if elapsed > 1.0:  # update once per second (cheap)
-                            logger.debug(
-                                f"Wrote {len(chunk)} bytes to {temp_path.name}, "
-                                f"Total written: {p_task.completed}/{p_task.total}"
-                            )
-
-                            if self.dynamic_chunk:
-                                throughput_bps = int(bytes_seen / elapsed)
-                                chunk_size = _choose_chunk_size(
-                                    throughput_bps
-                                )  # 32KB..1MB
-                                logger.debug(
-                                    f"Throughput: {throughput_bps / KB:.2f} KB/s, "
-                                    f"Chunk size: {chunk_size / KB:.2f} KB"
-                                )
-                                print(f"New chunk size: {chunk_size / KB:.2f} KB")
-                                bytes_seen = 0
-
-                            t0 = now
-
+            await self._stream_to_file(
+                response,
+                temp_path,
+                remote_hash,
+                mode="ab" if bytes_downloaded else "wb",
+                progress_name=media_path.name,
+                completed=bytes_downloaded,
+                total=content_length,
+            )
         except TimeoutError as e:
             logger.warning(f"Timeout reached for {url}")
             print(
@@ -317,27 +717,147 @@ class Downloader:
             )
             return "error: timeout", media_path
 
-        # Duplicate check using hashes
-        if media_path.exists():
-            logger.debug(f"File exists. Calculating local hash for: {media_path}")
-            local_hash = sha256()
+        return await self._finalize_download(
+            url, temp_path, media_path, remote_hash.hexdigest()
+        )
+
+    async def _download_segmented(
+        self,
+        url: str,
+        response: ResponseType,
+        media_path: Path,
+        temp_path: Path,
+        content_length: int,
+    ) -> tuple[str, Path]:
+        """
+        Downloads a large media file as several byte ranges fetched
+        concurrently into a preallocated temporary file.
+
+        The progress of every segment is saved next to the temporary file, so
+        an interrupted download resumes each segment where it stopped. The
+        SHA-256 of the file is computed once all the segments are complete.
+        Only as many segments run at once as the limit of the host allows.
 
-            # Read the existing local file in chunks asynchronously
-            async with aiofiles.open(media_path, "rb") as f:
-                while local_chunk := await f.read(chunk_size):
-                    local_hash.update(local_chunk)
+        Args:
+            url (str): The URL of the media to download.
+            response (ResponseType): The initial response, which is closed since
+                the body is fetched by ranges.
+            media_path (Path): The target file path to save the media.
+            temp_path (Path): The temporary file to write the segments to.
+            content_length (int): The total size of the media.
 
-            if local_hash.digest() == remote_hash.digest():
-                logger.info(f"File already exists and matches: {media_path}")
-                temp_path.unlink(missing_ok=True)
-                logger.debug(f"Removed temporary file: {temp_path}")
-                return "skipped", media_path
+        Returns:
+            tuple[str, Path]: A tuple containing the download status ("ok",
+            "skipped" or "error: <message>") and the final path of the media.
+        """
+        response.close()
+
+        state_path: Path = _get_segments_path(temp_path)
+        segments: list[list[int]] | None = _load_segments(state_path, content_length)
+        if segments is None or not temp_path.exists():
+            part_size: int = -(-content_length // SEGMENTED_DOWNLOAD_PARTS)
+            # [start, end, bytes downloaded] of every segment
+            segments = [
+                [start, min(start + part_size, content_length) - 1, 0]
+                for start in range(0, content_length, part_size)
+            ]
+            with open(temp_path, "wb") as f:
+                f.truncate(content_length)
+            _save_segments(state_path, content_length, segments)
+        else:
+            completed: int = sum(segment[2] for segment in segments)
+            logger.debug(f"Resuming segmented download from {completed} bytes")
+            print(f"Resuming download from {completed} bytes")
 
-        final_path: Path = get_unique_filename(media_path)
-        logger.debug(f"Final file path: {final_path}")
-        temp_path.rename(final_path)
+        logger.debug(f"Downloading {url} in {len(segments)} segments")
+        host: str = get_host(url)
+        chunk_size: int = self._get_initial_chunk_size(content_length)
+        last_save: float = monotonic()
+
+        with MediaProgress() as progress:
+            task = progress.add_task(
+                "Downloading",
+                filename=media_path.name,
+                completed=sum(segment[2] for segment in segments),
+                total=content_length,
+            )
 
-        return "ok", final_path
+            async def fetch_segment(segment: list[int]) -> None:
+                nonlocal last_save
+                start, end, _ = segment
+                # Consecutive requests that didn't receive a single byte
+                failures = 0
+                while segment[2] < end - start + 1:
+                    received: int = segment[2]
+                    offset: int = start + received
+                    headers = {**(self.headers or {}), "Range": f"bytes={offset}-{end}"}
+                    error: BaseException | None = None
+                    try:
+                        part = await self.fetch(
+                            url, raw_response=True, rate_limited=False, headers=headers
+                        )
+                        if part.status != 206:
+                            part.close()
+                            raise RangeNotSupportedError(
+                                f"Range request ignored with status {part.status}"
+                            )
+                        async with aiofiles.open(temp_path, "r+b") as f:
+                            await f.seek(offset)
+                            async for chunk in part.content.iter_chunked(chunk_size):
+                                await f.write(chunk)
+                                segment[2] += len(chunk)
+                                progress.advance(task, len(chunk))
+                                DOWNLOADED_BYTES.inc(host, amount=len(chunk))
+                                if monotonic() - last_save > 1.0:
+                                    _save_segments(state_path, content_length, segments)
+                                    last_save = monotonic()
+                    except (ClientError, TimeoutError) as e:
+                        logger.exception(f"Segment {start}-{end} of {url} failed")
+                        error = e
+
+                    if segment[2] > received:
+                        failures = 0
+                        continue
+                    # The request failed or the stream ended without any data
+                    failures += 1
+                    if failures >= MAX_RETRIES:
+                        raise error or ClientPayloadError(
+                            f"Segment {start}-{end} of {url} stopped receiving data"
+                        )
+                    RETRIES.inc(host, "segment")
+                    await sleep(min(2**failures, MAX_SLEEP_SECONDS))
+
+            async def run_segment(segment: list[int], parallel: Semaphore) -> None:
+                async with parallel:
+                    await fetch_segment(segment)
+
+            # The job holds one slot of the host, the other segments only run
+            # over the slots that are free right now
+            with self.scheduler.spare_host_slots(url, len(segments) - 1) as spare:
+                parallel = Semaphore(1 + spare)
+                outcomes = await gather(
+                    *(run_segment(segment, parallel) for segment in segments),
+                    return_exceptions=True,
+                )
+
+        errors: list[BaseException] = [e for e in outcomes if isinstance(e, BaseException)]
+        if any(isinstance(e, RangeNotSupportedError) for e in errors):
+            # The server advertises ranges but ignores them, start over with a
+            # single stream instead of failing the media on every run
+            logger.warning(f"{url} ignores Range requests, downloading it at once")
+            state_path.unlink(missing_ok=True)
+            temp_path.unlink(missing_ok=True)
+            response = await self.fetch(url, raw_response=True, rate_limited=False)
+            return await self.download_video(url, response, media_path, segmented=False)
+        if errors:
+            _save_segments(state_path, content_length, segments)
+            logger.error(f"Segmented download of {url} failed: {errors[0]}")
+            print(f"[bold red]ERROR[/bold red]: Failed to download {media_path.name}")
+            return f"error: {errors[0]}", media_path
+
+        state_path.unlink(missing_ok=True)
+        digest: str = await _hash_file(temp_path)
+        return await self._finalize_download(url, temp_path, media_path, digest)
 
     async def download_and_save_media(
         self, url: str, album_path: Path
@@ -347,8 +867,9 @@ class Downloader:
         path.
 
         This method determines the media type (image or video) based on the
-        content type and delegates to the appropriate download method. It also
-        handles caching and returns a standardized result dictionary.
+        content type and delegates to the appropriate download method. Every
+        outcome is recorded in the download ledger and a standardized result
+        dictionary is returned.
 
         Args:
             url (str): The URL of the media to download.
@@ -360,18 +881,44 @@ class Downloader:
         """
         logger.debug(f"Downloading media from URL: {url}")
 
-        if self.check_cache and get_url_hashfile(url).exists():
-            logger.info(f"Media already in cache, skipping download: {url}")
-            return {"url": url, "status": "skipped"}
+        # Only ask the server whether the media changed when the previous
+        # download is still intact on disk
+        previous: Path | None = self.ledger.get_path(url)
+        conditional: bool = (
+            previous is not None and self.content_index.get_digest(previous) is not None
+        )
+
+        # Without a previous download on record, a file already present under
+        # the name taken from the URL is compared by size before any GET
+        url_name: str = unquote(urlparse(url).path).split("/")[-1]
+        if not conditional and Path(url_name).suffix and not url_name.endswith(".php"):
+            media_path: Path = sanitize_path(album_path, url_name)
+            if media_path.is_file() and await self._is_downloaded(url, media_path):
+                logger.info(f"File already exists with the same size: {media_path}")
+                CACHE_HITS.inc("same_size")
+                self.ledger.record(url, "skipped", media_path, media_path.stat().st_size)
+                return {"url": url, "status": "skipped"}
 
+        t0: float = monotonic()
         try:
-            response: ResponseType = await self.fetch(url, raw_response=True)
+            response: ResponseType = await self.fetch(
+                url, raw_response=True, conditional=conditional, rate_limited=False
+            )
+        except NotModifiedError:
+            # The ledger already holds the path, size and digest of the media
+            logger.info(f"Media not modified since it was downloaded: {previous}")
+            return {"url": url, "status": "skipped"}
         except ClientResponseError as e:
             logger.exception(f"Failed to fetch {url}")
+            self.ledger.record(url, f"error: {e.status}")
             return {"url": url, "status": f"error: {e.status}"}
         except Exception as e:
             logger.exception(f"Failed to fetch {url}")
+            self.ledger.record(url, f"error: {e}")
             return {"url": url, "status": f"error: {e}"}
+        # The validators are read from the response once the media is saved,
+        # don't keep them around if the download fails
+        self.discard_validators(url)
 
         # Use urlparse to extract the media name from the URL
         media_name: str = unquote(urlparse(url).path).split("/")[-1]
@@ -387,7 +934,7 @@ class Downloader:
                 logger.warning(
                     f"Could not determine media name from URL or headers for {url}, using hash"
                 )
-                media_name = get_url_hashfile(url).stem
+                media_name = get_url_hash(url)
 
         content_type: str = response.headers.get("Content-Type", "")
 
@@ -416,7 +963,7 @@ class Downloader:
             media_name += extension
             logger.debug(f"Updated media name to: {media_name}")
 
-        media_path: Path = sanitize_path(album_path, media_name)
+        media_path = sanitize_path(album_path, media_name)
         logger.debug(f"Media path resolved to: {media_path}")
 
         if "mp4" in content_type or "video" in content_type:
@@ -424,11 +971,19 @@ class Downloader:
         else:
             status, final_path = await self.download_image(url, response, media_path)
 
+        DOWNLOAD_DURATION.observe(monotonic() - t0, get_host(url))
         if status == "ok":
-            if self.check_cache:
-                write_to_cache(url)
             logger.info(f"Downloaded media to: {final_path}")
         elif status == "skipped":
             logger.info(f"File already exists and matches: {media_path}")
+        else:
+            self.ledger.record(url, status)
+
+        if status in ("ok", "skipped"):
+            # Keep the validators so the next run can confirm the media is
+            # unchanged without downloading it again
+            validators: tuple[str | None, str | None] = _get_validators(response)
+            if any(validators):
+                self.ledger.set_validators(url, *validators)
 
         return {"url": url, "status": status}
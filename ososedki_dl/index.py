@@ -0,0 +1,162 @@
+"""Content-addressed index of the downloaded media files."""
+
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from core_helpers.logs import logger
+
+from .consts import INDEX_FILE
+
+if TYPE_CHECKING:
+    from os import stat_result
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS content_digest ON content (digest);
+"""
+
+
+class ContentIndex:
+    """
+    Persistent index mapping the SHA-256 digest of every downloaded file to
+    its path, size and modification time.
+
+    The index is filled with the digests computed while streaming the
+    downloads, so checking whether a file is a duplicate is a single indexed
+    lookup instead of re-reading the existing files. Entries are validated
+    against the size and modification time of the file on disk, so files
+    changed or removed outside of the program are never trusted.
+    """
+
+    def __init__(self, db_path: Path = INDEX_FILE) -> None:
+        """
+        Open the index, creating it if needed.
+
+        Args:
+            db_path (Path): The SQLite database file. Defaults to INDEX_FILE.
+        """
+        logger.debug(f"Opening content index at {db_path}")
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn: sqlite3.Connection = sqlite3.connect(db_path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _stat(path: Path) -> stat_result | None:
+        try:
+            return path.stat()
+        except OSError:
+            return None
+
+    def _is_valid(self, path: Path, size: int, mtime: float) -> bool:
+        """Check that an entry still describes the file on disk."""
+        st: stat_result | None = self._stat(path)
+        return st is not None and st.st_size == size and st.st_mtime == mtime
+
+    def add(self, path: Path, digest: str) -> None:
+        """
+        Record the digest of a file.
+
+        Args:
+            path (Path): The path of the file.
+            digest (str): The hex SHA-256 digest of its content.
+        """
+        st: stat_result | None = self._stat(path)
+        if st is None:
+            logger.warning(f"Cannot index missing file: {path}")
+            return
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO content (path, digest, size, mtime) "
+            "VALUES (?, ?, ?, ?)",
+            (str(path), digest, st.st_size, st.st_mtime),
+        )
+
+    def get_digest(self, path: Path) -> str | None:
+        """
+        Get the digest of an indexed file.
+
+        Args:
+            path (Path): The path of the file.
+
+        Returns:
+            str | None: The hex digest of the file, or None if it is not
+            indexed or has changed since it was.
+        """
+        row = self._conn.execute(
+            "SELECT digest, size, mtime FROM content WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row is None:
+            return None
+
+        digest, size, mtime = row
+        if not self._is_valid(path, size, mtime):
+            self.remove(path)
+            return None
+        return digest
+
+    def find(self, digest: str, directory: Path) -> Path | None:
+        """
+        Find a file with the given content inside a directory.
+
+        Stale entries found along the way are dropped from the index.
+
+        Args:
+            digest (str): The hex SHA-256 digest to look for.
+            directory (Path): The directory the file must be in.
+
+        Returns:
+            Path | None: The path of a matching file, or None if there is none.
+        """
+        rows = self._conn.execute(
+            "SELECT path, size, mtime FROM content WHERE digest = ?", (digest,)
+        ).fetchall()
+        for raw_path, size, mtime in rows:
+            path = Path(raw_path)
+            if path.parent != directory:
+                continue
+            if self._is_valid(path, size, mtime):
+                logger.debug(f"Found indexed file with digest {digest}: {path}")
+                return path
+            self.remove(path)
+        return None
+
+    def remove(self, path: Path) -> None:
+        """
+        Drop a file from the index.
+
+        Args:
+            path (Path): The path of the file.
+        """
+        logger.debug(f"Removing stale index entry: {path}")
+        self._conn.execute("DELETE FROM content WHERE path = ?", (str(path),))
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        self._conn.close()
+
+
+_content_index: ContentIndex | None = None
+
+
+def get_content_index() -> ContentIndex:
+    """
+    Get the content index shared by the whole process, opening it on first
+    use.
+
+    Returns:
+        ContentIndex: The shared content index.
+    """
+    global _content_index
+    if _content_index is None:
+        _content_index = ContentIndex()
+    return _content_index
@@ -0,0 +1,292 @@
+"""Job queue shared by the worker processes, stored in SQLite."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from time import time
+from typing import TYPE_CHECKING
+
+from core_helpers.logs import logger
+
+from .consts import QUEUE_FILE, QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    dest_path TEXT NOT NULL,
+    crawler TEXT,
+    title TEXT,
+    media TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    results TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, url)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires);
+"""
+
+
+@dataclass
+class QueuedJob:
+    """A job leased from the queue."""
+
+    id: int
+    kind: str
+    url: str
+    dest_path: Path
+    crawler: str | None = None
+    title: str | None = None
+    media_urls: list[str] | None = None
+
+
+class JobQueue:
+    """
+    Queue of the URLs and albums to download, shared by several processes.
+
+    A job is leased by one worker at a time for QUEUE_LEASE_SECONDS, and the
+    worker renews the lease while the job runs. The job of a worker that
+    crashed is leased again by another one once its lease expires, and a job
+    that crashed its workers QUEUE_MAX_ATTEMPTS times is marked as failed.
+    Every job is stored once, so an album discovered twice is only downloaded
+    by one worker.
+
+    Job kinds:
+
+    - `url`: a URL given by the user, crawled by the matching crawler.
+    - `album`: an album found while crawling a URL, processed by the crawler
+      that found it.
+    """
+
+    def __init__(self, db_path: Path = QUEUE_FILE) -> None:
+        """
+        Open the queue, creating it if needed.
+
+        Args:
+            db_path (Path): The SQLite database file. Defaults to QUEUE_FILE.
+        """
+        logger.debug(f"Opening job queue at {db_path}")
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are handled explicitly, leasing needs BEGIN IMMEDIATE
+        self._conn: sqlite3.Connection = sqlite3.connect(
+            db_path, timeout=30.0, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def reset(self) -> None:
+        """Remove every job, to start a new run."""
+        self._conn.execute("DELETE FROM jobs")
+
+    def release_leases(self) -> None:
+        """
+        Put the jobs leased by the workers of a previous run back in the
+        queue. Only safe when no worker is running.
+        """
+        self._conn.execute(
+            "UPDATE jobs SET state = 'pending', owner = NULL, lease_expires = NULL "
+            "WHERE state = 'leased'"
+        )
+
+    def add(
+        self,
+        kind: str,
+        url: str,
+        dest_path: Path,
+        crawler: str | None = None,
+        title: str | None = None,
+        media_urls: list[str] | None = None,
+    ) -> bool:
+        """
+        Add a job, unless the same job is already in the queue.
+
+        Args:
+            kind (str): The kind of job, "url" or "album".
+            url (str): The URL to download.
+            dest_path (Path): The directory to download to.
+            crawler (str, optional): The name of the crawler class processing
+                the job. Defaults to the crawler matching the URL.
+            title (str, optional): The title of the album.
+            media_urls (list[str], optional): The media of the album, when
+                already known.
+
+        Returns:
+            bool: True if the job was added.
+        """
+        cursor: sqlite3.Cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO jobs "
+            "(kind, url, dest_path, crawler, title, media, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                kind,
+                url,
+                str(dest_path),
+                crawler,
+                title,
+                json.dumps(media_urls) if media_urls is not None else None,
+                time(),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def lease(self, owner: str) -> QueuedJob | None:
+        """
+        Lease the next pending job, or a job whose lease expired.
+
+        Args:
+            owner (str): The ID of the worker leasing the job.
+
+        Returns:
+            QueuedJob | None: The leased job, or None if there is no job
+            available right now.
+        """
+        now: float = time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Give up on the jobs whose workers kept crashing
+            self._conn.execute(
+                "UPDATE jobs SET state = 'failed', results = ?, updated_at = ? "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (
+                    json.dumps([]),
+                    now,
+                    now,
+                    QUEUE_MAX_ATTEMPTS,
+                ),
+            )
+            row = self._conn.execute(
+                "SELECT id, kind, url, dest_path, crawler, title, media FROM jobs "
+                "WHERE state = 'pending' "
+                "OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'leased', owner = ?, "
+                    "lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ?",
+                    (owner, now + QUEUE_LEASE_SECONDS, now, row[0]),
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        job_id, kind, url, dest_path, crawler, title, media = row
+        logger.debug(f"Worker {owner} leased {kind} job {job_id}: {url}")
+        return QueuedJob(
+            id=job_id,
+            kind=kind,
+            url=url,
+            dest_path=Path(dest_path),
+            crawler=crawler,
+            title=title,
+            media_urls=json.loads(media) if media else None,
+        )
+
+    def renew(self, job_id: int, owner: str) -> bool:
+        """
+        Extend the lease of a running job.
+
+        Args:
+            job_id (int): The ID of the job.
+            owner (str): The ID of the worker running the job.
+
+        Returns:
+            bool: False if the lease was lost to another worker.
+        """
+        cursor: sqlite3.Cursor = self._conn.execute(
+            "UPDATE jobs SET lease_expires = ? "
+            "WHERE id = ? AND owner = ? AND state = 'leased'",
+            (time() + QUEUE_LEASE_SECONDS, job_id, owner),
+        )
+        return cursor.rowcount > 0
+
+    def complete(
+        self, job_id: int, owner: str, results: list[dict[str, str]]
+    ) -> bool:
+        """
+        Store the results of a job and mark it as done, or as failed if any
+        download failed.
+
+        Args:
+            job_id (int): The ID of the job.
+            owner (str): The ID of the worker that ran the job.
+            results (list[dict[str, str]]): The results of the downloads.
+
+        Returns:
+            bool: False if the lease was lost to another worker, whose results
+            are kept instead.
+        """
+        failed: bool = any(r["status"].startswith("error") for r in results)
+        cursor: sqlite3.Cursor = self._conn.execute(
+            "UPDATE jobs SET state = ?, results = ?, owner = NULL, "
+            "lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND owner = ? AND state = 'leased'",
+            (
+                "failed" if failed else "done",
+                json.dumps(results),
+                time(),
+                job_id,
+                owner,
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def counts(self) -> Counter[str]:
+        """
+        Count the jobs by state.
+
+        Returns:
+            Counter[str]: The number of jobs in each state.
+        """
+        return Counter(
+            dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        )
+
+    def is_finished(self) -> bool:
+        """
+        Check if every job is done or failed.
+
+        Returns:
+            bool: True if no job is pending or running.
+        """
+        counts: Counter[str] = self.counts()
+        return not counts["pending"] and not counts["leased"]
+
+    def results(self) -> Iterator[dict[str, str]]:
+        """
+        Iterate over the results of every finished job. Jobs given up after
+        crashing their workers are reported as an error of their URL.
+
+        Yields:
+            dict[str, str]: The result of a download.
+        """
+        rows = self._conn.execute(
+            "SELECT url, state, results FROM jobs "
+            "WHERE state IN ('done', 'failed') ORDER BY id"
+        )
+        for url, state, results in rows:
+            job_results: list[dict[str, str]] = json.loads(results or "[]")
+            if state == "failed" and not job_results:
+                job_results = [{"url": url, "status": "error: worker crashed"}]
+            yield from job_results
+
+    def close(self) -> None:
+        """Close the database."""
+        self._conn.close()
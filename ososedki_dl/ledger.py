@@ -0,0 +1,402 @@
+"""Ledger of every media URL processed by the program."""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+from pathlib import Path
+from time import monotonic, time
+from typing import TYPE_CHECKING
+
+from core_helpers.logs import logger
+
+from .bloom import BloomFilter
+from .consts import (BLOOM_CAPACITY, BLOOM_ERROR_RATE, LEDGER_BATCH_SIZE,
+                     LEDGER_FILE, LEDGER_FLUSH_SECONDS, LEGACY_CACHE_PATH)
+from .utils import get_url_hash
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Any
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    url_hash TEXT PRIMARY KEY,
+    url TEXT,
+    status TEXT NOT NULL,
+    path TEXT,
+    size INTEGER,
+    digest TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS validators (
+    url_hash TEXT PRIMARY KEY,
+    url TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+# Statuses meaning the media is already on disk
+_DONE_STATUSES: tuple[str, ...] = ("ok", "skipped")
+# Keep the number of bound parameters per query below the SQLite limit
+_QUERY_BATCH_SIZE = 500
+_URL_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+# A media already on disk is never demoted by a later failure or by a record
+# that doesn't know its path, size or digest
+_UPSERT_DOWNLOAD = """
+INSERT INTO downloads (url_hash, url, status, path, size, digest, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (url_hash) DO UPDATE SET
+    url = COALESCE(excluded.url, url),
+    status = CASE
+        WHEN status IN ('ok', 'skipped')
+            AND excluded.status NOT IN ('ok', 'skipped') THEN status
+        ELSE excluded.status
+    END,
+    path = COALESCE(excluded.path, path),
+    size = COALESCE(excluded.size, size),
+    digest = COALESCE(excluded.digest, digest),
+    updated_at = excluded.updated_at
+"""
+
+
+def _merge_records(old: tuple[Any, ...], new: tuple[Any, ...]) -> tuple[Any, ...]:
+    """
+    Merge two buffered records of the same URL with the rules of the upsert
+    of the database.
+
+    Args:
+        old (tuple[Any, ...]): The buffered record.
+        new (tuple[Any, ...]): The record replacing it.
+
+    Returns:
+        tuple[Any, ...]: The merged record.
+    """
+    url, status, path, size, digest, updated_at = new
+    if old[1] in _DONE_STATUSES and status not in _DONE_STATUSES:
+        status = old[1]
+    return (
+        old[0] if url is None else url,
+        status,
+        old[2] if path is None else path,
+        old[3] if size is None else size,
+        old[4] if digest is None else digest,
+        updated_at,
+    )
+
+
+class DownloadLedger:
+    """
+    Single-file ledger recording the URL, status, path, size and digest of
+    every media download, along with the HTTP validators (ETag and
+    Last-Modified) of the pages and media fully processed.
+
+    Writes are buffered and flushed in batches, and membership checks for a
+    whole album are answered with a few bulk queries. A memory-mapped Bloom
+    filter of every downloaded URL sits in front of the database, so URLs
+    that were never downloaded are ruled out without any I/O and only the
+    possible hits reach SQLite.
+    """
+
+    def __init__(self, db_path: Path = LEDGER_FILE) -> None:
+        """
+        Open the ledger, creating it if needed.
+
+        Args:
+            db_path (Path): The SQLite database file. Defaults to LEDGER_FILE.
+        """
+        logger.debug(f"Opening download ledger at {db_path}")
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn: sqlite3.Connection = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Buffered records by URL hash, waiting to be flushed
+        self._pending: dict[str, tuple[Any, ...]] = {}
+        self._pending_validators: dict[str, tuple[Any, ...]] = {}
+        self._last_flush: float = monotonic()
+        self._import_legacy_cache()
+        self._bloom: BloomFilter = self._open_bloom(db_path.with_suffix(".bloom"))
+
+    def _import_legacy_cache(self) -> None:
+        """
+        Import the per-URL files of the legacy cache directory, whose names are
+        the hashes of the downloaded URLs. Runs only once per ledger.
+        """
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version:
+            return
+
+        if LEGACY_CACHE_PATH.is_dir():
+            logger.info(f"Importing legacy cache from {LEGACY_CACHE_PATH}")
+            now: float = time()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO downloads (url_hash, status, updated_at) "
+                    "VALUES (?, 'ok', ?)",
+                    (
+                        (path.name, now)
+                        for path in LEGACY_CACHE_PATH.iterdir()
+                        if _URL_HASH_PATTERN.fullmatch(path.name)
+                    ),
+                )
+        self._conn.execute("PRAGMA user_version = 1")
+
+    def _open_bloom(self, path: Path) -> BloomFilter:
+        """
+        Open the Bloom filter of the ledger, rebuilding it from the database
+        when it is missing, resized or behind the database (e.g. after a
+        crash).
+
+        Args:
+            path (Path): The file backing the filter.
+
+        Returns:
+            BloomFilter: The filter in sync with the database.
+        """
+        (done,) = self._conn.execute(
+            "SELECT COUNT(*) FROM downloads WHERE status IN ('ok', 'skipped')"
+        ).fetchone()
+
+        # Grow the filter in steps so its geometry is stable between runs
+        capacity: int = BLOOM_CAPACITY
+        while capacity < done:
+            capacity *= 2
+
+        bloom = BloomFilter.for_capacity(path, capacity, BLOOM_ERROR_RATE)
+        # Workers opening the ledger together rebuild the filter only once
+        with bloom.locked():
+            if bloom.count < done:
+                logger.info(f"Rebuilding Bloom filter of the ledger with {done} URLs")
+                bloom.clear()
+                rows = self._conn.execute(
+                    "SELECT url_hash FROM downloads WHERE status IN ('ok', 'skipped')"
+                )
+                for (url_hash,) in rows:
+                    bloom.add(bytes.fromhex(url_hash))
+        return bloom
+
+    def record(
+        self,
+        url: str,
+        status: str,
+        path: Path | None = None,
+        size: int | None = None,
+        digest: str | None = None,
+    ) -> None:
+        """
+        Record the outcome of a media download. The write is buffered until
+        the batch is full or enough time has passed since the last flush.
+
+        A media recorded as downloaded keeps its status when a later attempt
+        fails, and the path, size and digest not given are left unchanged.
+
+        Args:
+            url (str): The URL of the media.
+            status (str): The status of the download ("ok", "skipped" or
+                "error: <message>").
+            path (Path, optional): The path the media is stored at.
+            size (int, optional): The size of the media in bytes.
+            digest (str, optional): The hex SHA-256 digest of the media.
+        """
+        url_hash: str = get_url_hash(url)
+        if status in _DONE_STATUSES:
+            self._bloom.add(bytes.fromhex(url_hash))
+        row: tuple[Any, ...] = (
+            url,
+            status,
+            str(path) if path else None,
+            size,
+            digest,
+            time(),
+        )
+        pending: tuple[Any, ...] | None = self._pending.get(url_hash)
+        if pending is not None:
+            row = _merge_records(pending, row)
+        self._pending[url_hash] = row
+        if (
+            len(self._pending) >= LEDGER_BATCH_SIZE
+            or monotonic() - self._last_flush >= LEDGER_FLUSH_SECONDS
+        ):
+            self.flush()
+
+    def get_path(self, url: str) -> Path | None:
+        """
+        Get the path a media was downloaded to.
+
+        Args:
+            url (str): The URL of the media.
+
+        Returns:
+            Path | None: The recorded path of the media, or None if it was
+            never downloaded.
+        """
+        url_hash: str = get_url_hash(url)
+        if bytes.fromhex(url_hash) not in self._bloom:
+            return None
+
+        row: tuple[Any, ...] | None = self._conn.execute(
+            "SELECT url, status, path, size, digest, updated_at FROM downloads "
+            "WHERE url_hash = ?",
+            (url_hash,),
+        ).fetchone()
+        pending: tuple[Any, ...] | None = self._pending.get(url_hash)
+        if pending is not None:
+            # Apply the buffered record the way the flush will
+            row = pending if row is None else _merge_records(row, pending)
+        if row is None:
+            return None
+        status, path = row[1], row[2]
+        return Path(path) if status in _DONE_STATUSES and path else None
+
+    def get_validators(self, url: str) -> tuple[str | None, str | None]:
+        """
+        Get the HTTP validators stored for a URL.
+
+        Args:
+            url (str): The URL of the page or media.
+
+        Returns:
+            tuple[str | None, str | None]: The ETag and Last-Modified values,
+            which are None when not known.
+        """
+        url_hash: str = get_url_hash(url)
+        row = self._pending_validators.get(url_hash)
+        if row is not None:
+            return row[1], row[2]
+
+        row = self._conn.execute(
+            "SELECT etag, last_modified FROM validators WHERE url_hash = ?",
+            (url_hash,),
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def set_validators(
+        self, url: str, etag: str | None, last_modified: str | None
+    ) -> None:
+        """
+        Store the HTTP validators of a URL, to be sent on the next request so
+        the server can answer with 304 Not Modified. Passing no validators
+        forgets the stored ones. The write is buffered like the records.
+
+        Args:
+            url (str): The URL of the page or media.
+            etag (str, optional): The ETag of the response.
+            last_modified (str, optional): The Last-Modified date of the
+                response.
+        """
+        self._pending_validators[get_url_hash(url)] = (
+            url,
+            etag,
+            last_modified,
+            time(),
+        )
+        if len(self._pending_validators) >= LEDGER_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records to the database."""
+        self._last_flush = monotonic()
+        if not self._pending and not self._pending_validators:
+            return
+
+        logger.debug(
+            f"Flushing {len(self._pending)} ledger records and "
+            f"{len(self._pending_validators)} validators"
+        )
+        with self._conn:
+            self._conn.executemany(
+                _UPSERT_DOWNLOAD,
+                ((url_hash, *row) for url_hash, row in self._pending.items()),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO validators "
+                "(url_hash, url, etag, last_modified, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (url_hash, *row)
+                    for url_hash, row in self._pending_validators.items()
+                ),
+            )
+        self._pending.clear()
+        self._pending_validators.clear()
+
+    def contains_many(self, urls: Iterable[str]) -> set[str]:
+        """
+        Get which of the given URLs have already been downloaded.
+
+        Args:
+            urls (Iterable[str]): The URLs to check.
+
+        Returns:
+            set[str]: The subset of URLs already downloaded.
+        """
+        hashes: dict[str, str] = {get_url_hash(url): url for url in urls}
+        found: set[str] = set()
+
+        lookup: list[str] = []
+        for url_hash, url in hashes.items():
+            if bytes.fromhex(url_hash) not in self._bloom:
+                # Definitely never downloaded
+                continue
+            pending = self._pending.get(url_hash)
+            if pending is not None and pending[1] in _DONE_STATUSES:
+                found.add(url)
+            else:
+                # A buffered failure doesn't demote a media already downloaded
+                lookup.append(url_hash)
+
+        for i in range(0, len(lookup), _QUERY_BATCH_SIZE):
+            batch: list[str] = lookup[i : i + _QUERY_BATCH_SIZE]
+            placeholders: str = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                "SELECT url_hash FROM downloads "
+                f"WHERE url_hash IN ({placeholders}) AND status IN ('ok', 'skipped')",
+                batch,
+            )
+            found.update(hashes[url_hash] for (url_hash,) in rows)
+
+        return found
+
+    def contains(self, url: str) -> bool:
+        """
+        Check if a URL has already been downloaded.
+
+        Args:
+            url (str): The URL to check.
+
+        Returns:
+            bool: True if the URL has already been downloaded.
+        """
+        return bool(self.contains_many((url,)))
+
+    def close(self) -> None:
+        """Flush the buffered records and close the database and the filter."""
+        self.flush()
+        self._conn.close()
+        self._bloom.close()
+
+
+_ledger: DownloadLedger | None = None
+
+
+def get_ledger() -> DownloadLedger:
+    """
+    Get the ledger shared by the whole process, opening it on first use.
+
+    Returns:
+        DownloadLedger: The shared download ledger.
+    """
+    global _ledger
+    if _ledger is None:
+        _ledger = DownloadLedger()
+    return _ledger
+
+
+def close_ledger() -> None:
+    """Flush and close the shared ledger if it was opened."""
+    global _ledger
+    if _ledger is not None:
+        _ledger.close()
+        _ledger = None
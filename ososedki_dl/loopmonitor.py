@@ -0,0 +1,250 @@
+"""Watchdog of the event loop, reporting the calls that block it."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import traceback
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from core_helpers.logs import logger
+from rich import print
+
+from .consts import LOOP_LAG_INTERVAL
+from .metrics import LOOP_LAG, LOOP_STALLS
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+    from types import FrameType
+
+_PACKAGE_DIR: str = str(Path(__file__).resolve().parent)
+UNKNOWN_SITE = "(unknown)"
+
+
+def _describe(frame: FrameType) -> str:
+    """Describe the line a frame is running, like `func (package/file.py:10)`."""
+    code = frame.f_code
+    path = Path(code.co_filename)
+    name: str = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({path.parent.name}/{path.name}:{frame.f_lineno})"
+
+
+def _get_call_site(frame: FrameType) -> tuple[str, str]:
+    """
+    Find where a blocked loop is stuck.
+
+    Args:
+        frame (FrameType): The innermost frame of the loop thread.
+
+    Returns:
+        tuple[str, str]: The innermost line of the package on the stack,
+        where the blocking call is made, and the innermost line of all,
+        the call that blocks.
+    """
+    blocking: str = _describe(frame)
+    current: FrameType | None = frame
+    while current is not None:
+        if current.f_code.co_filename.startswith(_PACKAGE_DIR):
+            return _describe(current), blocking
+        current = current.f_back
+    return blocking, blocking
+
+
+@dataclass
+class CallSite:
+    """The stalls of the event loop blamed on one call site."""
+
+    site: str
+    blocking: str
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    # Stack of the first stall, to find how the call site was reached
+    stack: list[str] = field(default_factory=list, repr=False)
+
+
+class LoopMonitor:
+    """
+    Measure how late the event loop runs its callbacks, and find the calls
+    that block it.
+
+    A heartbeat task sleeps LOOP_LAG_INTERVAL seconds over and over, and
+    measures how much later than planned it wakes up: the lag of the loop.
+    A watchdog thread checks the heartbeat, and when it is more than the
+    threshold late it takes the stack of the loop thread, which is running
+    the blocking call right then. When the loop recovers, the stall is
+    blamed on the call site of the package that made the blocking call.
+    """
+
+    def __init__(self, threshold: float, interval: float = LOOP_LAG_INTERVAL) -> None:
+        """
+        Create a monitor, started with `start` on the loop to watch.
+
+        Args:
+            threshold (float): Lag in seconds above which the loop is blocked.
+            interval (float): Seconds between two heartbeats. Defaults to
+                LOOP_LAG_INTERVAL.
+
+        Raises:
+            ValueError: If the threshold or the interval is not positive, the
+                watchdog would spin without ever sleeping.
+        """
+        if threshold <= 0 or interval <= 0:
+            raise ValueError("The loop lag threshold and interval must be positive")
+        self.threshold: float = threshold
+        self.interval: float = interval
+        self.max_lag: float = 0.0
+        self.sites: dict[tuple[str, str], CallSite] = {}
+        self._beat: float = 0.0
+        # Heartbeat it was taken for, call site and stack of the last capture
+        self._capture: tuple[float, str, str, list[str]] | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread_id: int | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._watchdog: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        self._thread_id = threading.get_ident()
+        self._beat = perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stop monitoring."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            beat: float = self._beat
+            await asyncio.sleep(self.interval)
+            now: float = perf_counter()
+            lag: float = max(now - beat - self.interval, 0.0)
+            with self._lock:
+                capture = self._capture
+                self._capture = None
+                self._beat = now
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                # A capture taken during an older stall doesn't explain this one
+                if capture is not None and capture[0] != beat:
+                    capture = None
+                self._record(lag, capture)
+
+    def _watch(self) -> None:
+        # Check often enough to catch the stalls just above the threshold
+        period: float = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(period):
+            with self._lock:
+                beat: float = self._beat
+                if self._capture is not None and self._capture[0] == beat:
+                    continue
+                if perf_counter() - beat < self.interval + self.threshold:
+                    continue
+            frame: FrameType | None = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            site, blocking = _get_call_site(frame)
+            stack: list[str] = traceback.format_stack(frame)
+            with self._lock:
+                # Drop the capture if the loop recovered in the meantime
+                if self._beat == beat:
+                    self._capture = (beat, site, blocking, stack)
+
+    def _record(
+        self, lag: float, capture: tuple[float, str, str, list[str]] | None
+    ) -> None:
+        site, blocking, stack = UNKNOWN_SITE, UNKNOWN_SITE, []
+        if capture is not None:
+            _, site, blocking, stack = capture
+
+        call_site: CallSite | None = self.sites.get((site, blocking))
+        if call_site is None:
+            call_site = self.sites[site, blocking] = CallSite(
+                site, blocking, stack=stack
+            )
+        call_site.count += 1
+        call_site.total += lag
+        call_site.max = max(call_site.max, lag)
+        LOOP_STALLS.inc(site)
+        logger.debug(
+            f"Event loop blocked for {lag * 1000:.0f} ms at {site} by {blocking}"
+        )
+
+    def report(self) -> list[CallSite]:
+        """
+        Get the stalls of the loop by call site.
+
+        Returns:
+            list[CallSite]: The call sites, the longest blocking first.
+        """
+        return sorted(self.sites.values(), key=lambda s: s.total, reverse=True)
+
+    def print_report(self, limit: int = 10) -> None:
+        """
+        Print the call sites that blocked the loop the longest, and log the
+        stack of each one.
+
+        Args:
+            limit (int): The number of call sites to print. Defaults to 10.
+        """
+        sites: list[CallSite] = self.report()
+        stalls: int = sum(s.count for s in sites)
+        print(
+            f"\n[bold]Event loop:[/] {stalls} stalls over "
+            f"{self.threshold * 1000:.0f} ms, max lag {self.max_lag * 1000:.0f} ms"
+        )
+        for s in sites[:limit]:
+            print(
+                f"  {s.count:5d}x {s.total:7.2f} s (max {s.max * 1000:6.0f} ms) "
+                f"{s.site} -> {s.blocking}"
+            )
+        for s in sites:
+            logger.info(
+                f"Event loop blocked {s.count} times for {s.total:.3f} s "
+                f"(max {s.max:.3f} s) at {s.site} by {s.blocking}:\n"
+                + "".join(s.stack)
+            )
+
+
+@asynccontextmanager
+async def monitor_loop(threshold_ms: float | None) -> AsyncIterator[None]:
+    """
+    Monitor the event loop while the block runs, then print the calls that
+    blocked it.
+
+    Args:
+        threshold_ms (float, optional): Lag in milliseconds above which the
+            loop is blocked. The loop is not monitored if not provided.
+    """
+    if threshold_ms is None:
+        yield
+        return
+
+    monitor = LoopMonitor(threshold_ms / 1000)
+    logger.info(f"Monitoring event loop stalls over {threshold_ms} ms")
+    monitor.start()
+    try:
+        yield
+    finally:
+        await monitor.stop()
+        monitor.print_report()
@@ -0,0 +1,460 @@
+"""Metrics of the downloads, exposed in the Prometheus/OpenMetrics text format
+and as an in-process snapshot."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import asynccontextmanager, contextmanager
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+from core_helpers.logs import logger
+from rich import print
+
+from .utils import parse_address
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator
+    from pathlib import Path
+    from typing import Any, ClassVar
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# Seconds, from a cached response to a slow video
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+    120.0, 300.0,
+)  # fmt: skip
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format."""
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the text format."""
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric(ABC):
+    """
+    Base class of the metrics. Every sample is identified by the values of
+    the labels of the metric, passed positionally in the order of
+    `labelnames`.
+    """
+
+    type: ClassVar[str]
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        """
+        Initialize the metric.
+
+        Args:
+            name (str): The name of the metric.
+            documentation (str): The help text of the metric.
+            labelnames (tuple[str, ...]): The names of the labels of the
+                metric. Defaults to no labels.
+        """
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labelnames: tuple[str, ...] = labelnames
+
+    def _format_labels(self, labels: tuple[str, ...], **extra: str) -> str:
+        """Format the labels of a sample for the text format."""
+        pairs: list[tuple[str, str]] = [*zip(self.labelnames, labels), *extra.items()]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def _labels_dict(self, labels: tuple[str, ...]) -> dict[str, str]:
+        """Map the label values of a sample to their names."""
+        return dict(zip(self.labelnames, labels))
+
+    @abstractmethod
+    def samples(self, openmetrics: bool = False) -> Iterator[str]:
+        """Yield the sample lines of the metric in the text format."""
+        raise NotImplementedError("Each metric must implement its own samples method")
+
+    @abstractmethod
+    def snapshot(self) -> list[dict[str, Any]]:
+        """Get the current samples of the metric as plain data."""
+        raise NotImplementedError("Each metric must implement its own snapshot method")
+
+    def expose(self, openmetrics: bool = False) -> str:
+        """
+        Render the metric in the text format.
+
+        Args:
+            openmetrics (bool): Whether to follow the OpenMetrics format
+                instead of the Prometheus one. Defaults to False.
+
+        Returns:
+            str: The HELP and TYPE lines followed by the samples.
+        """
+        name: str = self.name
+        if openmetrics and self.type == "counter":
+            # OpenMetrics names the counter family without the suffix
+            name = name.removesuffix("_total")
+        lines: list[str] = [
+            f"# HELP {name} {self.documentation}",
+            f"# TYPE {name} {self.type}",
+            *self.samples(openmetrics),
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    """A value that only goes up, like the number of requests sent."""
+
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """
+        Increase the counter.
+
+        Args:
+            *labels (str): The values of the labels of the sample.
+            amount (float): The amount to increase by. Defaults to 1.
+        """
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        """
+        Get the value of a sample.
+
+        Args:
+            *labels (str): The values of the labels of the sample.
+
+        Returns:
+            float: The value of the sample, 0 if it was never increased.
+        """
+        return self._values.get(labels, 0.0)
+
+    def samples(self, openmetrics: bool = False) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{self._format_labels(labels)} {_format_value(value)}"
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [
+            {"labels": self._labels_dict(labels), "value": value}
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    """A value that goes up and down, like the number of queued jobs."""
+
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        """
+        Decrease the gauge.
+
+        Args:
+            *labels (str): The values of the labels of the sample.
+            amount (float): The amount to decrease by. Defaults to 1.
+        """
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels: str) -> Iterator[None]:
+        """
+        Increase the gauge while the block runs.
+
+        Args:
+            *labels (str): The values of the labels of the sample.
+        """
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(Metric):
+    """The distribution of observed values, like the download durations."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        # Per sample: the count of each bucket (not cumulative), then the
+        # count above the last bucket, and the sum of the observations
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Record an observation.
+
+        Args:
+            value (float): The observed value.
+            *labels (str): The values of the labels of the sample.
+        """
+        counts: list[int] | None = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def _cumulative(self, labels: tuple[str, ...]) -> list[tuple[float, int]]:
+        """Get the cumulative count of every bucket, ending with +Inf."""
+        total = 0
+        result: list[tuple[float, int]] = []
+        for bound, count in zip((*self.buckets, float("inf")), self._counts[labels]):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def samples(self, openmetrics: bool = False) -> Iterator[str]:
+        for labels in self._counts:
+            cumulative: list[tuple[float, int]] = self._cumulative(labels)
+            for bound, count in cumulative:
+                le: str = _format_value(bound)
+                if openmetrics and bound != float("inf") and "." not in le:
+                    le += ".0"
+                yield (
+                    f"{self.name}_bucket{self._format_labels(labels, le=le)} {count}"
+                )
+            yield f"{self.name}_count{self._format_labels(labels)} {cumulative[-1][1]}"
+            yield (
+                f"{self.name}_sum{self._format_labels(labels)} "
+                f"{_format_value(self._sums[labels])}"
+            )
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        result: list[dict[str, Any]] = []
+        for labels in self._counts:
+            cumulative: list[tuple[float, int]] = self._cumulative(labels)
+            result.append(
+                {
+                    "labels": self._labels_dict(labels),
+                    "count": cumulative[-1][1],
+                    "sum": self._sums[labels],
+                    "buckets": {_format_value(b): c for b, c in cumulative},
+                }
+            )
+        return result
+
+
+class MetricsRegistry:
+    """Collection of the metrics of the process."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add a metric to the registry.
+
+        Args:
+            metric (Metric): The metric to add.
+
+        Returns:
+            Metric: The same metric.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicated metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> Counter:
+        """Create and register a counter."""
+        counter = Counter(name, documentation, labelnames)
+        self.register(counter)
+        return counter
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> Gauge:
+        """Create and register a gauge."""
+        gauge = Gauge(name, documentation, labelnames)
+        self.register(gauge)
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram."""
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self.register(histogram)
+        return histogram
+
+    def expose(self, openmetrics: bool = False) -> str:
+        """
+        Render every metric in the text format.
+
+        Args:
+            openmetrics (bool): Whether to follow the OpenMetrics format
+                instead of the Prometheus one. Defaults to False.
+
+        Returns:
+            str: The exposition of the metrics.
+        """
+        text: str = "".join(
+            metric.expose(openmetrics) for metric in self._metrics.values()
+        )
+        return text + "# EOF\n" if openmetrics else text
+
+    def snapshot(self) -> dict[str, list[dict[str, Any]]]:
+        """
+        Get the current samples of every metric.
+
+        Returns:
+            dict[str, list[dict[str, Any]]]: The samples of each metric by
+            name.
+        """
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter(
+    "ososedki_requests_total", "HTTP requests by host and status.", ("host", "status")
+)
+RETRIES = REGISTRY.counter(
+    "ososedki_retries_total", "Requests retried by host and reason.", ("host", "reason")
+)
+DOWNLOADED_BYTES = REGISTRY.counter(
+    "ososedki_downloaded_bytes_total", "Bytes of media downloaded by host.", ("host",)
+)
+TIME_TO_FIRST_BYTE = REGISTRY.histogram(
+    "ososedki_time_to_first_byte_seconds",
+    "Seconds until the response headers are received, by host.",
+    ("host",),
+)
+DOWNLOAD_DURATION = REGISTRY.histogram(
+    "ososedki_download_duration_seconds",
+    "Seconds to download a media, by host.",
+    ("host",),
+)
+MEDIA = REGISTRY.counter(
+    "ososedki_media_total",
+    "Media processed by crawler and status.",
+    ("crawler", "status"),
+)
+ALBUMS = REGISTRY.counter(
+    "ososedki_albums_total",
+    "Albums processed by crawler and status.",
+    ("crawler", "status"),
+)
+CACHE_HITS = REGISTRY.counter(
+    "ososedki_cache_hits_total",
+    "Downloads avoided by kind: http_cache, not_modified, same_size or ledger.",
+    ("kind",),
+)
+JOBS = REGISTRY.gauge(
+    "ososedki_jobs", "Media jobs of the scheduler by state.", ("state",)
+)
+LOOP_LAG = REGISTRY.histogram(
+    "ososedki_event_loop_lag_seconds",
+    "Seconds the event loop was late to run a scheduled callback.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = REGISTRY.counter(
+    "ososedki_event_loop_stalls_total",
+    "Event loop stalls over the lag threshold by blocking call site.",
+    ("site",),
+)
+
+
+def stats() -> dict[str, list[dict[str, Any]]]:
+    """
+    Get a snapshot of the metrics of the process.
+
+    Returns:
+        dict[str, list[dict[str, Any]]]: The samples of each metric by name.
+        Every sample has its labels, and either a value or the count, sum
+        and cumulative bucket counts of a histogram.
+    """
+    return REGISTRY.snapshot()
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Handle `GET /metrics`, answering in the format the scraper accepts."""
+    openmetrics: bool = "application/openmetrics-text" in request.headers.get(
+        "Accept", ""
+    )
+    return web.Response(
+        body=REGISTRY.expose(openmetrics).encode("utf-8"),
+        headers={
+            "Content-Type": (
+                OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+            )
+        },
+    )
+
+
+async def start_metrics_server(address: tuple[str, int] | Path) -> web.AppRunner:
+    """
+    Serve the metrics on `/metrics`.
+
+    Args:
+        address (tuple[str, int] | Path): The host and port to listen on, or
+            the path of a Unix socket.
+
+    Returns:
+        web.AppRunner: The runner of the server, to be cleaned up when done.
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site: web.BaseSite
+    if isinstance(address, tuple):
+        site = web.TCPSite(runner, *address)
+    else:
+        site = web.UnixSite(runner, str(address))
+    await site.start()
+    logger.info(f"Serving metrics on {site.name}/metrics")
+    return runner
+
+
+@asynccontextmanager
+async def serve_metrics(address: str | None) -> AsyncIterator[None]:
+    """
+    Serve the metrics while the block runs.
+
+    Args:
+        address (str, optional): The address to listen on, either HOST:PORT
+            or unix:PATH. Nothing is served if not provided.
+    """
+    if not address:
+        yield
+        return
+
+    runner: web.AppRunner = await start_metrics_server(parse_address(address))
+    print(f"Serving metrics on {address}/metrics")
+    try:
+        yield
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,129 @@
+"""HTML parsing helpers shared by the crawlers."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+
+from bs4 import BeautifulSoup
+from core_helpers.logs import logger
+from rich import print
+
+from .consts import DEFAULT_HTML_PARSER, PARSE_OFFLOAD_THRESHOLD
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any, TypeVar
+
+    from bs4 import SoupStrainer
+
+    T = TypeVar("T")
+
+
+@lru_cache(maxsize=None)
+def resolve_parser(name: str = DEFAULT_HTML_PARSER) -> str:
+    """
+    Get the BeautifulSoup tree builder to use for the requested backend.
+
+    "auto" picks lxml when it is installed, since it is several times faster
+    than the pure Python parser. A backend that is not installed falls back
+    to "html.parser".
+
+    Args:
+        name (str): The requested backend. Defaults to DEFAULT_HTML_PARSER.
+
+    Returns:
+        str: The name of an installed tree builder.
+    """
+    if name == "auto":
+        name = "lxml" if find_spec("lxml") else "html.parser"
+    elif name != "html.parser" and find_spec(name) is None:
+        logger.warning(f"HTML parser '{name}' is not installed, using html.parser")
+        print(f"[yellow]HTML parser '{name}' is not installed, using html.parser[/]")
+        name = "html.parser"
+
+    logger.debug(f"Using HTML parser: {name}")
+    return name
+
+
+def parse_html(
+    markup: str | bytes,
+    parser: str = "html.parser",
+    parse_only: SoupStrainer | None = None,
+) -> BeautifulSoup:
+    """
+    Parse an HTML document.
+
+    Args:
+        markup (str | bytes): The document to parse.
+        parser (str): The tree builder to use, as returned by
+            `resolve_parser`. Defaults to "html.parser".
+        parse_only (SoupStrainer, optional): Only the elements matching the
+            strainer are built into the tree.
+
+    Returns:
+        BeautifulSoup: The parsed document.
+    """
+    return BeautifulSoup(markup, parser, parse_only=parse_only)
+
+
+_parse_pool: ProcessPoolExecutor | None = None
+
+
+def start_parse_pool(workers: int) -> None:
+    """
+    Start the process pool big documents are parsed in, so parsing them
+    doesn't stall the downloads running on the event loop.
+
+    Args:
+        workers (int): The number of worker processes.
+    """
+    global _parse_pool
+    if _parse_pool is None and workers > 0:
+        logger.debug(f"Starting parse pool with {workers} workers")
+        _parse_pool = ProcessPoolExecutor(max_workers=workers)
+
+
+def close_parse_pool() -> None:
+    """Shut down the parse pool if it was started."""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
+        _parse_pool = None
+
+
+async def run_extractor(
+    extract: Callable[..., T], markup: str, *args: Any
+) -> T:
+    """
+    Run an extraction function over a document.
+
+    Documents bigger than PARSE_OFFLOAD_THRESHOLD are handed to the parse pool
+    when it is running, and the rest are processed right away. The function
+    must be defined at module level and return plain data (URLs, IDs, ...)
+    rather than parse trees, so sending the result back is cheap.
+
+    Args:
+        extract (Callable[..., T]): The extraction function, called with the
+            markup followed by `args`.
+        markup (str): The document to extract the data from.
+        *args: Additional arguments for the extraction function.
+
+    Returns:
+        T: The extracted data.
+    """
+    global _parse_pool
+    if _parse_pool is None or len(markup) < PARSE_OFFLOAD_THRESHOLD:
+        return extract(markup, *args)
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_parse_pool, extract, markup, *args)
+    except BrokenProcessPool:
+        logger.exception("Parse pool is broken, parsing on the event loop")
+        _parse_pool = None
+        return extract(markup, *args)
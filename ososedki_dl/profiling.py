@@ -0,0 +1,310 @@
+"""Profiling of a whole session, with flame graph output."""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from core_helpers.logs import logger
+from rich import print
+
+from .consts import PROFILE_INTERVAL
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from types import CodeType, FrameType
+
+_PACKAGE_DIR: str = str(Path(__file__).resolve().parent)
+_CRAWLERS_DIR: str = str(Path(_PACKAGE_DIR, "crawlers"))
+# Phase of the functions of the package, the innermost one on the stack wins
+_PHASES: dict[str, str] = {
+    "crawl": "crawl",
+    "download": "crawl",
+    "download_media_items": "album",
+    "process_album": "album",
+    "_resume_album": "album",
+    "fetch": "request",
+    "fetch_soup": "request",
+    "fetch_extract": "request",
+    "_probe": "request",
+    "parse_html": "parse",
+    "run_extractor": "parse",
+    "get_album_title": "parse",
+    "get_media_urls": "parse",
+    "_stream_to_file": "download",
+    "_download_segmented": "download",
+    "fetch_segment": "download",
+    "download_and_save_media": "download",
+    "download_image": "download",
+    "download_video": "download",
+    "_finalize_download": "hash",
+    "_hash_file": "hash",
+}
+# Innermost frame of the event loop waiting for I/O, on Unix and on Windows
+_IDLE_FRAMES: tuple[tuple[str, str], ...] = (
+    ("selectors.py", "select"),
+    ("windows_events.py", "_poll"),
+)
+NO_CRAWLER = "(no crawler)"
+NO_PHASE = "(other)"
+
+
+def _frame_name(code: CodeType) -> str:
+    """Name a function in the stacks, like `Class.method (package/file.py:10)`."""
+    path = Path(code.co_filename)
+    name: str = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+
+
+def _get_crawler(code: CodeType, instance: object) -> str | None:
+    """
+    Get the crawler a method of the package runs for: the class of a crawler,
+    or the crawler a downloader was created by, since the downloads run in
+    tasks of their own.
+    """
+    if code.co_filename.startswith(_CRAWLERS_DIR):
+        return type(instance).__name__
+    crawler = getattr(instance, "crawler", None)
+    return crawler if isinstance(crawler, str) else None
+
+
+class Profiler:
+    """
+    Profile the code running on a thread, usually the event loop.
+
+    Two profiles are recorded at the same time:
+
+    - A deterministic one with cProfile, saved as a pstats dump.
+    - A sampled one, taking the stack of the thread every PROFILE_INTERVAL
+      seconds from another thread. The stack of a running task holds every
+      coroutine awaiting it, so the samples show which crawler and which
+      phase of the download (request, parse, download, hash, ...) the time
+      is spent in. They are saved as collapsed stacks, for flamegraph.pl and
+      similar tools, and in the speedscope format.
+
+    The samples taken while the event loop waits for I/O are counted as idle
+    and left out of the flame graphs, so they only show the CPU hot spots.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL) -> None:
+        """
+        Create a profiler, started with `start` from the thread to profile.
+
+        Args:
+            interval (float): Seconds between two stack samples. Defaults to
+                PROFILE_INTERVAL.
+        """
+        self.interval: float = interval
+        self.idle: float = 0.0
+        # Number of samples and seconds spent in every stack, root first
+        self.samples: Counter[tuple[str, ...]] = Counter()
+        self.weights: defaultdict[tuple[str, ...], float] = defaultdict(float)
+        self._cprofile = cProfile.Profile()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+        self._thread_id: int | None = None
+        self._names: dict[CodeType, str] = {}
+        self._start: float = 0.0
+        self.duration: float = 0.0
+
+    def start(self) -> None:
+        """Start profiling the calling thread."""
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, name="profiler", daemon=True
+        )
+        self._start = perf_counter()
+        self._sampler.start()
+        self._cprofile.enable()
+
+    def stop(self) -> None:
+        """Stop profiling."""
+        self._cprofile.disable()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        self.duration = perf_counter() - self._start
+
+    def _sample_loop(self) -> None:
+        last: float = perf_counter()
+        while not self._stop.wait(self.interval):
+            frame: FrameType | None = sys._current_frames().get(self._thread_id)
+            now: float = perf_counter()
+            elapsed, last = now - last, now
+            if frame is not None:
+                self._sample(frame, elapsed)
+
+    def _sample(self, frame: FrameType, elapsed: float) -> None:
+        # Waiting in the selector means the event loop has nothing to run
+        leaf: CodeType = frame.f_code
+        if any(
+            leaf.co_filename.endswith(file) and leaf.co_name == function
+            for file, function in _IDLE_FRAMES
+        ):
+            self.idle += elapsed
+            return
+
+        names: list[str] = []
+        crawler: str | None = None
+        phase: str | None = None
+        current: FrameType | None = frame
+        while current is not None:
+            code: CodeType = current.f_code
+            name: str | None = self._names.get(code)
+            if name is None:
+                name = self._names[code] = _frame_name(code)
+            names.append(name)
+            if code.co_filename.startswith(_PACKAGE_DIR):
+                if phase is None:
+                    phase = _PHASES.get(code.co_name)
+                if crawler is None and "self" in code.co_varnames:
+                    crawler = _get_crawler(code, current.f_locals.get("self"))
+            current = current.f_back
+
+        names.append(phase or NO_PHASE)
+        names.append(crawler or NO_CRAWLER)
+        stack: tuple[str, ...] = tuple(reversed(names))
+        self.samples[stack] += 1
+        self.weights[stack] += elapsed
+
+    def breakdown(self) -> list[tuple[str, str, float]]:
+        """
+        Get the sampled time spent by every crawler in every phase.
+
+        Returns:
+            list[tuple[str, str, float]]: The crawler, the phase and the
+            seconds spent, the slowest first.
+        """
+        totals: defaultdict[tuple[str, str], float] = defaultdict(float)
+        for stack, seconds in self.weights.items():
+            totals[stack[0], stack[1]] += seconds
+        return sorted(
+            ((crawler, phase, seconds) for (crawler, phase), seconds in totals.items()),
+            key=lambda row: row[2],
+            reverse=True,
+        )
+
+    def write_collapsed(self, path: Path) -> None:
+        """
+        Write the samples as collapsed stacks, one `frame;frame;... count`
+        line per stack. The crawler and the phase are the two outermost
+        frames.
+
+        Args:
+            path (Path): The file to write.
+        """
+        lines: list[str] = [
+            f"{';'.join(name.replace(';', ':') for name in stack)} {count}"
+            for stack, count in self.samples.items()
+        ]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def write_speedscope(self, path: Path, name: str) -> None:
+        """
+        Write the samples in the speedscope format.
+
+        Args:
+            path (Path): The file to write.
+            name (str): The name of the profile.
+        """
+        frames: dict[str, int] = {}
+        samples: list[list[int]] = []
+        weights: list[float] = []
+        for stack, seconds in self.weights.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(round(seconds, 6))
+
+        profile = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "ososedki_dl",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": frame} for frame in frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(sum(weights), 6),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+        path.write_text(json.dumps(profile), encoding="utf-8")
+
+    def save(self, prefix: Path) -> list[Path]:
+        """
+        Save the pstats dump, the collapsed stacks and the speedscope file.
+
+        Args:
+            prefix (Path): The path of the files, without their extension.
+
+        Returns:
+            list[Path]: The files written.
+        """
+        prefix.parent.mkdir(parents=True, exist_ok=True)
+        pstats_path = Path(f"{prefix}.pstats")
+        collapsed_path = Path(f"{prefix}.collapsed")
+        speedscope_path = Path(f"{prefix}.speedscope.json")
+
+        self._cprofile.dump_stats(pstats_path)
+        self.write_collapsed(collapsed_path)
+        self.write_speedscope(speedscope_path, prefix.name)
+        return [pstats_path, collapsed_path, speedscope_path]
+
+    def print_breakdown(self, limit: int = 15) -> None:
+        """
+        Print the time spent by every crawler in every phase.
+
+        Args:
+            limit (int): The number of rows to print. Defaults to 15.
+        """
+        busy: float = sum(self.weights.values())
+        print(
+            f"\n[bold]Profile:[/] {self.duration:.2f} s, "
+            f"{busy:.2f} s busy, {self.idle:.2f} s idle"
+        )
+        for crawler, phase, seconds in self.breakdown()[:limit]:
+            share: float = seconds / busy * 100 if busy else 0.0
+            print(f"  {crawler:<24} {phase:<10} {seconds:8.2f} s {share:5.1f}%")
+
+
+@contextmanager
+def profile_session(prefix: Path | None) -> Iterator[Profiler | None]:
+    """
+    Profile the block, then save the profiles and print where the time went.
+    Does nothing if no path is given.
+
+    Args:
+        prefix (Path | None): The path of the profile files, without their
+            extension.
+
+    Yields:
+        Profiler | None: The running profiler.
+    """
+    if prefix is None:
+        yield None
+        return
+
+    profiler = Profiler()
+    logger.info(f"Profiling the session to {prefix}")
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        paths: list[Path] = profiler.save(prefix)
+        profiler.print_breakdown()
+        print(f"Profile written to {', '.join(str(path) for path in paths)}")
+        logger.info(f"Profile written to {paths}")
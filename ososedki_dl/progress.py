@@ -10,7 +10,7 @@ from rich.progress import (BarColumn, DownloadColumn, MofNCompleteColumn,
 from .consts import PERCENTAGE_FORMAT
 
 
-def MediaProgress() -> Progress:
+def MediaProgress(disable: bool = False) -> Progress:
     return Progress(
         SpinnerColumn(),
         TextColumn(
@@ -24,6 +24,7 @@ def MediaProgress() -> Progress:
         TransferSpeedColumn(),
         TimeRemainingColumn(),
         TimeElapsedColumn(),
+        disable=disable,
     )
 
 
@@ -0,0 +1,57 @@
+"""Token bucket rate limiter for the requests sent to a domain."""
+
+from __future__ import annotations
+
+import asyncio
+from time import monotonic
+
+from core_helpers.logs import logger
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` requests per second on average, with bursts
+    of up to `burst` requests.
+
+    Unlike a fixed sleep between requests, independent requests can overlap as
+    long as the average rate is respected, and no time is wasted when the
+    requests are already slower than the allowed rate.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """
+        Initialize the bucket full.
+
+        Args:
+            rate (float): Number of tokens added per second.
+            burst (int): Maximum number of tokens the bucket can hold. Defaults
+                to 1.
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be greater than zero", rate)
+
+        self.rate: float = rate
+        self.burst: int = max(burst, 1)
+        self._tokens: float = float(self.burst)
+        self._updated_at: float = monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Add the tokens accumulated since the last update."""
+        now: float = monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and consume it."""
+        # The lock makes the waiters get their tokens in arrival order
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                delay: float = (1 - self._tokens) / self.rate
+                logger.debug(f"Rate limit reached, waiting {delay:.3f}s for a token")
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
@@ -0,0 +1,382 @@
+"""Run-wide scheduler for media download jobs."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from core_helpers.logs import logger
+
+from .consts import (AIMD_COOLDOWN_SECONDS, AIMD_DECREASE_FACTOR,
+                     AIMD_INCREASE, INITIAL_CONCURRENT_PER_HOST,
+                     MAX_CONCURRENT_DOWNLOADS, MAX_CONCURRENT_PER_HOST)
+from .metrics import JOBS
+from .ratelimit import TokenBucket
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+    from typing import TypeVar
+
+    T = TypeVar("T")
+
+# Hosts whose slot is already held by the current task, so nested requests
+# made while running a job (e.g. resuming a video) don't wait on themselves
+_held_hosts: ContextVar[frozenset[str]] = ContextVar("held_hosts", default=frozenset())
+
+
+def get_host(url: str) -> str:
+    """
+    Get the normalized host of the given URL.
+
+    Args:
+        url (str): The URL to extract the host from.
+
+    Returns:
+        str: The lowercase network location of the URL.
+    """
+    return urlparse(url).netloc.lower()
+
+
+class HostLimiter:
+    """
+    Adaptive concurrency limit for a single host.
+
+    The limit follows an AIMD (additive increase, multiplicative decrease)
+    policy: every successful response grows it by roughly one slot per round
+    of requests, and every throttling response (429/503) cuts it down, so the
+    limit settles right below the point where the host starts pushing back.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        initial: int = INITIAL_CONCURRENT_PER_HOST,
+        maximum: int = MAX_CONCURRENT_PER_HOST,
+        minimum: int = 1,
+    ) -> None:
+        """
+        Initialize the limiter.
+
+        Args:
+            host (str): The host this limiter belongs to.
+            initial (int): Starting number of concurrent requests. Defaults to
+                INITIAL_CONCURRENT_PER_HOST.
+            maximum (int): Upper bound for the limit. Defaults to
+                MAX_CONCURRENT_PER_HOST.
+            minimum (int): Lower bound for the limit. Defaults to 1.
+        """
+        self.host: str = host
+        self.minimum: int = minimum
+        self.maximum: int = max(maximum, minimum)
+        self.limit: float = float(min(max(initial, minimum), self.maximum))
+        self.in_flight: int = 0
+        # Highest number of requests that ran at the same time
+        self.peak_in_flight: int = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._last_decrease: float = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """Number of requests currently allowed to run concurrently."""
+        return max(self.minimum, int(self.limit))
+
+    def _wake_up(self) -> None:
+        """Hand the free slots over to the oldest waiters."""
+        while self._waiters and self.in_flight < self.capacity:
+            waiter: asyncio.Future[None] = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            waiter.set_result(None)
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot if one is free right away.
+
+        Returns:
+            bool: Whether a slot was taken.
+        """
+        if self._waiters or self.in_flight >= self.capacity:
+            return False
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return True
+
+    async def acquire(self) -> None:
+        """Wait until a slot is free and take it."""
+        if self.try_acquire():
+            return
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us right before the cancellation
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Give back a slot previously taken with `acquire`."""
+        self.in_flight -= 1
+        self._wake_up()
+
+    def lower_maximum(self, maximum: int) -> None:
+        """
+        Lower the upper bound of the limit, never raising it.
+
+        Args:
+            maximum (int): The new upper bound.
+        """
+        maximum = max(maximum, self.minimum)
+        if maximum < self.maximum:
+            logger.debug(f"Lowering the ceiling of host {self.host} to {maximum}")
+            self.maximum = maximum
+            self.limit = min(self.limit, float(maximum))
+
+    def on_success(self) -> None:
+        """Grow the limit additively after a successful response."""
+        if self.limit < self.maximum:
+            self.limit = min(self.maximum, self.limit + AIMD_INCREASE / self.limit)
+            self._wake_up()
+
+    def on_throttle(self) -> None:
+        """
+        Shrink the limit multiplicatively after a throttling response.
+
+        Responses to requests that were already in flight when the limit was
+        last cut are ignored for a short cooldown, so a single burst of 429s
+        only halves the limit once.
+        """
+        now: float = monotonic()
+        if now - self._last_decrease < AIMD_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * AIMD_DECREASE_FACTOR)
+        logger.info(f"Host {self.host} is throttling, limit lowered to {self.capacity}")
+
+
+class DownloadScheduler:
+    """
+    Single scheduler shared by every crawler of a session.
+
+    All the media jobs of the run are submitted here so the global and the
+    per-host concurrency caps hold no matter how many albums are being
+    processed at the same time. The per-host caps are adaptive and learned
+    from the responses of every crawler hitting the same host, and the rate
+    limiters of each domain are shared the same way.
+
+    When several processes download with their own scheduler, each one only
+    gets its share of the per-host ceilings and request rates, so the hosts
+    see the same limits as with a single process.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_DOWNLOADS,
+        max_per_host: int = MAX_CONCURRENT_PER_HOST,
+        initial_per_host: int = INITIAL_CONCURRENT_PER_HOST,
+        processes: int = 1,
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrent (int): Maximum number of media jobs running at the
+                same time across all hosts. Defaults to MAX_CONCURRENT_DOWNLOADS.
+            max_per_host (int): Maximum number of requests running at the
+                same time against a single host. Defaults to
+                MAX_CONCURRENT_PER_HOST.
+            initial_per_host (int): Number of requests allowed against a host
+                before its limit adapts to the responses. Defaults to
+                INITIAL_CONCURRENT_PER_HOST.
+            processes (int): Number of processes downloading at the same time,
+                each with its own scheduler. Defaults to 1.
+        """
+        logger.debug(
+            f"Initialized DownloadScheduler with max_concurrent={max_concurrent}, "
+            f"max_per_host={max_per_host}, processes={processes}"
+        )
+        self.max_concurrent: int = max_concurrent
+        self.processes: int = max(1, processes)
+        self.max_per_host: int = self._share(max_per_host)
+        self.initial_per_host: int = initial_per_host
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._hosts: dict[str, HostLimiter] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _share(self, limit: int) -> int:
+        """Get the share of a per-host ceiling left to this process."""
+        return max(1, limit // self.processes)
+
+    def limiter(self, url: str, limit: int | None = None) -> HostLimiter:
+        """
+        Get the limiter of the host of the given URL, creating it on first use.
+
+        The ceiling of a host is the lowest one requested by the crawlers
+        reaching it, and never exceeds `max_per_host`.
+
+        Args:
+            url (str): The URL to get the host limiter for.
+            limit (int, optional): Crawler specific ceiling for the host.
+
+        Returns:
+            HostLimiter: The limiter for the host.
+        """
+        host: str = get_host(url)
+        if limit:
+            limit = self._share(limit)
+        host_limiter: HostLimiter | None = self._hosts.get(host)
+        if host_limiter is None:
+            maximum: int = min(limit or self.max_per_host, self.max_per_host)
+            logger.debug(f"Creating limiter with ceiling {maximum} for host {host}")
+            host_limiter = self._hosts[host] = HostLimiter(
+                host, initial=self.initial_per_host, maximum=maximum
+            )
+        elif limit:
+            host_limiter.lower_maximum(limit)
+        return host_limiter
+
+    def rate_limiter(self, url: str, rate: float, burst: int = 1) -> TokenBucket:
+        """
+        Get the rate limiter of the host of the given URL, creating it on first
+        use with the share of this process of the rate requested by the first
+        crawler reaching the host.
+
+        Args:
+            url (str): The URL to get the rate limiter for.
+            rate (float): Allowed requests per second.
+            burst (int): Allowed burst of requests. Defaults to 1.
+
+        Returns:
+            TokenBucket: The rate limiter for the host.
+        """
+        host: str = get_host(url)
+        bucket: TokenBucket | None = self._buckets.get(host)
+        if bucket is None:
+            rate /= self.processes
+            logger.debug(f"Limiting {host} to {rate} requests/s (burst {burst})")
+            bucket = self._buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    def feedback(self, url: str, status: int) -> None:
+        """
+        Feed the status of a response back to the limiter of its host.
+
+        Args:
+            url (str): The requested URL.
+            status (int): The HTTP status of the response.
+        """
+        if status in (429, 503):
+            self.limiter(url).on_throttle()
+        elif status < 400:
+            self.limiter(url).on_success()
+
+    @asynccontextmanager
+    async def host_slot(
+        self, url: str, limit: int | None = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold a slot of the host of the given URL.
+
+        Nothing is acquired if the current task already holds a slot for the
+        same host.
+
+        Args:
+            url (str): The URL that is going to be requested.
+            limit (int, optional): Crawler specific ceiling for the host.
+        """
+        held: frozenset[str] = _held_hosts.get()
+        host: str = get_host(url)
+        if host in held:
+            yield
+            return
+
+        host_limiter: HostLimiter = self.limiter(url, limit)
+        await host_limiter.acquire()
+        token = _held_hosts.set(held | {host})
+        try:
+            yield
+        finally:
+            _held_hosts.reset(token)
+            host_limiter.release()
+
+    @contextmanager
+    def spare_host_slots(self, url: str, wanted: int) -> Iterator[int]:
+        """
+        Take up to `wanted` more slots of the host of the given URL without
+        waiting, so a job holding a slot can spread its requests over the free
+        capacity of the host.
+
+        Nothing is taken if the current task holds no slot for the host, since
+        every request then takes its own.
+
+        Args:
+            url (str): The URL that is going to be requested.
+            wanted (int): Number of additional concurrent requests wanted.
+
+        Yields:
+            int: Number of additional requests allowed to run concurrently.
+        """
+        if get_host(url) not in _held_hosts.get():
+            yield wanted
+            return
+
+        host_limiter: HostLimiter = self.limiter(url)
+        taken: int = 0
+        while taken < wanted and host_limiter.try_acquire():
+            taken += 1
+        try:
+            yield taken
+        finally:
+            for _ in range(taken):
+                host_limiter.release()
+
+    @asynccontextmanager
+    async def slot(self, url: str, limit: int | None = None) -> AsyncIterator[None]:
+        """
+        Hold a global and a per-host slot for the duration of a job.
+
+        The host slot is acquired first so jobs waiting on a busy host do not
+        starve jobs for other hosts of global slots.
+
+        Args:
+            url (str): The URL the job is going to request.
+            limit (int, optional): Crawler specific ceiling for the host.
+        """
+        async with self.host_slot(url, limit):
+            async with self._global:
+                yield
+
+    async def submit(
+        self, url: str, job: Callable[[], Awaitable[T]], limit: int | None = None
+    ) -> T:
+        """
+        Run a media job once the global and per-host caps allow it.
+
+        Args:
+            url (str): The URL the job is going to request.
+            job (Callable[[], Awaitable[T]]): Factory of the coroutine to run.
+            limit (int, optional): Crawler specific ceiling for the host.
+
+        Returns:
+            T: The result of the job.
+        """
+        queued: bool = True
+        JOBS.inc("queued")
+        try:
+            async with self.slot(url, limit):
+                JOBS.dec("queued")
+                queued = False
+                with JOBS.track("running"):
+                    return await job()
+        finally:
+            if queued:
+                JOBS.dec("queued")
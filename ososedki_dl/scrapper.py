@@ -2,21 +2,98 @@
 
 from __future__ import annotations
 
+import asyncio
 from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
 from typing import TYPE_CHECKING
 
+from aiohttp import ClientSession
+from aiohttp_client_cache.session import CachedSession
 from core_helpers.logs import logger
+from fake_useragent import UserAgent
 from rich import print
 
+from .consts import MAX_CONCURRENT_URLS, MIN_USER_AGENT_VERSION
 from .crawlers import crawlers as crawler_modules
+from .ledger import close_ledger
+from .loopmonitor import monitor_loop
+from .metrics import serve_metrics
+from .parsing import close_parse_pool, start_parse_pool
+from .scheduler import DownloadScheduler
+from .tracing import close_trace_log, create_trace_config, open_trace_log
 
 if TYPE_CHECKING:
     from argparse import Namespace
+    from collections.abc import AsyncIterator, Callable
+
+    from aiohttp import TraceConfig
 
     from .crawlers import CrawlerInstance
     from .download import SessionType
 
 
+def create_session(args: Namespace) -> SessionType:
+    """
+    Create the HTTP session shared by all the downloads of the run.
+
+    Args:
+        args (Namespace): Parsed command line arguments.
+
+    Returns:
+        SessionType: The session, cached and traced if requested.
+    """
+    SessionType = CachedSession if args.cache else ClientSession
+    session_type_name = "cached" if args.cache else "non-cached"
+    msg = f"Using {session_type_name} session for downloads."
+    print(msg)
+    logger.info(msg)
+
+    ua = UserAgent(min_version=MIN_USER_AGENT_VERSION)
+    logger.debug(f"Generated User-Agent: {ua.random}")
+    headers: dict[str, str] = {"User-Agent": ua.random}
+
+    trace_configs: list[TraceConfig] | None = None
+    if args.trace:
+        open_trace_log(args.trace)
+        trace_configs = [create_trace_config()]
+    return SessionType(headers=headers, trace_configs=trace_configs)
+
+
+@asynccontextmanager
+async def runtime(
+    args: Namespace, processes: int = 1, metrics: bool = True
+) -> AsyncIterator[tuple[SessionType, DownloadScheduler]]:
+    """
+    Set up everything a run downloads with, and tear it down when the block
+    exits.
+
+    Args:
+        args (Namespace): Parsed command line arguments.
+        processes (int): The number of processes sharing the hosts.
+        metrics (bool): Whether to serve the metrics at `args.metrics`.
+
+    Yields:
+        tuple[SessionType, DownloadScheduler]: The session and the scheduler
+        shared by all the downloads of the run.
+    """
+    async with (
+        create_session(args) as session,
+        serve_metrics(args.metrics if metrics else None),
+        monitor_loop(args.loop_lag),
+    ):
+        # One scheduler for the whole run so the concurrency caps are
+        # enforced across every URL and album downloaded
+        scheduler = DownloadScheduler(processes=processes)
+        start_parse_pool(args.parse_workers)
+        try:
+            yield session, scheduler
+        finally:
+            # Write the buffered ledger records before leaving
+            close_ledger()
+            close_trace_log()
+            close_parse_pool()
+
+
 def normalize_error_message(raw_status: str) -> str:
     # Extract after "error:" if present
     if "error:" in raw_status:
@@ -74,24 +151,89 @@ def print_errors(results: list[dict[str, str]]) -> None:
     print_error_report_card(error_groups)
 
 
+async def download_urls(
+    session: SessionType,
+    urls: list[str],
+    args: Namespace,
+    scheduler: DownloadScheduler,
+    on_result: Callable[[str, list[dict[str, str]]], None] | None = None,
+) -> list[dict[str, str]]:
+    """
+    Download the given URLs, up to MAX_CONCURRENT_URLS at the same time.
+
+    A crawler failing on one URL is reported as an error of that URL and
+    doesn't stop the others.
+
+    Args:
+        session (SessionType): The HTTP session to use for requests.
+        urls (list[str]): List of URLs to download images from.
+        args (Namespace): The command-line arguments containing context such as
+            download path and cache checking.
+        scheduler (DownloadScheduler): The run-wide scheduler shared by all
+            the crawlers.
+        on_result (Callable[[str, list[dict[str, str]]], None], optional):
+            Called with each URL and its results as soon as it is done.
+
+    Returns:
+        list[dict[str, str]]: The results of all the downloads.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_URLS)
+
+    async def download_url(url: str) -> list[dict[str, str]]:
+        async with semaphore:
+            try:
+                results = await handle_downloader(session, url, args, scheduler)
+            except Exception as e:
+                logger.exception(f"Failed to download {url}")
+                print(f"[red]Failed to download {url}:[/] {e}")
+                results = [{"url": url, "status": f"error: {e}"}]
+        if on_result:
+            on_result(url, results)
+        return results
+
+    url_results: list[list[dict[str, str]]] = await asyncio.gather(
+        *(download_url(url) for url in urls)
+    )
+    return [result for url_result in url_results for result in url_result]
+
+
 async def generic_download(
-    session: SessionType, urls: list[str], args: Namespace
-) -> None:
+    session: SessionType,
+    urls: list[str],
+    args: Namespace,
+    scheduler: DownloadScheduler,
+) -> list[dict[str, str]]:
     """
-    Download images from a list of URLs using the appropriate crawler.
+    Download images from a list of URLs using the appropriate crawler and
+    print a summary of the results.
 
     Args:
         session (SessionType): The HTTP session to use for requests.
         urls (list[str]): List of URLs to download images from.
         args (Namespace): The command-line arguments containing context such as
             download path and cache checking.
+        scheduler (DownloadScheduler): The run-wide scheduler shared by all
+            the crawlers.
+
+    Returns:
+        list[dict[str, str]]: The results of all the downloads.
     """
     logger.debug("Starting generic download...")
 
-    results: list[dict[str, str]] = []
-    for url in urls:
-        results.extend(await handle_downloader(session, url, args))
+    results: list[dict[str, str]] = await download_urls(
+        session, urls, args, scheduler
+    )
+    print_summary(results)
+    return results
+
 
+def print_summary(results: list[dict[str, str]]) -> None:
+    """
+    Print the number of downloads by status, and the errors if there are any.
+
+    Args:
+        results (list[dict[str, str]]): The list of results.
+    """
     status_counts: Counter[str] = Counter(
         result["status"].split(":")[0] for result in results
     )
@@ -108,7 +250,7 @@ async def generic_download(
 
 
 async def handle_downloader(
-    session: SessionType, url: str, args: Namespace
+    session: SessionType, url: str, args: Namespace, scheduler: DownloadScheduler
 ) -> list[dict[str, str]]:
     """
     Selects and invokes the appropriate crawler to download content from the
@@ -124,6 +266,8 @@ async def handle_downloader(
         url (str): The URL to download from.
         args (Namespace): The command-line arguments containing context such as
             download path and cache checking.
+        scheduler (DownloadScheduler): The run-wide scheduler shared by all
+            the crawlers.
 
     Returns:
         list[dict[str, str]]: The list to append download results to.
@@ -133,10 +277,10 @@ async def handle_downloader(
     for CrawlerClass in crawler_modules:
         logger.debug("Checking crawler: %s for URL: %s", CrawlerClass.__name__, url)
         if CrawlerClass.can_handle(url):
-            crawler: CrawlerInstance = CrawlerClass(session, args)
+            crawler: CrawlerInstance = CrawlerClass(session, args, scheduler)
             crawler_name: str = crawler.__class__.__name__
             logger.info("Downloading for URL: %s using crawler: %s", url, crawler_name)
-            return await crawler.download(url)
+            return await crawler.crawl(url)
     else:
         logger.warning("No downloader found for URL: %s", url)
         print(f"[yellow]No downloader found for URL: {url}[/]")
@@ -0,0 +1,216 @@
+"""Per-request network timing traces, written as JSON lines."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from time import time
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import TraceConfig
+from core_helpers.logs import logger
+
+from .scheduler import get_host
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from types import SimpleNamespace
+
+    from aiohttp import ClientSession
+
+_trace_fd: int | None = None
+
+
+def open_trace_log(path: Path) -> None:
+    """
+    Open the file the traces are appended to.
+
+    The file is opened in append mode and every record is written with a
+    single write, so several worker processes can share it.
+
+    Args:
+        path (Path): The JSON lines file to append the traces to.
+    """
+    global _trace_fd
+    if _trace_fd is not None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _trace_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    logger.info(f"Writing request traces to {path}")
+
+
+def close_trace_log() -> None:
+    """Close the trace file if it was opened."""
+    global _trace_fd
+    if _trace_fd is not None:
+        os.close(_trace_fd)
+        _trace_fd = None
+
+
+def _write_record(record: dict[str, Any]) -> None:
+    if _trace_fd is None:
+        return
+    line: bytes = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+    try:
+        os.write(_trace_fd, line)
+    except OSError:
+        logger.exception("Failed to write request trace")
+
+
+def _elapsed(start: float | None, end: float | None) -> float | None:
+    if start is None or end is None:
+        return None
+    return round(end - start, 6)
+
+
+def create_trace_config() -> TraceConfig:
+    """
+    Create the trace config recording the timings of every request.
+
+    One record is written per request, once its headers are received or it
+    fails, with the time spent in each phase, in seconds:
+
+    - `queued`: waiting for a free connection of the pool.
+    - `dns`: resolving the host, None when no lookup was needed (reused
+      connection or IP address).
+    - `connect`: opening the connection, TCP and TLS handshakes included
+      (aiohttp has no separate hook for the TLS handshake).
+    - `ttfb`: from sending the headers to receiving the response headers.
+    - `total`: from the start of the request to the response headers.
+
+    The crawler and attempt number come from the `trace_request_ctx` given to
+    the request. `bytes` is the Content-Length of the response.
+
+    Returns:
+        TraceConfig: The trace config to give to the session.
+    """
+    trace_config = TraceConfig()
+
+    def now() -> float:
+        return asyncio.get_running_loop().time()
+
+    async def on_request_start(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.start = now()
+        ctx.queued_start = ctx.queued_end = None
+        ctx.create_start = ctx.create_end = None
+        ctx.dns_start = ctx.dns_end = None
+        ctx.dns_cache_hit = None
+        ctx.reused = False
+        ctx.headers_sent = None
+        ctx.redirects = 0
+
+    async def on_connection_queued_start(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.queued_start = now()
+
+    async def on_connection_queued_end(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.queued_end = now()
+
+    async def on_connection_create_start(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.create_start = now()
+
+    async def on_connection_create_end(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.create_end = now()
+
+    async def on_connection_reuseconn(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.reused = True
+
+    async def on_dns_resolvehost_start(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.dns_start = now()
+
+    async def on_dns_resolvehost_end(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.dns_end = now()
+
+    async def on_dns_cache_hit(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.dns_cache_hit = True
+
+    async def on_dns_cache_miss(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.dns_cache_hit = False
+
+    async def on_request_headers_sent(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.headers_sent = now()
+
+    async def on_request_redirect(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.redirects += 1
+
+    def build_record(ctx: SimpleNamespace, params: Any, end: float) -> dict:
+        request_ctx: dict[str, Any] = ctx.trace_request_ctx or {}
+        dns: float | None = _elapsed(ctx.dns_start, ctx.dns_end)
+        connect: float | None = _elapsed(ctx.create_start, ctx.create_end)
+        # The connection is created after resolving the host
+        if connect is not None and dns is not None:
+            connect = round(max(connect - dns, 0.0), 6)
+        url: str = str(params.url)
+        return {
+            "ts": round(time(), 3),
+            "method": params.method,
+            "url": url,
+            "host": get_host(url),
+            "crawler": request_ctx.get("crawler"),
+            "attempt": request_ctx.get("attempt"),
+            "status": None,
+            "queued": _elapsed(ctx.queued_start, ctx.queued_end),
+            "dns": dns,
+            "dns_cache_hit": ctx.dns_cache_hit,
+            "connect": connect,
+            "reused": ctx.reused,
+            "ttfb": _elapsed(ctx.headers_sent, end),
+            "total": _elapsed(ctx.start, end),
+            "redirects": ctx.redirects,
+            "bytes": None,
+        }
+
+    async def on_request_end(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        record: dict[str, Any] = build_record(ctx, params, now())
+        record["status"] = params.response.status
+        record["bytes"] = params.response.content_length
+        _write_record(record)
+
+    async def on_request_exception(
+        session: ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        record: dict[str, Any] = build_record(ctx, params, now())
+        record["error"] = f"{type(params.exception).__name__}: {params.exception}"
+        _write_record(record)
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+    trace_config.on_request_headers_sent.append(on_request_headers_sent)
+    trace_config.on_request_redirect.append(on_request_redirect)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
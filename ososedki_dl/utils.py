@@ -13,7 +13,7 @@ from core_helpers.logs import logger
 from rich import print
 from rich.prompt import Prompt
 
-from .consts import CACHE_PATH, DEFAULT_DEST_PATH, EXIT_FAILURE, LOG_PATH
+from .consts import DEFAULT_DEST_PATH, EXIT_FAILURE, LOG_PATH
 
 if TYPE_CHECKING:
     from typing import NoReturn
@@ -46,6 +46,45 @@ def get_valid_url() -> list[str]:
         print("[bold red]Error:[/] Please enter a valid URL.")
 
 
+def read_urls(source: str) -> tuple[list[str], list[str]]:
+    """
+    Read the URLs to download from a file or the standard input, one per
+    line. Blank lines and lines starting with "#" are ignored, and repeated
+    URLs are kept only once.
+
+    Args:
+        source (str): The path of the file, or "-" for the standard input.
+
+    Returns:
+        tuple[list[str], list[str]]: The valid URLs, in order, and the lines
+        that are not valid URLs.
+
+    Raises:
+        OSError: If the file cannot be read.
+        UnicodeDecodeError: If the input is not valid UTF-8.
+    """
+    logger.debug(f"Reading URLs from {source}")
+
+    if source == "-":
+        lines: list[str] = sys.stdin.read().splitlines()
+    else:
+        lines = Path(source).read_text(encoding="utf-8").splitlines()
+
+    urls: dict[str, None] = {}
+    invalid: list[str] = []
+    for line in lines:
+        url: str = line.strip()
+        if not url or url.startswith("#"):
+            continue
+        if validators.url(url):
+            urls[url] = None
+        else:
+            invalid.append(url)
+
+    logger.info(f"Read {len(urls)} URLs and {len(invalid)} invalid lines")
+    return list(urls), invalid
+
+
 def get_valid_path(default_path: str = DEFAULT_DEST_PATH.name) -> Path:
     """
     Get a valid download path from user input.
@@ -150,38 +189,17 @@ def get_final_path(download_path: Path, title: str) -> Path:
     return final_path
 
 
-def get_url_hashfile(url: str) -> Path:
+def get_url_hash(url: str) -> str:
     """
-    Generate a unique hash filename for the given URL.
+    Generate a unique hash for the given URL.
 
     Args:
         url (str): The URL to generate a hash for.
 
     Returns:
-        Path: The path to the hash file in the cache directory.
+        str: The hex SHA-256 digest of the URL.
     """
-    logger.debug(f"Generating cache filename for URL: {url}")
-
-    url_hash: str = hashlib.sha256(url.encode("utf-8")).hexdigest()
-    hash_path: Path = CACHE_PATH / url_hash
-    logger.debug(f"Generated hash path: {hash_path}")
-
-    return hash_path
-
-
-def write_to_cache(url: str) -> None:
-    """
-    Write a cache file for the given URL.
-
-    Args:
-        url (str): The URL to cache.
-    """
-    logger.debug(f"Writing to cache for URL: {url}")
-
-    cache_filename: Path = get_url_hashfile(url)
-    logger.debug(f"Cache filename: {cache_filename}")
-    with open(cache_filename, "w", encoding="utf-8"):
-        pass
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
 
 
 def get_unique_filename(base_path: Path) -> Path:
@@ -207,6 +225,29 @@ def get_unique_filename(base_path: Path) -> Path:
     return new_path
 
 
+def parse_address(address: str) -> tuple[str, int] | Path:
+    """
+    Parse the address a local server (daemon, metrics, ...) listens on.
+
+    Args:
+        address (str): Either "HOST:PORT" or "unix:PATH".
+
+    Returns:
+        tuple[str, int] | Path: The host and port to listen on, or the path of
+        the Unix socket.
+
+    Raises:
+        ValueError: If the address is not valid.
+    """
+    if address.startswith("unix:"):
+        return Path(address.removeprefix("unix:")).expanduser().resolve()
+
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"Invalid address: {address}")
+    return host or "127.0.0.1", int(port)
+
+
 def exit_session(exit_value: int) -> NoReturn:
     """
     Exit the program with the given exit value.
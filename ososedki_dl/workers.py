@@ -0,0 +1,253 @@
+"""Worker mode, several processes downloading the jobs of a shared queue."""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from argparse import Namespace
+from time import sleep
+from typing import TYPE_CHECKING
+
+from core_helpers.logs import logger
+from rich import print
+
+from .consts import (LOG_FILE, PACKAGE, QUEUE_LEASE_SECONDS,
+                     QUEUE_MAX_ATTEMPTS, QUEUE_POLL_SECONDS,
+                     WORKER_CONCURRENT_JOBS)
+from .crawlers import crawlers as crawler_modules
+from .crawlers.base_crawler import album_sink
+from .jobqueue import JobQueue
+from .profiling import profile_session
+from .scrapper import handle_downloader, runtime
+
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+    from pathlib import Path
+    from typing import Any
+
+    from .crawlers import BaseCrawler
+    from .download import SessionType
+    from .jobqueue import QueuedJob
+    from .scheduler import DownloadScheduler
+
+
+async def _renew_lease(
+    queue: JobQueue, job: QueuedJob, owner: str, task: asyncio.Task[Any]
+) -> None:
+    """
+    Keep the lease of a running job alive, cancelling the job if the lease
+    is lost to another worker.
+
+    Args:
+        queue (JobQueue): The shared queue.
+        job (QueuedJob): The running job.
+        owner (str): The ID of the worker running the job.
+        task (asyncio.Task[Any]): The task running the job.
+    """
+    while True:
+        await asyncio.sleep(QUEUE_LEASE_SECONDS / 3)
+        if not queue.renew(job.id, owner):
+            logger.warning(f"Worker {owner} lost the lease of job {job.id}")
+            task.cancel()
+            return
+
+
+async def _run_job(
+    queue: JobQueue,
+    job: QueuedJob,
+    session: SessionType,
+    args: Namespace,
+    scheduler: DownloadScheduler,
+) -> list[dict[str, str]]:
+    """
+    Download a job leased from the queue.
+
+    The albums found while crawling a URL are added to the queue instead of
+    being processed right away, so every worker can take them.
+
+    Args:
+        queue (JobQueue): The shared queue.
+        job (QueuedJob): The job to run.
+        session (SessionType): The session of the worker.
+        args (Namespace): Parsed command line arguments.
+        scheduler (DownloadScheduler): The scheduler of the worker.
+
+    Returns:
+        list[dict[str, str]]: The results of the downloads.
+    """
+    job_args = Namespace(**vars(args))
+    job_args.dest_path = job.dest_path
+
+    if job.kind == "url":
+
+        def queue_album(
+            crawler: BaseCrawler,
+            album_url: str,
+            title: str | None,
+            media_urls: list[str] | None,
+        ) -> None:
+            if queue.add(
+                "album",
+                album_url,
+                job.dest_path,
+                crawler.__class__.__name__,
+                title,
+                media_urls,
+            ):
+                logger.debug(f"Queued album {album_url}")
+
+        token = album_sink.set(queue_album)
+        try:
+            return await handle_downloader(session, job.url, job_args, scheduler)
+        finally:
+            album_sink.reset(token)
+
+    for CrawlerClass in crawler_modules:
+        if CrawlerClass.__name__ == job.crawler:
+            crawler = CrawlerClass(session, job_args, scheduler)
+            token = album_sink.set(None)
+            try:
+                return await crawler.process_album(
+                    job.url, job.title, job.media_urls
+                )
+            finally:
+                album_sink.reset(token)
+
+    logger.error(f"Unknown crawler {job.crawler} for album {job.url}")
+    return [{"url": job.url, "status": f"error: unknown crawler {job.crawler}"}]
+
+
+async def _work(args: Namespace, owner: str) -> None:
+    """
+    Lease and run jobs until the queue is finished, running up to
+    WORKER_CONCURRENT_JOBS jobs at the same time.
+
+    Args:
+        args (Namespace): Parsed command line arguments.
+        owner (str): The ID of the worker.
+    """
+    queue = JobQueue()
+
+    async def run_slot() -> None:
+        while True:
+            job: QueuedJob | None = queue.lease(owner)
+            if job is None:
+                # Running URL jobs may still add albums to the queue
+                if queue.is_finished():
+                    return
+                await asyncio.sleep(QUEUE_POLL_SECONDS)
+                continue
+
+            task = asyncio.create_task(
+                _run_job(queue, job, session, args, scheduler)
+            )
+            renewer = asyncio.create_task(_renew_lease(queue, job, owner, task))
+            try:
+                results = await task
+            except asyncio.CancelledError:
+                if not renewer.done():
+                    raise
+                # Another worker runs the job now
+                continue
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed: {job.url}")
+                results = [{"url": job.url, "status": f"error: {e}"}]
+            finally:
+                renewer.cancel()
+            if not queue.complete(job.id, owner, results):
+                logger.warning(f"Dropped the results of job {job.id}, lease lost")
+
+    try:
+        # The hosts are shared by all the workers, split their limits. The
+        # workers would all listen on the metrics address, don't serve them
+        async with runtime(args, args.workers, metrics=False) as (session, scheduler):
+            await asyncio.gather(
+                *(run_slot() for _ in range(WORKER_CONCURRENT_JOBS))
+            )
+    finally:
+        queue.close()
+
+
+def worker_main(args: Namespace, worker_id: int) -> None:
+    """
+    Entry point of a worker process.
+
+    Args:
+        args (Namespace): Parsed command line arguments.
+        worker_id (int): The number of the worker.
+    """
+    logger.setup_logger(PACKAGE, LOG_FILE, args.debug, args.verbose)
+    owner: str = f"{worker_id}:{os.getpid()}"
+    logger.info(f"Worker {owner} started")
+    # Every worker writes its own profile next to the one of the main process
+    profile: Path | None = None
+    if args.profile:
+        profile = args.profile.with_name(f"{args.profile.name}.worker{worker_id}")
+    try:
+        with profile_session(profile):
+            asyncio.run(_work(args, owner))
+    except KeyboardInterrupt:
+        pass
+    logger.info(f"Worker {owner} stopped")
+
+
+def run_workers(args: Namespace, urls: list[str]) -> list[dict[str, str]]:
+    """
+    Download the URLs with `args.workers` processes sharing a job queue.
+
+    The URLs are added to the queue, and the albums found while crawling
+    them are added as well, so a big crawl is spread across all the workers.
+    A worker that dies before the queue is finished is replaced, and the
+    jobs it was running are picked up once their leases expire. Unless
+    resuming, the jobs of the previous run are dropped.
+
+    Args:
+        args (Namespace): Parsed command line arguments.
+        urls (list[str]): The URLs to download.
+
+    Returns:
+        list[dict[str, str]]: The results of all the downloads.
+    """
+    queue = JobQueue()
+    try:
+        if args.resume:
+            queue.release_leases()
+        else:
+            queue.reset()
+        for url in urls:
+            queue.add("url", url, args.dest_path)
+
+        context = multiprocessing.get_context("spawn")
+
+        def start_worker(worker_id: int) -> BaseProcess:
+            process: BaseProcess = context.Process(
+                target=worker_main, args=(args, worker_id), daemon=False
+            )
+            process.start()
+            return process
+
+        print(f"Starting {args.workers} workers")
+        workers: dict[int, BaseProcess] = {
+            i: start_worker(i) for i in range(args.workers)
+        }
+        # Don't respawn forever workers that die right after starting
+        restarts_left: int = args.workers * QUEUE_MAX_ATTEMPTS
+        while workers:
+            sleep(QUEUE_POLL_SECONDS)
+            for i, process in list(workers.items()):
+                if process.is_alive():
+                    continue
+                del workers[i]
+                if process.exitcode == 0:
+                    continue
+                logger.warning(f"Worker {i} died with code {process.exitcode}")
+                if restarts_left and not queue.is_finished():
+                    print(f"[yellow]Worker {i} died, restarting it[/]")
+                    restarts_left -= 1
+                    workers[i] = start_worker(i)
+
+        logger.info(f"Workers finished: {dict(queue.counts())}")
+        return list(queue.results())
+    finally:
+        queue.close()
@@ -0,0 +1,37 @@
+"""Shared fixtures of the test suite."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from core_helpers.logs import logger
+
+from ososedki_dl import ledger as ledger_module
+from ososedki_dl.consts import PACKAGE
+from ososedki_dl.index import ContentIndex
+from ososedki_dl.ledger import DownloadLedger
+
+
+@pytest.fixture(autouse=True, scope="session")
+def setup_logger(tmp_path_factory: pytest.TempPathFactory) -> None:
+    """The modules of the package log through the logger of the package."""
+    log_file: Path = tmp_path_factory.mktemp("logs") / f"{PACKAGE}.log"
+    logger.setup_logger(PACKAGE, log_file, False, False)
+
+
+@pytest.fixture
+def ledger(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[DownloadLedger]:
+    """A download ledger that never imports the legacy cache of the user."""
+    monkeypatch.setattr(ledger_module, "LEGACY_CACHE_PATH", tmp_path / ".cache")
+    db = DownloadLedger(tmp_path / "ledger.sqlite3")
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def content_index(tmp_path: Path) -> Iterator[ContentIndex]:
+    index = ContentIndex(tmp_path / "index.sqlite3")
+    yield index
+    index.close()
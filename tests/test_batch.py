@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import io
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+from ososedki_dl import commands
+from ososedki_dl.consts import (EXIT_FAILURE, EXIT_INTERRUPTED, EXIT_SUCCESS,
+                                EXIT_USAGE)
+from ososedki_dl.utils import read_urls
+
+URLS = """\
+# Albums to download
+https://ososedki.com/photos/1
+
+https://ososedki.com/photos/2
+  https://ososedki.com/photos/1
+not a url
+"""
+
+
+def test_read_urls_from_a_file(tmp_path: Path) -> None:
+    input_file = tmp_path / "urls.txt"
+    input_file.write_text(URLS, encoding="utf-8")
+
+    urls, invalid = read_urls(str(input_file))
+    assert urls == ["https://ososedki.com/photos/1", "https://ososedki.com/photos/2"]
+    assert invalid == ["not a url"]
+
+
+def test_read_urls_from_stdin(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("sys.stdin", io.StringIO(URLS))
+
+    urls, invalid = read_urls("-")
+    assert len(urls) == 2
+    assert invalid == ["not a url"]
+
+
+@pytest.fixture
+def args(tmp_path: Path) -> Namespace:
+    return Namespace(
+        input_file=str(tmp_path / "urls.txt"),
+        dest_path=tmp_path / "downloads",
+        workers=0,
+        metrics=None,
+    )
+
+
+def _write_input(args: Namespace, content: bytes) -> None:
+    Path(args.input_file).write_bytes(content)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [None, b"\xff\xfe\x00h\x00t", b"# nothing to download\n\n", b"not a url\n"],
+    ids=["missing", "not-utf8", "empty", "no-valid-url"],
+)
+def test_unusable_input(args: Namespace, content: bytes | None) -> None:
+    if content is not None:
+        _write_input(args, content)
+
+    assert commands.run_batch_command(args) == EXIT_USAGE
+
+
+@pytest.mark.parametrize(
+    ("content", "status", "expected"),
+    [
+        (b"https://a.com/1\n", "ok", EXIT_SUCCESS),
+        (b"https://a.com/1\n", "error: 404", EXIT_FAILURE),
+        (b"https://a.com/1\nnot a url\n", "ok", EXIT_FAILURE),
+    ],
+    ids=["downloaded", "download-error", "invalid-line"],
+)
+def test_exit_code(
+    args: Namespace,
+    monkeypatch: pytest.MonkeyPatch,
+    content: bytes,
+    status: str,
+    expected: int,
+) -> None:
+    _write_input(args, content)
+
+    async def run_batch(_args: Namespace, urls: list[str]) -> list[dict[str, str]]:
+        return [{"url": url, "status": status} for url in urls]
+
+    monkeypatch.setattr(commands, "run_batch", run_batch)
+    assert commands.run_batch_command(args) == expected
+
+
+def test_interrupted(args: Namespace, monkeypatch: pytest.MonkeyPatch) -> None:
+    _write_input(args, b"https://a.com/1\n")
+
+    async def run_batch(_args: Namespace, _urls: list[str]) -> list[dict[str, str]]:
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(commands, "run_batch", run_batch)
+    assert commands.run_batch_command(args) == EXIT_INTERRUPTED
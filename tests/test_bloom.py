@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import multiprocessing
+from hashlib import sha256
+from pathlib import Path
+
+import pytest
+
+from ososedki_dl.bloom import BloomFilter
+
+
+def _key(i: int) -> bytes:
+    return sha256(str(i).encode()).digest()
+
+
+def test_add_and_lookup(tmp_path: Path) -> None:
+    bloom = BloomFilter.for_capacity(tmp_path / "f.bloom", 1000, 0.01)
+    assert bloom.created
+    for i in range(1000):
+        bloom.add(_key(i))
+
+    assert bloom.count == 1000
+    assert all(_key(i) in bloom for i in range(1000))
+    false_positives: int = sum(_key(i) in bloom for i in range(1000, 11000))
+    assert false_positives < 300
+
+    bloom.clear()
+    assert bloom.count == 0
+    assert _key(0) not in bloom
+    bloom.close()
+
+
+def test_reopen(tmp_path: Path) -> None:
+    path = tmp_path / "f.bloom"
+    bloom = BloomFilter.for_capacity(path, 100, 0.01)
+    bloom.add(_key(1))
+    bloom.close()
+
+    bloom = BloomFilter.for_capacity(path, 100, 0.01)
+    assert not bloom.created
+    assert bloom.count == 1 and _key(1) in bloom
+    bloom.close()
+
+    # Another geometry starts a new filter
+    bloom = BloomFilter.for_capacity(path, 200, 0.01)
+    assert bloom.created
+    assert bloom.count == 0 and _key(1) not in bloom
+    bloom.close()
+
+
+def _add_keys(path: Path, start: int, count: int) -> None:
+    bloom = BloomFilter.for_capacity(path, 10_000, 0.01)
+    for i in range(start, start + count):
+        bloom.add(_key(i))
+    bloom.close()
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_processes_sharing_a_filter(tmp_path: Path) -> None:
+    path = tmp_path / "f.bloom"
+    BloomFilter.for_capacity(path, 10_000, 0.01).close()
+
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_add_keys, args=(path, n * 2000, 2000))
+        for n in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    bloom = BloomFilter.for_capacity(path, 10_000, 0.01)
+    assert bloom.count == 8000
+    assert all(_key(i) in bloom for i in range(8000))
+    bloom.close()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from collections import deque
+from pathlib import Path
+
+import pytest
+
+from ososedki_dl import checkpoint as checkpoint_module
+from ososedki_dl.checkpoint import CrawlCheckpoint
+
+URL = "https://husvjjal.blogspot.com/"
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> Path:
+    return tmp_path / "checkpoints" / "crawl.json"
+
+
+def test_round_trip(path: Path) -> None:
+    checkpoint = CrawlCheckpoint(URL, path)
+    checkpoint.add_page(f"{URL}?page=1", [["a", "b"], 3])
+    checkpoint.start_album("a", "Album A", ["a/1.jpg", "a/2.jpg"])
+    checkpoint.start_album("b", "Album B", ["b/1.jpg"])
+    checkpoint.finish_album("b")
+    checkpoint.set_frontier(deque(["c", "d"]), {"a", "b", "c", "d"})
+    checkpoint.save()
+
+    loaded = CrawlCheckpoint.load(URL, path)
+    assert loaded.get_page(f"{URL}?page=1") == [["a", "b"], 3]
+    assert loaded.get_page(f"{URL}?page=2") is None
+    assert loaded.get_album("a") == ("Album A", ["a/1.jpg", "a/2.jpg"])
+    assert loaded.get_album("b") is None
+    assert loaded.is_done("b") and not loaded.is_done("a")
+    assert loaded.frontier == deque(["c", "d"])
+    assert loaded.visited == {"a", "b", "c", "d"}
+
+
+def test_frontier_is_saved_as_it_is_when_saving(path: Path) -> None:
+    checkpoint = CrawlCheckpoint(URL, path)
+    queue: deque[str] = deque(["a"])
+    visited: set[str] = {"a"}
+    checkpoint.set_frontier(queue, visited)
+    # The crawler updates the collections in place
+    queue.popleft()
+    queue.extend(["b", "c"])
+    visited.update(["b", "c"])
+    checkpoint.save()
+
+    loaded = CrawlCheckpoint.load(URL, path)
+    assert loaded.frontier == deque(["b", "c"])
+    assert loaded.visited == {"a", "b", "c"}
+
+
+def test_saved_on_the_interval_only(
+    path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    checkpoint = CrawlCheckpoint(URL, path)
+    checkpoint.set_frontier(deque(["a"]), {"a"})
+    checkpoint.finish_album("a")
+    assert not path.exists()
+
+    monkeypatch.setattr(checkpoint_module, "CHECKPOINT_INTERVAL_SECONDS", 0.0)
+    checkpoint.finish_album("b")
+    assert CrawlCheckpoint.load(URL, path).done == {"a", "b"}
+
+
+def test_missing_or_unreadable_checkpoint(path: Path) -> None:
+    assert CrawlCheckpoint.load(URL, path).frontier is None
+
+    path.parent.mkdir(parents=True)
+    path.write_text("{not json", encoding="utf-8")
+    checkpoint = CrawlCheckpoint.load(URL, path)
+    assert checkpoint.frontier is None
+    assert checkpoint.pages == {}
+
+
+def test_discard(path: Path) -> None:
+    checkpoint = CrawlCheckpoint(URL, path)
+    checkpoint.save()
+    assert path.exists()
+
+    checkpoint.discard()
+    assert not path.exists()
+    checkpoint.save()
+    assert not path.exists()
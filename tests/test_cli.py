@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from argparse import ArgumentTypeError
+
+import pytest
+
+from ososedki_dl.cli import _positive_float
+
+
+@pytest.mark.parametrize("value", ["0", "-5", "nan", "abc"])
+def test_loop_lag_must_be_positive(value: str) -> None:
+    with pytest.raises(ArgumentTypeError):
+        _positive_float(value)
+
+
+def test_loop_lag() -> None:
+    assert _positive_float("0.5") == 0.5
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from ososedki_dl.download import Downloader
+from ososedki_dl.index import ContentIndex
+from ososedki_dl.ledger import DownloadLedger
+
+DATA: bytes = b"\xff\xd8" + bytes(range(256)) * 4
+
+
+def _make_app(state: dict[str, Any]) -> web.Application:
+    """Serve DATA as an image, with the ETag and Content-Type held in state."""
+
+    async def handler(request: web.Request) -> web.Response:
+        state["requests"].append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == state["etag"]:
+            return web.Response(status=304)
+        headers = {"ETag": state["etag"], "Content-Type": state["content_type"]}
+        return web.Response(body=DATA, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/media.php", handler)
+    return app
+
+
+def _download_twice(
+    state: dict[str, Any],
+    album: Path,
+    ledger: DownloadLedger,
+    content_index: ContentIndex,
+    second: dict[str, Any],
+) -> tuple[list[dict[str, str]], Downloader]:
+    async def run() -> tuple[list[dict[str, str]], Downloader]:
+        async with TestServer(_make_app(state)) as server, ClientSession() as s:
+            downloader = Downloader(s, ledger=ledger, content_index=content_index)
+            url = str(server.make_url("/media.php"))
+            results = [await downloader.download_and_save_media(url, album)]
+            state.update(second)
+            results.append(await downloader.download_and_save_media(url, album))
+            return results, downloader
+
+    return asyncio.run(run())
+
+
+def _rows(ledger: DownloadLedger, db_path: Path) -> list[tuple[Any, ...]]:
+    ledger.flush()
+    with sqlite3.connect(db_path) as conn:
+        query = "SELECT status, path, size, digest FROM downloads"
+        return conn.execute(query).fetchall()
+
+
+def test_not_modified_keeps_the_download_record(
+    tmp_path: Path, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    state: dict[str, Any] = {
+        "etag": '"v1"',
+        "content_type": "image/jpeg",
+        "requests": [],
+    }
+    results, downloader = _download_twice(
+        state, tmp_path, ledger, content_index, second={}
+    )
+
+    assert [result["status"] for result in results] == ["ok", "skipped"]
+    assert state["requests"] == [None, '"v1"']
+    ((status, path, size, digest),) = _rows(ledger, tmp_path / "ledger.sqlite3")
+    assert status == "ok"
+    assert Path(path).read_bytes() == DATA
+    assert size == len(DATA)
+    assert digest is not None
+    assert downloader._validators == {}
+
+
+def test_failed_download_forgets_the_validators(
+    tmp_path: Path, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    state: dict[str, Any] = {
+        "etag": '"v1"',
+        "content_type": "image/jpeg",
+        "requests": [],
+    }
+    results, downloader = _download_twice(
+        state,
+        tmp_path,
+        ledger,
+        content_index,
+        second={"etag": '"v2"', "content_type": "application/x-unknown"},
+    )
+
+    assert results[0]["status"] == "ok"
+    assert results[1]["status"] == "error: missing content type"
+    assert downloader._validators == {}
+    assert ledger.get_validators(results[0]["url"]) == ('"v1"', None)
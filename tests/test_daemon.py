@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+from argparse import Namespace
+from pathlib import Path
+from typing import Any
+
+import pytest
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+
+from ososedki_dl import daemon
+from ososedki_dl.daemon import JobServer
+from ososedki_dl.scheduler import DownloadScheduler
+
+URLS: dict[str, list[str]] = {"urls": ["https://ososedki.com/photos/1"]}
+
+
+@pytest.fixture
+def submitted(monkeypatch: pytest.MonkeyPatch) -> list[Namespace]:
+    """The arguments of the jobs run by the daemon, which download nothing."""
+    jobs: list[Namespace] = []
+
+    async def download_urls(
+        _session: Any, _urls: list[str], args: Namespace, *_: Any
+    ) -> None:
+        jobs.append(args)
+
+    monkeypatch.setattr(daemon, "download_urls", download_urls)
+    return jobs
+
+
+def _post(
+    dest_path: Path, headers: dict[str, str] | None = None, **kwargs: Any
+) -> tuple[int, Any]:
+    async def run() -> tuple[int, Any]:
+        async with ClientSession() as session:
+            args = Namespace(dest_path=dest_path, resume=False)
+            app = JobServer(session, DownloadScheduler(), args).create_app()
+            async with TestServer(app) as server:
+                url = server.make_url("/jobs")
+                async with session.post(url, headers=headers, **kwargs) as response:
+                    body: Any = await response.text()
+                    if response.content_type == "application/json":
+                        body = await response.json()
+                # Let the submitted job run
+                await asyncio.sleep(0)
+                return response.status, body
+
+    return asyncio.run(run())
+
+
+def test_submit_job(tmp_path: Path, submitted: list[Namespace]) -> None:
+    status, job = _post(tmp_path, json={**URLS, "destination": "cosplay"})
+
+    assert status == 202
+    assert job["destination"] == str(tmp_path.resolve() / "cosplay")
+    assert [args.dest_path for args in submitted] == [tmp_path.resolve() / "cosplay"]
+
+
+@pytest.mark.parametrize("destination", ["../outside", "/etc", "~"])
+def test_destination_outside_the_download_path(
+    tmp_path: Path, submitted: list[Namespace], destination: str
+) -> None:
+    status, _ = _post(tmp_path, json={**URLS, "destination": destination})
+
+    assert status == 400
+    assert submitted == []
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"data": "{not json", "headers": {"Content-Type": "application/json"}},
+        {"json": {"urls": []}},
+        {"json": {"urls": ["nope"]}},
+    ],
+    ids=["not-json", "no-urls", "invalid-url"],
+)
+def test_invalid_job(
+    tmp_path: Path, submitted: list[Namespace], kwargs: dict[str, Any]
+) -> None:
+    status, _ = _post(tmp_path, **kwargs)
+
+    assert status == 400
+    assert submitted == []
+
+
+def test_json_content_type_required(
+    tmp_path: Path, submitted: list[Namespace]
+) -> None:
+    body = '{"urls": ["https://ososedki.com/photos/1"]}'
+    status, _ = _post(tmp_path, data=body, headers={"Content-Type": "text/plain"})
+
+    assert status == 415
+    assert submitted == []
+
+
+def test_requests_from_web_pages_refused(
+    tmp_path: Path, submitted: list[Namespace]
+) -> None:
+    status, _ = _post(tmp_path, json=URLS, headers={"Origin": "https://example.com"})
+
+    assert status == 403
+    assert submitted == []
+
+
+def test_job_progress(tmp_path: Path, submitted: list[Namespace]) -> None:
+    async def run() -> tuple[list[Any], Any]:
+        async with ClientSession() as session:
+            args = Namespace(dest_path=tmp_path, resume=False)
+            app = JobServer(session, DownloadScheduler(), args).create_app()
+            async with TestServer(app) as server:
+                async with session.post(server.make_url("/jobs"), json=URLS) as r:
+                    job_id: str = (await r.json())["id"]
+                await asyncio.sleep(0)
+                async with session.get(server.make_url("/jobs")) as r:
+                    jobs: list[Any] = await r.json()
+                async with session.get(server.make_url(f"/jobs/{job_id}")) as r:
+                    return jobs, await r.json()
+
+    jobs, job = asyncio.run(run())
+
+    assert [listed["id"] for listed in jobs] == [job["id"]]
+    assert job["state"] == "done"
+    assert job["results"] == []
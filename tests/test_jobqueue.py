@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from ososedki_dl import jobqueue
+from ososedki_dl.consts import QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS
+from ososedki_dl.jobqueue import JobQueue
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now: float = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def expire_leases(self) -> None:
+        self.now += QUEUE_LEASE_SECONDS + 1
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(jobqueue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path: Path, clock: Clock) -> Iterator[JobQueue]:
+    queue = JobQueue(tmp_path / "queue.sqlite3")
+    yield queue
+    queue.close()
+
+
+def test_lease_in_order_once(queue: JobQueue, tmp_path: Path) -> None:
+    assert queue.add("url", "https://a.com/1", tmp_path)
+    assert queue.add("album", "https://a.com/2", tmp_path, "Crawler", "Title", ["m"])
+    assert not queue.add("url", "https://a.com/1", tmp_path)
+
+    first = queue.lease("w1")
+    second = queue.lease("w2")
+    assert first is not None and first.url == "https://a.com/1"
+    assert second is not None and second.kind == "album"
+    assert (second.crawler, second.title, second.media_urls) == (
+        "Crawler",
+        "Title",
+        ["m"],
+    )
+    assert queue.lease("w3") is None
+    assert not queue.is_finished()
+
+    assert queue.complete(first.id, "w1", [{"url": "m1", "status": "ok"}])
+    assert queue.complete(second.id, "w2", [{"url": "m2", "status": "error: 404"}])
+    assert queue.counts() == {"done": 1, "failed": 1}
+    assert queue.is_finished()
+    assert [r["status"] for r in queue.results()] == ["ok", "error: 404"]
+
+
+def test_only_the_owner_completes_a_job(queue: JobQueue, tmp_path: Path) -> None:
+    queue.add("url", "https://a.com/1", tmp_path)
+    job = queue.lease("w1")
+    assert job is not None
+
+    assert not queue.renew(job.id, "w2")
+    assert not queue.complete(job.id, "w2", [])
+    assert queue.counts() == {"leased": 1}
+    assert queue.complete(job.id, "w1", [])
+    # A job is completed once
+    assert not queue.complete(job.id, "w1", [])
+
+
+def test_expired_lease_is_taken_over(
+    queue: JobQueue, clock: Clock, tmp_path: Path
+) -> None:
+    queue.add("url", "https://a.com/1", tmp_path)
+    job = queue.lease("w1")
+    assert job is not None
+    assert queue.renew(job.id, "w1")
+    clock.now += QUEUE_LEASE_SECONDS / 2
+    assert queue.lease("w2") is None
+
+    clock.expire_leases()
+    taken = queue.lease("w2")
+    assert taken is not None and taken.id == job.id
+    # The first worker lost the job
+    assert not queue.renew(job.id, "w1")
+    assert not queue.complete(job.id, "w1", [{"url": "m", "status": "ok"}])
+    assert queue.complete(job.id, "w2", [{"url": "m", "status": "error: 500"}])
+    assert [r["status"] for r in queue.results()] == ["error: 500"]
+
+
+def test_job_crashing_its_workers_fails(
+    queue: JobQueue, clock: Clock, tmp_path: Path
+) -> None:
+    queue.add("url", "https://a.com/1", tmp_path)
+    for attempt in range(QUEUE_MAX_ATTEMPTS):
+        assert queue.lease(f"w{attempt}") is not None
+        clock.expire_leases()
+
+    assert queue.lease("w") is None
+    assert queue.is_finished()
+    assert list(queue.results()) == [
+        {"url": "https://a.com/1", "status": "error: worker crashed"}
+    ]
+
+
+def test_release_leases_and_reset(queue: JobQueue, tmp_path: Path) -> None:
+    queue.add("url", "https://a.com/1", tmp_path)
+    assert queue.lease("w1") is not None
+
+    queue.release_leases()
+    job = queue.lease("w2")
+    assert job is not None and job.url == "https://a.com/1"
+
+    queue.reset()
+    assert queue.counts() == {}
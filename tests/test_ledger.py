@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from ososedki_dl import ledger as ledger_module
+from ososedki_dl.ledger import DownloadLedger
+from ososedki_dl.utils import get_url_hash
+
+
+def test_record_and_lookup(ledger: DownloadLedger, tmp_path: Path) -> None:
+    media = tmp_path / "a.jpg"
+    ledger.record("https://a.com/a.jpg", "ok", media, 10, "ab" * 32)
+    ledger.record("https://a.com/b.jpg", "error: 404")
+
+    # Answered from the buffer, then from the database
+    for flush in (False, True):
+        if flush:
+            ledger.flush()
+        assert ledger.get_path("https://a.com/a.jpg") == media
+        assert ledger.get_path("https://a.com/b.jpg") is None
+        assert ledger.get_path("https://a.com/c.jpg") is None
+        assert ledger.contains_many(
+            ["https://a.com/a.jpg", "https://a.com/b.jpg", "https://a.com/c.jpg"]
+        ) == {"https://a.com/a.jpg"}
+
+
+@pytest.mark.parametrize("flush_between", [False, True])
+def test_failure_never_demotes_a_download(
+    ledger: DownloadLedger, tmp_path: Path, flush_between: bool
+) -> None:
+    url = "https://a.com/a.jpg"
+    media = tmp_path / "a.jpg"
+    ledger.record(url, "ok", media, 10, "ab" * 32)
+    if flush_between:
+        ledger.flush()
+    ledger.record(url, "error: 503")
+    ledger.record(url, "skipped")
+    ledger.flush()
+
+    row = ledger._conn.execute(
+        "SELECT status, path, size, digest FROM downloads"
+    ).fetchone()
+    assert row == ("skipped", str(media), 10, "ab" * 32)
+    assert ledger.contains(url)
+
+
+def test_buffered_failure_never_hides_a_download(
+    ledger: DownloadLedger, tmp_path: Path
+) -> None:
+    url = "https://a.com/a.jpg"
+    media = tmp_path / "a.jpg"
+    ledger.record(url, "ok", media, 10, "ab" * 32)
+    ledger.flush()
+    # A failed retry waiting in the buffer
+    ledger.record(url, "error: 503")
+
+    assert ledger.get_path(url) == media
+    assert ledger.contains_many([url]) == {url}
+
+
+def test_error_is_recorded_without_previous_download(ledger: DownloadLedger) -> None:
+    ledger.record("https://a.com/a.jpg", "error: 404")
+    ledger.flush()
+    (status,) = ledger._conn.execute("SELECT status FROM downloads").fetchone()
+    assert status == "error: 404"
+    assert not ledger.contains("https://a.com/a.jpg")
+
+
+def test_validators(ledger: DownloadLedger) -> None:
+    url = "https://a.com/album"
+    assert ledger.get_validators(url) == (None, None)
+    ledger.set_validators(url, '"etag"', None)
+    assert ledger.get_validators(url) == ('"etag"', None)
+    ledger.flush()
+    assert ledger.get_validators(url) == ('"etag"', None)
+
+
+def test_reopen_keeps_records_and_rebuilds_the_filter(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(ledger_module, "LEGACY_CACHE_PATH", tmp_path / ".cache")
+    db_path = tmp_path / "ledger.sqlite3"
+    db = DownloadLedger(db_path)
+    db.record("https://a.com/a.jpg", "ok", tmp_path / "a.jpg")
+    db.close()
+
+    # A lost filter is rebuilt from the database
+    db_path.with_suffix(".bloom").unlink()
+    db = DownloadLedger(db_path)
+    try:
+        assert db.contains("https://a.com/a.jpg")
+        assert not db.contains("https://a.com/b.jpg")
+    finally:
+        db.close()
+
+
+def test_imports_legacy_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    legacy = tmp_path / ".cache"
+    legacy.mkdir()
+    (legacy / get_url_hash("https://a.com/a.jpg")).touch()
+    (legacy / "not-a-hash").touch()
+    monkeypatch.setattr(ledger_module, "LEGACY_CACHE_PATH", legacy)
+
+    db = DownloadLedger(tmp_path / "ledger.sqlite3")
+    try:
+        assert db.contains("https://a.com/a.jpg")
+        (count,) = db._conn.execute("SELECT COUNT(*) FROM downloads").fetchone()
+        assert count == 1
+    finally:
+        db.close()
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from ososedki_dl.loopmonitor import CallSite, LoopMonitor
+
+
+@pytest.mark.parametrize("threshold, interval", [(0.0, 0.01), (0.05, 0.0)])
+def test_threshold_and_interval_must_be_positive(
+    threshold: float, interval: float
+) -> None:
+    with pytest.raises(ValueError):
+        LoopMonitor(threshold, interval)
+
+
+def _block_the_loop() -> None:
+    time.sleep(0.3)
+
+
+def test_stall_is_blamed_on_the_blocking_call() -> None:
+    async def run() -> LoopMonitor:
+        monitor = LoopMonitor(0.05, interval=0.01)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        _block_the_loop()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return monitor
+
+    monitor: LoopMonitor = asyncio.run(run())
+
+    sites: list[CallSite] = monitor.report()
+    assert [site.count for site in sites] == [1]
+    assert "_block_the_loop" in sites[0].blocking
+    assert monitor.max_lag >= 0.25
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from ososedki_dl import download as download_module
+from ososedki_dl import index as index_module
+from ososedki_dl import ledger as ledger_module
+from ososedki_dl.consts import DEFAULT_HTML_PARSER, MAX_RETRIES
+from ososedki_dl.crawlers.ososedki_crawler import OsosedkiBaseCrawler
+from ososedki_dl.index import ContentIndex
+from ososedki_dl.ledger import DownloadLedger
+
+LAST_PAGE = 12
+ALBUMS_PER_PAGE = 2
+
+
+class ListingCrawler(OsosedkiBaseCrawler):
+    site_url = "http://localhost"
+    base_image_path = "/images/"
+    album_path = "/photos/"
+    cosplay_url = f"{site_url}/cosplay/"
+    pagination = False
+
+
+async def _no_sleep(_delay: float) -> None:
+    return None
+
+
+@pytest.fixture(autouse=True)
+def shared_stores(
+    monkeypatch: pytest.MonkeyPatch, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    """The crawlers use the test stores and never wait to retry."""
+    monkeypatch.setattr(ledger_module, "_ledger", ledger)
+    monkeypatch.setattr(index_module, "_content_index", content_index)
+    monkeypatch.setattr(download_module, "sleep", _no_sleep)
+
+
+def _make_app(failures: dict[int, int], requests: list[int]) -> web.Application:
+    """
+    Serve LAST_PAGE listing pages linking to the first pages only, answering
+    503 to each page in failures the given number of times.
+    """
+
+    async def handler(request: web.Request) -> web.Response:
+        page = int(request.query.get("page", "1"))
+        requests.append(page)
+        if failures.get(page):
+            failures[page] -= 1
+            raise web.HTTPServiceUnavailable()
+        if page > LAST_PAGE:
+            raise web.HTTPNotFound()
+
+        albums: str = "".join(
+            f'<a href="/photos/{page}-{n}">Album</a>' for n in range(ALBUMS_PER_PAGE)
+        )
+        pagination = '<a href="?page=2">2</a><a href="?page=3">3</a>'
+        html = f"<html>{albums}{pagination}</html>"
+        return web.Response(text=html, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/cosplay/model", handler)
+    return app
+
+
+def _make_crawler(
+    session: ClientSession, server: TestServer, tmp_path: Path
+) -> ListingCrawler:
+    args = Namespace(
+        dest_path=tmp_path,
+        parser=DEFAULT_HTML_PARSER,
+        resume=False,
+        check_cache=False,
+        debug=False,
+    )
+    crawler = ListingCrawler(session, args)
+    crawler.site_url = str(server.make_url("")).rstrip("/")
+    return crawler
+
+
+def _find_albums(
+    tmp_path: Path, failures: dict[int, int]
+) -> tuple[set[str], list[int]]:
+    requests: list[int] = []
+
+    async def run() -> set[str]:
+        app: web.Application = _make_app(failures, requests)
+        async with TestServer(app) as server, ClientSession() as session:
+            crawler: ListingCrawler = _make_crawler(session, server, tmp_path)
+            albums: set[str] = set()
+            url: str = f"{crawler.site_url}/cosplay/model"
+            async for page in crawler._find_albums(url):
+                albums.update(page)
+            return albums
+
+    return asyncio.run(run()), requests
+
+
+def test_probes_find_the_last_page(tmp_path: Path) -> None:
+    albums, requests = _find_albums(tmp_path, failures={})
+
+    assert len(albums) == LAST_PAGE * ALBUMS_PER_PAGE
+    # Every page is fetched once, plus the probes past the end
+    assert sorted(set(requests)) == sorted(requests)
+
+
+def test_failed_probe_is_retried(tmp_path: Path) -> None:
+    albums, requests = _find_albums(tmp_path, failures={6: 1})
+
+    assert len(albums) == LAST_PAGE * ALBUMS_PER_PAGE
+    assert requests.count(6) == 2
+
+
+def test_pages_are_walked_when_a_probe_keeps_failing(tmp_path: Path) -> None:
+    failing_probe: int = LAST_PAGE + 6
+    albums, requests = _find_albums(tmp_path, failures={failing_probe: 100})
+
+    assert len(albums) == LAST_PAGE * ALBUMS_PER_PAGE
+    assert requests.count(failing_probe) == MAX_RETRIES
+    # The walk stops at the first page past the end, without retrying its 404
+    assert requests.count(LAST_PAGE + 1) == 1
+
+
+def _make_album_app(requests: list[str]) -> web.Application:
+    """Serve an album page with an ETag, linking to a single image."""
+
+    async def album(request: web.Request) -> web.Response:
+        requests.append(f"album {request.headers.get('If-None-Match')}")
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        image: str = f"{request.url.origin()}/images/1.jpg"
+        html = f'<html><title>Album</title><a href="{image}">1</a></html>'
+        headers = {"ETag": '"v1"'}
+        return web.Response(text=html, content_type="text/html", headers=headers)
+
+    async def image(request: web.Request) -> web.Response:
+        requests.append("image")
+        return web.Response(body=b"\xff\xd8" + bytes(256), content_type="image/jpeg")
+
+    app = web.Application()
+    app.router.add_get("/photos/1", album)
+    app.router.add_get("/images/1.jpg", image)
+    return app
+
+
+def _process_album_twice(
+    tmp_path: Path, media_paths: list[str] | None = None, pagination: bool = False
+) -> tuple[list[list[dict[str, str]]], list[str]]:
+    requests: list[str] = []
+
+    async def run() -> list[list[dict[str, str]]]:
+        app: web.Application = _make_album_app(requests)
+        async with TestServer(app) as server, ClientSession() as session:
+            crawler: ListingCrawler = _make_crawler(session, server, tmp_path)
+            crawler.pagination = pagination
+            url: str = f"{crawler.site_url}/photos/1"
+            media_urls: list[str] | None = media_paths and [
+                f"{crawler.site_url}{path}" for path in media_paths
+            ]
+            return [
+                await crawler.process_album(url, media_urls=media_urls)
+                for _ in range(2)
+            ]
+
+    return asyncio.run(run()), requests
+
+
+def test_unchanged_album_is_skipped(tmp_path: Path) -> None:
+    results, requests = _process_album_twice(tmp_path)
+
+    assert [result["status"] for result in results[0]] == ["ok"]
+    # The album is not reported as a media result
+    assert results[1] == []
+    assert requests == ["album None", "image", 'album "v1"']
+
+
+def test_album_with_given_media_is_always_scanned(tmp_path: Path) -> None:
+    results, requests = _process_album_twice(tmp_path, media_paths=["/images/1.jpg"])
+
+    assert [result["status"] for result in results[1]] == ["skipped"]
+    assert requests.count("album None") == 2
+
+
+def test_paginated_album_is_always_scanned(tmp_path: Path) -> None:
+    # The first page of a paginated album says nothing about the next ones
+    _, requests = _process_album_twice(tmp_path, pagination=True)
+
+    assert requests.count("album None") == 2
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+
+from ososedki_dl.scheduler import DownloadScheduler, HostLimiter
+
+
+def test_limit_grows_on_success_and_halves_on_throttle() -> None:
+    limiter = HostLimiter("a.com", initial=4, maximum=16)
+
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.capacity == 5
+
+    limiter.on_throttle()
+    assert limiter.capacity == 2
+    # A burst of throttled responses only lowers the limit once
+    limiter.on_throttle()
+    assert limiter.capacity == 2
+
+
+def test_limit_stays_within_bounds() -> None:
+    limiter = HostLimiter("a.com", initial=2, maximum=3)
+
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.capacity == 3
+
+    limiter = HostLimiter("a.com", initial=1, maximum=3)
+    limiter.on_throttle()
+    assert limiter.capacity == 1
+
+
+def test_requests_wait_for_a_host_slot() -> None:
+    scheduler = DownloadScheduler(max_per_host=2)
+    running: list[int] = []
+
+    async def job() -> None:
+        running.append(scheduler.limiter("https://a.com/").in_flight)
+        await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        limiter: HostLimiter = scheduler.limiter("https://a.com/")
+        limiter.limit = 2.0
+        await asyncio.gather(
+            *(scheduler.submit(f"https://a.com/{n}", job) for n in range(6))
+        )
+        assert limiter.in_flight == 0
+
+    asyncio.run(run())
+    assert max(running) == 2
+
+
+def test_nested_requests_reuse_the_held_slot() -> None:
+    scheduler = DownloadScheduler(max_per_host=1)
+
+    async def run() -> None:
+        async with scheduler.host_slot("https://a.com/album"):
+            async with scheduler.host_slot("https://a.com/media"):
+                assert scheduler.limiter("https://a.com/").in_flight == 1
+
+    asyncio.run(asyncio.wait_for(run(), 1))
+
+
+def test_host_ceiling_is_the_lowest_requested() -> None:
+    scheduler = DownloadScheduler(max_per_host=8)
+
+    assert scheduler.limiter("https://a.com/1").maximum == 8
+    assert scheduler.limiter("https://a.com/2", 3).maximum == 3
+    assert scheduler.limiter("https://a.com/3", 6).maximum == 3
+    assert scheduler.limiter("https://b.com/1", 20).maximum == 8
+
+
+def test_processes_split_the_limits() -> None:
+    scheduler = DownloadScheduler(max_per_host=8, processes=3)
+
+    assert scheduler.limiter("https://a.com/1").maximum == 2
+    assert scheduler.limiter("https://b.com/1", 4).maximum == 1
+    assert scheduler.limiter("https://c.com/1", 1).maximum == 1
+    assert scheduler.rate_limiter("https://a.com/1", 3.0).rate == 1.0
+
+
+def test_initial_per_host_limit() -> None:
+    scheduler = DownloadScheduler(max_per_host=8, initial_per_host=8)
+    limiter = scheduler.limiter("https://a.com/1")
+    assert limiter.capacity == 8
+
+    async def hold_slots() -> None:
+        for _ in range(8):
+            await limiter.acquire()
+        for _ in range(8):
+            limiter.release()
+
+    asyncio.run(hold_slots())
+    assert limiter.peak_in_flight == 8
+    assert limiter.in_flight == 0
+
+
+def test_spare_host_slots() -> None:
+    scheduler = DownloadScheduler(max_per_host=3, initial_per_host=3)
+    limiter = scheduler.limiter("https://a.com/")
+
+    async def run() -> None:
+        # Requests made without a slot take their own
+        with scheduler.spare_host_slots("https://a.com/1", 5) as spare:
+            assert spare == 5
+        assert limiter.in_flight == 0
+
+        async with scheduler.host_slot("https://a.com/1"):
+            with scheduler.spare_host_slots("https://a.com/1", 5) as spare:
+                assert spare == 2
+                assert limiter.in_flight == 3
+            assert limiter.in_flight == 1
+
+    asyncio.run(run())
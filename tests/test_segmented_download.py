@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from functools import partial
+from pathlib import Path
+
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from aiohttp.typedefs import Handler
+
+from ososedki_dl import download as download_module
+from ososedki_dl.consts import MAX_RETRIES
+from ososedki_dl.download import Downloader, _get_segments_path
+from ososedki_dl.index import ContentIndex
+from ososedki_dl.ledger import DownloadLedger
+from ososedki_dl.scheduler import DownloadScheduler, HostLimiter
+
+DATA: bytes = bytes(range(256)) * 64
+
+
+async def _no_sleep(_delay: float) -> None:
+    return None
+
+
+@pytest.fixture(autouse=True)
+def fast_segments(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(download_module, "SEGMENTED_DOWNLOAD_THRESHOLD", 1024)
+    monkeypatch.setattr(download_module, "sleep", _no_sleep)
+
+
+def _make_app(mode: str, ranges: list[str | None]) -> web.Application:
+    """
+    Serve DATA as a video, honoring Range requests ("ranges"), answering them
+    with the whole body ("ignore") or with an empty 206 ("empty").
+    """
+
+    async def handler(request: web.Request) -> web.Response:
+        headers = {"Content-Type": "video/mp4", "Accept-Ranges": "bytes"}
+        range_header: str | None = request.headers.get("Range")
+        ranges.append(range_header)
+        if range_header is None or mode == "ignore":
+            return web.Response(body=DATA, headers=headers)
+
+        first, last = range_header.removeprefix("bytes=").split("-")
+        start, end = int(first), int(last or len(DATA) - 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(DATA)}"
+        body: bytes = b"" if mode == "empty" else DATA[start : end + 1]
+        return web.Response(status=206, body=body, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/v.mp4", handler)
+    return app
+
+
+def _download(
+    mode: str, album: Path, ledger: DownloadLedger, content_index: ContentIndex
+) -> tuple[dict[str, str], list[str | None]]:
+    ranges: list[str | None] = []
+
+    async def run() -> dict[str, str]:
+        async with TestServer(_make_app(mode, ranges)) as server, ClientSession() as s:
+            downloader = Downloader(s, ledger=ledger, content_index=content_index)
+            url = str(server.make_url("/v.mp4"))
+            return await downloader.download_and_save_media(url, album)
+
+    return asyncio.run(run()), ranges
+
+
+def _leftovers(album: Path) -> list[str]:
+    return sorted(p.name for p in album.iterdir() if p.suffix in (".part", ".json"))
+
+
+def test_segmented_download(
+    tmp_path: Path, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    album = tmp_path / "album"
+    album.mkdir()
+    result, ranges = _download("ranges", album, ledger, content_index)
+
+    assert result["status"] == "ok"
+    assert (album / "v.mp4").read_bytes() == DATA
+    assert _leftovers(album) == []
+    # The first request probes the size, the rest fetch the segments
+    assert ranges[0] is None
+    assert len(ranges) == 1 + download_module.SEGMENTED_DOWNLOAD_PARTS
+
+
+def test_ignored_ranges_fall_back_to_one_stream(
+    tmp_path: Path, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    album = tmp_path / "album"
+    album.mkdir()
+    result, _ = _download("ignore", album, ledger, content_index)
+
+    assert result["status"] == "ok"
+    assert (album / "v.mp4").read_bytes() == DATA
+    assert _leftovers(album) == []
+
+
+def test_empty_segments_give_up(
+    tmp_path: Path, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    album = tmp_path / "album"
+    album.mkdir()
+    result, ranges = _download("empty", album, ledger, content_index)
+
+    assert result["status"].startswith("error")
+    assert not (album / "v.mp4").exists()
+    # Every segment is retried a bounded number of times, then kept for a resume
+    parts: int = download_module.SEGMENTED_DOWNLOAD_PARTS
+    assert len(ranges) == 1 + parts * MAX_RETRIES
+    assert len(_leftovers(album)) == 2
+
+
+def test_resume_fetches_the_missing_bytes_only(
+    tmp_path: Path, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    album = tmp_path / "album"
+    album.mkdir()
+    ranges: list[str | None] = []
+    half: int = len(DATA) // 2
+
+    async def run() -> dict[str, str]:
+        app: web.Application = _make_app("ranges", ranges)
+        async with TestServer(app) as server, ClientSession() as s:
+            downloader = Downloader(s, ledger=ledger, content_index=content_index)
+            url = str(server.make_url("/v.mp4"))
+            # An interrupted download with the first half of the media on disk
+            temp_path: Path = downloader._get_temp_path(url, album / "v.mp4")
+            temp_path.write_bytes(DATA[:half] + bytes(len(DATA) - half))
+            quarter: int = len(DATA) // 4
+            segments = [
+                [start, start + quarter - 1, quarter if start < half else 0]
+                for start in range(0, len(DATA), quarter)
+            ]
+            _get_segments_path(temp_path).write_text(
+                json.dumps({"size": len(DATA), "segments": segments})
+            )
+            return await downloader.download_and_save_media(url, album)
+
+    result: dict[str, str] = asyncio.run(run())
+
+    assert result["status"] == "ok"
+    assert (album / "v.mp4").read_bytes() == DATA
+    assert _leftovers(album) == []
+    offsets = [int(r.split("=")[1].split("-")[0]) for r in ranges if r]
+    assert len(offsets) == 2 and min(offsets) >= half
+
+
+@pytest.mark.parametrize("mode", ["ranges", "ignore"])
+def test_resume_of_a_single_stream(
+    tmp_path: Path, ledger: DownloadLedger, content_index: ContentIndex, mode: str
+) -> None:
+    album = tmp_path / "album"
+    album.mkdir()
+    ranges: list[str | None] = []
+    half: int = len(DATA) // 2
+
+    async def run() -> dict[str, str]:
+        async with TestServer(_make_app(mode, ranges)) as server, ClientSession() as s:
+            downloader = Downloader(s, ledger=ledger, content_index=content_index)
+            url = str(server.make_url("/v.mp4"))
+            # An interrupted download of a single stream, with no segments
+            temp_path: Path = downloader._get_temp_path(url, album / "v.mp4")
+            temp_path.write_bytes(DATA[:half])
+            return await downloader.download_and_save_media(url, album)
+
+    result: dict[str, str] = asyncio.run(run())
+
+    assert result["status"] == "ok"
+    # A server ignoring the range sends the whole media, which replaces the
+    # part on disk instead of being appended to it
+    assert (album / "v.mp4").read_bytes() == DATA
+    assert _leftovers(album) == []
+    assert ranges == [None, f"bytes={half}-"]
+
+
+def test_segments_respect_the_host_limit(
+    tmp_path: Path, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    album = tmp_path / "album"
+    album.mkdir()
+    scheduler = DownloadScheduler(max_per_host=2, initial_per_host=2)
+    requests: dict[str, int] = {"running": 0, "peak": 0}
+
+    @web.middleware
+    async def count_requests(
+        request: web.Request, handler: Handler
+    ) -> web.StreamResponse:
+        requests["running"] += 1
+        requests["peak"] = max(requests["peak"], requests["running"])
+        try:
+            await asyncio.sleep(0.01)
+            return await handler(request)
+        finally:
+            requests["running"] -= 1
+
+    async def run() -> tuple[dict[str, str], HostLimiter]:
+        app: web.Application = _make_app("ranges", [])
+        app.middlewares.append(count_requests)
+        async with TestServer(app) as server, ClientSession() as s:
+            downloader = Downloader(
+                s, scheduler=scheduler, ledger=ledger, content_index=content_index
+            )
+            url = str(server.make_url("/v.mp4"))
+            job = partial(downloader.download_and_save_media, url, album)
+            return await scheduler.submit(url, job), scheduler.limiter(url)
+
+    result, limiter = asyncio.run(run())
+
+    assert result["status"] == "ok"
+    assert (album / "v.mp4").read_bytes() == DATA
+    # The job and one segment slot, never the four segments at once
+    assert limiter.peak_in_flight == 2
+    assert limiter.in_flight == 0
+    assert requests["peak"] <= 2
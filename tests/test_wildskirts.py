@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from ososedki_dl import index as index_module
+from ososedki_dl import ledger as ledger_module
+from ososedki_dl.consts import DEFAULT_HTML_PARSER
+from ososedki_dl.crawlers.other.wildskirts import WildskirtsCrawler
+from ososedki_dl.index import ContentIndex
+from ososedki_dl.ledger import DownloadLedger
+
+ITEMS = 20
+MISSING_ITEM = 7
+# Below the initial limit of the host, which would bound the requests too
+MAX_CONCURRENT_ITEMS = 2
+
+
+@pytest.fixture(autouse=True)
+def shared_stores(
+    monkeypatch: pytest.MonkeyPatch, ledger: DownloadLedger, content_index: ContentIndex
+) -> None:
+    monkeypatch.setattr(ledger_module, "_ledger", ledger)
+    monkeypatch.setattr(index_module, "_content_index", content_index)
+
+
+def test_item_pages(tmp_path: Path) -> None:
+    requests: dict[str, int] = {"running": 0, "peak": 0}
+
+    async def item(request: web.Request) -> web.Response:
+        requests["running"] += 1
+        requests["peak"] = max(requests["peak"], requests["running"])
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            requests["running"] -= 1
+        number = int(request.match_info["item"])
+        if number == MISSING_ITEM:
+            raise web.HTTPNotFound()
+        html = f'<html><img src="{request.url.origin()}/photos/{number}.jpg"></html>'
+        return web.Response(text=html, content_type="text/html")
+
+    async def run() -> list[str]:
+        app = web.Application()
+        app.router.add_get("/model/{item}", item)
+        async with TestServer(app) as server, ClientSession() as session:
+            args = Namespace(
+                dest_path=tmp_path,
+                parser=DEFAULT_HTML_PARSER,
+                resume=False,
+                check_cache=False,
+                debug=False,
+            )
+            crawler = WildskirtsCrawler(session, args)
+            crawler.downloader.rate_limit = None
+            crawler.max_concurrent_items = MAX_CONCURRENT_ITEMS
+            crawler.base_photos_url = str(server.make_url("/photos"))
+            profile: str = (
+                '<div class="text-center mx-4 cursor-pointer tab-photos">'
+                f"<p>{ITEMS}</p></div>"
+            )
+            url = str(server.make_url("/model"))
+            soup = crawler.parse_html(profile)
+            return await crawler.find_media_from_soup(soup, url)
+
+    urls: list[str] = asyncio.run(run())
+
+    numbers = sorted(int(url.split("/")[-1].removesuffix(".jpg")) for url in urls)
+    assert numbers == [n for n in range(1, ITEMS + 1) if n != MISSING_ITEM]
+    assert requests["peak"] == MAX_CONCURRENT_ITEMS